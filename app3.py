@@ -2,12 +2,33 @@ import discord
 from discord.ext import commands, tasks
 import asyncio
 import logging
+import math
 import random
 import requests
-import json
+import signal
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta, timezone
+from inventory_store import InventoryStore, open_backend
+from audio_pack import AudioPack
+from image_index import ImageIndex
+from asset_cache import AssetUrlCache
+from voice_sessions import VoiceSessionManager
+from voice_pool import VoicePool, VoiceWorker
+from mixer import PcmClipCache, AVAILABLE as MIXING_AVAILABLE
+from inactivity import InactivityScheduler
+from channel_registry import ChannelRegistry
+from channel_pool import ChannelPool
+from channel_reaper import ChannelReaper
+from outcome_engine import OutcomeEngine
+from game_data import mystical_items, outcomes, outcome_texts
+from player_inventory import PlayerInventory, TREASURES
+from player_actors import ActorRouter, COALESCED, DROPPED
+from throttle import CommandThrottle
+from metrics import registry as metrics, LoopLagMonitor, child_processes, serve_metrics
+from bot_logging import setup_logging, parse_sample_rates, command_fields
+from lifecycle import LifecycleManager
+from guild_config import GuildConfigStore, GuildSettings, CHANNEL_FIELDS, TIMEOUT_FIELDS, parse_weight_overrides
+import time
 
 
 
@@ -15,161 +36,531 @@ from datetime import datetime, timedelta, timezone
 # Access the environment variables directly
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 CHANNEL_ID = os.getenv("CHANNEL_ID")
-
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("bot.log"),
-        logging.StreamHandler()  # To also print logs to the console
-    ]
-)
+INVENTORY_FLUSH_INTERVAL = float(os.getenv("INVENTORY_FLUSH_INTERVAL", "5"))  # Seconds between background saves
+INVENTORY_FLUSH_BATCH = int(os.getenv("INVENTORY_FLUSH_BATCH", "50"))  # Dirty players that force an early save
+INVENTORY_BACKEND = os.getenv("INVENTORY_BACKEND", "json")  # "json" or "sqlite"; only sqlite keeps memory within INVENTORY_CACHE_SIZE
+INVENTORY_DB = os.getenv("INVENTORY_DB", "player_inventories.db")
+INVENTORY_CACHE_SIZE = int(os.getenv("INVENTORY_CACHE_SIZE", "10000"))  # Players kept in memory
+INVENTORY_CACHE_TTL = float(os.getenv("INVENTORY_CACHE_TTL", "1800"))  # Seconds an unused player stays in memory
+AUDIO_PACK = os.getenv("AUDIO_PACK", "audio/clips.opuspack")  # Built with `python audio_pack.py`
+IMAGE_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", str(32 * 1024 * 1024)))  # 0 disables the image cache
+INACTIVITY_TIMEOUT = float(os.getenv("INACTIVITY_TIMEOUT", "300"))  # Seconds before an idle game is ended
+VOICE_IDLE_TIMEOUT = float(os.getenv("VOICE_IDLE_TIMEOUT", "300"))  # Seconds without commands or clips (music alone doesn't count) before leaving voice
+AUDIO_MIXER = os.getenv("AUDIO_MIXER", "1") == "1"  # Layer music and effects in one stream; 0 plays clips one at a time
+AUDIO_CLIP_CACHE_BYTES = int(os.getenv("AUDIO_CLIP_CACHE_BYTES", str(160 * 1024 * 1024)))  # Decoded PCM kept for clips not in the pack (the shipped clips need ~140 MB)
+MAX_EFFECTS = int(os.getenv("MAX_EFFECTS", "2"))  # Effects mixed at once; a new one drops the oldest
+MUSIC_VOLUME = float(os.getenv("MUSIC_VOLUME", "0.5"))
+EFFECT_VOLUME = float(os.getenv("EFFECT_VOLUME", "1.0"))
+DUCK_VOLUME = float(os.getenv("DUCK_VOLUME", "0.25"))  # Music level while an effect plays, relative to MUSIC_VOLUME
+ASSET_CHANNEL_ID = os.getenv("ASSET_CHANNEL_ID")  # Channel that hosts uploaded artwork; unset to attach images per message
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotate the log file at this size
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))  # Rotated files to keep
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")  # e.g. "midnight" to rotate by time instead of size
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "activity=100")  # Keep 1 in N records per category
+
+
+# Configure logging: records are queued and written (to a rotating file and
+# the console) by a background thread, never on the event loop
+setup_logging(LOG_FILE, level=LOG_LEVEL, json_format=LOG_FORMAT == "json", max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS,
+              when=LOG_ROTATE_WHEN, sample_rates=parse_sample_rates(LOG_SAMPLE))
 
 
 # Discord Bot Configuration
+STARTED_AT = time.monotonic()
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "full")  # "full" or "lean" (no member list, voice members only)
+COMMAND_MODE = os.getenv("COMMAND_MODE", "hybrid")  # "hybrid" (slash and `.` commands) or "slash" (no message events)
+SYNC_COMMANDS = os.getenv("SYNC_COMMANDS") == "1"  # Publish the slash commands to Discord at startup
+SHARDING = os.getenv("SHARDING")  # "auto" runs an AutoShardedBot (one process, many gateway shards)
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None  # None lets Discord decide
+
 intents = discord.Intents.default()
 intents.members = True
 intents.reactions = True
 intents.message_content = True  # Required for reading message content
-bot = commands.Bot(command_prefix='.', intents=intents)
 
-# Dictionary to track user activity
-user_activity = {}
+if COMMAND_MODE == "slash":
+    # Slash commands and buttons arrive as interactions; message and reaction events aren't needed
+    intents.messages = False
+    intents.message_content = False
+    intents.reactions = False
+
+
+# Slash commands go through the same gate as prefix commands (see
+# dispatch_command): the throttle, with throttled `/open`s held back and
+# answered together, then the player's queue for commands that change state.
+# They are acknowledged before queueing, since a queued command can start
+# after Discord's 3 second deadline. Errors go to on_error wherever the command
+# runs, and a command that fails always gets a reply instead of leaving the
+# interaction "thinking".
+class GameCommandTree(discord.app_commands.CommandTree):
+    async def _call(self, interaction):
+        command = interaction.command
+        if interaction.type is not discord.InteractionType.application_command or command is None:
+            return await super()._call(interaction)
+        if lifecycle.closing:
+            await interaction.response.send_message("🔄 The bot is restarting; try again in a moment.", ephemeral=True)
+            return
+
+        guild_id = interaction.guild.id if interaction.guild else None
+        retry_after = command_throttle.check(interaction.user.id, guild_id)
+        if retry_after:
+            if command.name == "open":
+                await interaction.response.send_message(
+                    f"⏳ Slow down! Your doors will open together in {retry_after:.0f}s.", ephemeral=True)
+                defer_open(await bot.get_context(interaction), retry_after)
+            else:
+                await interaction.response.send_message(f"⏳ Slow down! Try again in {retry_after:.0f}s.", ephemeral=True)
+            return
+        if command.name in READ_ONLY_COMMANDS:
+            await self._invoke(interaction)
+            return
+
+        await interaction.response.defer()
+        status = player_actors.submit(interaction.user.id, command.name, lambda: self._invoke(interaction))
+        if status == DROPPED:
+            await interaction.followup.send("⏳ You have too many commands waiting. Slow down a little!", ephemeral=True)
+        elif status == COALESCED:
+            await interaction.followup.send(f"⏳ Your /{command.name} is already waiting to run.", ephemeral=True)
+
+    async def _invoke(self, interaction):
+        try:
+            await super()._call(interaction)
+        except Exception as error:
+            interaction.command_failed = True
+            if not isinstance(error, discord.app_commands.AppCommandError):
+                error = discord.app_commands.CommandInvokeError(interaction.command, error)
+            await self.on_error(interaction, error)
+        if interaction.command_failed:
+            try:
+                if interaction.response.is_done():
+                    await interaction.followup.send("❌ That command couldn't be completed.", ephemeral=True)
+                else:
+                    await interaction.response.send_message("❌ That command couldn't be completed.", ephemeral=True)
+            except discord.HTTPException:
+                pass
+
+bot_options = {"command_prefix": '.', "intents": intents, "tree_cls": GameCommandTree}
+if SHARDING == "auto":
+    bot_class = commands.AutoShardedBot
+    bot_options["shard_count"] = SHARD_COUNT
+else:
+    bot_class = commands.Bot
+
+if STARTUP_PROFILE == "lean":
+    # Don't download or hold guild member lists: only members in voice are cached,
+    # everyone else arrives with their message or is fetched when a game needs them
+    intents.members = False
+    member_cache_flags = discord.MemberCacheFlags.none()
+    member_cache_flags.voice = True
+    bot = bot_class(chunk_guilds_at_startup=False, member_cache_flags=member_cache_flags, **bot_options)
+else:
+    bot = bot_class(**bot_options)
 
 # Dictionary to store user inventories
 user_inventories = {}
 
-INVENTORY_FILE = "player_inventories.json"
+INVENTORY_FILE = os.getenv("INVENTORY_FILE", "player_inventories.json")
+GAME_CHANNELS_FILE = os.getenv("GAME_CHANNELS_FILE", "game_channels.json")
+CHANNEL_POOL_SIZE = int(os.getenv("CHANNEL_POOL_SIZE", "0"))  # Pre-created channel pairs per guild; 0 disables the pool
+CHANNEL_POOL_FILE = os.getenv("CHANNEL_POOL_FILE", "channel_pool.json")
+TEARDOWN_FILE = os.getenv("TEARDOWN_FILE", "pending_teardown.json")
+OUTCOME_SEED = os.getenv("OUTCOME_SEED")  # Fixes the `.open` RNG for reproducible runs
+PLAYER_QUEUE_SIZE = int(os.getenv("PLAYER_QUEUE_SIZE", "5"))  # Commands a player can have waiting
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", "0.5"))  # Commands per second per user
+THROTTLE_USER_BURST = int(os.getenv("THROTTLE_USER_BURST", "5"))
+THROTTLE_GUILD_RATE = float(os.getenv("THROTTLE_GUILD_RATE", "5"))  # Commands per second per guild
+THROTTLE_GUILD_BURST = int(os.getenv("THROTTLE_GUILD_BURST", "20"))
+METRICS_PORT = os.getenv("METRICS_PORT")  # Port for the Prometheus endpoint; unset disables it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+GUILD_CONFIG_FILE = os.getenv("GUILD_CONFIG_FILE", "guild_config.json")  # Per-guild settings set with `.config`
+# Defaults for guilds that haven't set their own channels
+ANNOUNCE_CHANNEL_ID = int(os.getenv("ANNOUNCE_CHANNEL_ID", "1332567997667086389"))  # Voice join announcements
+UNLOCK_CHANNEL_ID = int(os.getenv("UNLOCK_CHANNEL_ID", "1336175530398978118"))  # Opened by `.unlock`
+FINAL_DOOR_CHANNEL_ID = int(os.getenv("FINAL_DOOR_CHANNEL_ID", "1336175463877578762"))  # Opened by `.open_sesame`
+SPECIAL_DOOR_CHANNEL_ID = int(os.getenv("SPECIAL_DOOR_CHANNEL_ID", "1332802606237487157"))  # Linked by `.special_door`
+SESSION_CHECKPOINT_FILE = os.getenv("SESSION_CHECKPOINT_FILE", "session_checkpoint.json")
+VOICE_WORKER_TOKENS = [token.strip() for token in os.getenv("VOICE_WORKER_TOKENS", "").split(",") if token.strip()]  # Helper accounts for voice
+SHUTDOWN_BUDGET = float(os.getenv("SHUTDOWN_BUDGET", "25"))  # Seconds to wind down after SIGTERM (Heroku allows 30)
+
+
+# Per-guild channels, `.open` weights and timeouts, over the defaults above
+guild_config = GuildConfigStore(GuildSettings(
+    announce_channel_id=ANNOUNCE_CHANNEL_ID,
+    unlock_channel_id=UNLOCK_CHANNEL_ID,
+    final_door_channel_id=FINAL_DOOR_CHANNEL_ID,
+    special_door_channel_id=SPECIAL_DOOR_CHANNEL_ID,
+    inactivity_timeout=INACTIVITY_TIMEOUT,
+    voice_idle_timeout=VOICE_IDLE_TIMEOUT
+), GUILD_CONFIG_FILE)
+
+# Seconds from process start to the first on_ready
+ready_seconds = None
+
+# One persistent voice connection per guild for the main bot account
+MIXER_SETTINGS = {"music_volume": MUSIC_VOLUME, "effect_volume": EFFECT_VOLUME, "duck_volume": DUCK_VOLUME,
+                  "max_effects": MAX_EFFECTS}
+voice_sessions = VoiceSessionManager(idle_timeout=VOICE_IDLE_TIMEOUT, mixer_settings=MIXER_SETTINGS)
+
+# Voice channels are spread over the main bot and the helper accounts, so
+# several players in one guild can hear their game at the same time
+voice_pool = VoicePool(
+    VoiceWorker("primary", bot, voice_sessions),
+    [VoiceWorker.helper(f"worker-{i}", token, VOICE_IDLE_TIMEOUT, MIXER_SETTINGS)
+     for i, token in enumerate(VOICE_WORKER_TOKENS, 1)],
+    on_reassign=lambda session: play_start_music(session),
+    idle_timeout_for=lambda guild_id: guild_config.get(guild_id).voice_idle_timeout
+)
 
+# User ID -> their game text/voice channel IDs
+game_channels = ChannelRegistry(GAME_CHANNELS_FILE)
 
-# Global variable to store the Guild ID
-global_guild_id = None
+# Hidden, pre-created channel pairs ready to be handed out by `.start`
+channel_pool = ChannelPool(CHANNEL_POOL_SIZE, CHANNEL_POOL_FILE,
+                           discard=lambda guild, channels: close_game_channels(guild, *channels))
+
+
+@tasks.loop(minutes=5)
+async def maintain_channel_pool():
+    # Top up each guild's pool (claims also trigger a refill right away)
+    for guild in bot.guilds:
+        channel_pool.refill(guild)
+
+
+# Background teardown of finished games' channels
+channel_reaper = ChannelReaper(bot, channel_pool, TEARDOWN_FILE)
+
+
+# Queue a game's channels for teardown: the pair goes back to the warm pool
+# when there is room and is deleted otherwise
+def close_game_channels(guild, text_channel, voice_channel, delay=0):
+    channel_reaper.enqueue(guild, [text_channel, voice_channel], delay=delay)
+
+
+@bot.event
+async def setup_hook():
+    lifecycle.install()
+    voice_pool.start()
+    # Prize door buttons keep working on old messages and across restarts
+    bot.add_view(PrizeDoorView())
+    if SYNC_COMMANDS:
+        synced = await bot.tree.sync()
+        logging.info(f"Synced {len(synced)} slash commands")
 
 
 @bot.event
 async def on_ready():
-    global global_guild_id
+    global ready_seconds
+
+    if ready_seconds is None:
+        ready_seconds = time.monotonic() - STARTED_AT
+        cached = sum(len(guild.members) for guild in bot.guilds)
+        logging.info(f"Ready in {ready_seconds:.1f}s ({STARTUP_PROFILE} startup, "
+                     f"{len(bot.guilds)} guilds, {bot.shard_count or 1} shards, {cached} cached members)")
+
+    logging.info(f"Bot is ready and logged in as {bot.user.name} in {len(bot.guilds)} guilds")
+    inventory_store.start()
+    channel_reaper.start()
+    if asset_cache and not refresh_asset_urls.is_running():
+        refresh_asset_urls.start()
+    if channel_pool.enabled and not maintain_channel_pool.is_running():
+        maintain_channel_pool.start()
+    inactivity.start()
+    loop_lag.start()
+    await start_metrics_server()
+    await lifecycle.restore()
 
-    # Check the guilds the bot is in
-    if len(bot.guilds) == 1:  # Assuming the bot is in only one server
-        guild = bot.guilds[0]
-        global_guild_id = guild.id
-        print(f"Bot is connected to guild: {guild.name} (ID: {global_guild_id})")
-    else:
-        print("Bot is in multiple guilds or none at all. Please specify manually.")
+@bot.event
+async def on_guild_channel_create(channel):
+    game_channels.channel_created(channel)
 
-    print(f"Bot is ready. Logged in as {bot.user}")
-    logging.info(f"Bot is ready and logged in as {bot.user.name}")
-    print(f"Bot is ready and logged in as {bot.user.name}")
-    check_inactivity.start()
-    print(f"Bot is ready. Logged in as {bot.user}")
 
 @bot.event
-async def on_message(message):
-    global user_activity
-    user_activity[message.author.id] = datetime.now(timezone.utc)  # Use timezone-aware datetime
-    await bot.process_commands(message)
+async def on_guild_channel_delete(channel):
+    game_channels.channel_deleted(channel.id)
+    channel_pool.channel_deleted(channel.guild.id, channel.id)
 
 
-@tasks.loop(minutes=1)  # Adjust interval as needed
-async def check_inactivity():
-    global user_activity
-    now = datetime.now(timezone.utc)  # Use timezone-aware datetime
-    timeout = timedelta(minutes=5)   # Adjust timeout duration as needed
+# Commands that only read state skip the per-player queue. `.choose` changes
+# nothing but can wait 30 seconds for a reaction, so it must not hold the queue.
+READ_ONLY_COMMANDS = {"inventory", "treasure_list", "choose"}
 
-    for user_id, last_activity in list(user_activity.items()):
-        # Check for inactivity
-        if now - last_activity > timeout:
-            # Perform action for inactive users
-            del user_activity[user_id]
-            print(f"User {user_id} marked as inactive due to timeout.")
+# Each player's commands run one at a time, in order; different players run concurrently
+player_actors = ActorRouter(
+    max_queue=PLAYER_QUEUE_SIZE,
+    policies={"start": "coalesce", "end": "coalesce", "reset": "coalesce", "menu": "coalesce"}
+)
 
 
+# Token buckets per user and per guild in front of every command
+command_throttle = CommandThrottle(THROTTLE_USER_RATE, THROTTLE_USER_BURST,
+                                   THROTTLE_GUILD_RATE, THROTTLE_GUILD_BURST)
 
-# Load inventories from JSON file
-def load_inventories():
-    try:
-        with open(INVENTORY_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+# `.open`s received while a user is throttled: user_id -> [latest ctx, count]
+deferred_opens = {}
 
-# Save inventories to JSON file
-def save_inventories(inventories):
-    with open(INVENTORY_FILE, "w") as f:
-        json.dump(inventories, f)
 
-# Initialize inventories
-player_inventories = load_inventories()
+# Hold an over-budget `.open` back; all of them are answered together once the user has budget again
+def defer_open(ctx, retry_after):
+    user_id = ctx.author.id
+    pending = deferred_opens.get(user_id)
+    command_throttle.record_coalesced(user_id)
+    if pending:
+        pending[0] = ctx
+        pending[1] += 1
+        return
+    deferred_opens[user_id] = [ctx, 1]
+    asyncio.create_task(flush_deferred_opens(user_id, retry_after))
 
 
+async def flush_deferred_opens(user_id, delay):
+    ctx = deferred_opens[user_id][0]
+    guild_id = ctx.guild.id if ctx.guild else None
+    while delay:
+        await asyncio.sleep(delay)
+        delay = command_throttle.check(user_id, guild_id)
+    ctx, count = deferred_opens.pop(user_id)
+    if player_actors.submit(user_id, "open_summary", lambda: open_summary(ctx, count)) == DROPPED:
+        await ctx.send(f"⏳ {ctx.author.mention}, you have too many commands waiting. Slow down a little!")
 
 
-@tasks.loop(seconds=30)  # Run every 30 seconds
-async def check_inactivity():
-    global user_activity
-    now = datetime.now(timezone.utc)  # Use timezone-aware UTC datetime
-    timeout = timedelta(minutes=5)
+async def dispatch_command(message):
+    if message.author.bot or lifecycle.closing:
+        return
+    ctx = await bot.get_context(message)
+    if ctx.command is None:
+        return
+    retry_after = command_throttle.check(ctx.author.id, ctx.guild.id if ctx.guild else None)
+    if retry_after:
+        if ctx.command.name == "open":
+            defer_open(ctx, retry_after)
+        elif command_throttle.should_notify(ctx.author.id):
+            await ctx.send(f"⏳ {ctx.author.mention}, slow down! Try again in {retry_after:.0f}s.")
+        return
+    if ctx.command.name in READ_ONLY_COMMANDS:
+        await bot.invoke(ctx)
+        return
+    if player_actors.submit(ctx.author.id, ctx.command.name, lambda: bot.invoke(ctx)) == DROPPED:
+        await ctx.send(f"⏳ {ctx.author.mention}, you have too many commands waiting. Slow down a little!")
 
-    to_remove = []
 
-    for user_id, last_activity in user_activity.items():
-        if now - last_activity > timeout:
-            guild = bot.get_guild(global_guild_id)  # Replace with your actual Guild ID
-            member = guild.get_member(user_id)
+@bot.event
+async def on_message(message):
+    touch_activity(message.guild, message.author.id)  # Track user activity
+    logging.info("Activity", extra={"category": "activity", "user": message.author.id,
+                                    "guild": message.guild.id if message.guild else None,
+                                    "channel": message.channel.id})
+    await dispatch_command(message)
 
-            if member:
-                # Clean up the user's game
-                text_channel = discord.utils.get(guild.channels, name=f"game-{member.name.lower()}")
-                voice_channel = discord.utils.get(guild.channels, name=f"game-voice-{member.name.lower()}")
 
-                if text_channel:
-                    await text_channel.delete()
-                if voice_channel:
-                    await voice_channel.delete()
 
-                vc = discord.utils.get(bot.voice_clients, guild=guild)
-                if vc:
-                    await vc.disconnect()
+# Initialize inventories; players are loaded on first access, changes are
+# marked dirty and saved in the background, and only recently active players
+# stay in memory. The SQLite backend imports the JSON file once on first start.
+inventory_store = InventoryStore(open_backend(INVENTORY_BACKEND, INVENTORY_FILE, INVENTORY_DB),
+                                 flush_interval=INVENTORY_FLUSH_INTERVAL,
+                                 batch_size=INVENTORY_FLUSH_BATCH,
+                                 max_players=INVENTORY_CACHE_SIZE,
+                                 ttl=INVENTORY_CACHE_TTL)
+player_inventories = inventory_store
 
-                # Notify the user (if possible)
-                try:
-                    await member.send("Your game has ended due to inactivity.")
-                except discord.Forbidden:
-                    pass
 
-                # Mark for removal from the activity tracker
-                to_remove.append(user_id)
+# The player's inventory; a new empty one is only saved once something is added to it
+def get_inventory(player_id):
+    return inventory_store.get_or_create(player_id)
 
-    # Remove inactive users from the tracker
-    for user_id in to_remove:
-        del user_activity[user_id]
 
+# Inventories are kept per guild under "guild:user". An inventory saved under
+# the bare user ID (from before they were per guild) moves to the first guild
+# the player uses; outside a guild the bare user ID is still used.
+def player_key(guild, user_id):
+    if guild is None:
+        return str(user_id)
+    key = f"{guild.id}:{user_id}"
+    inventory_store.move(str(user_id), key)
+    return key
 
 
-@bot.event
-async def on_voice_state_update(member, before, after):
-    # Ignore bot's own updates
-    if member.bot:
-        return
+# Load the player's inventories (the guild one and any bare-ID one player_key
+# may move) in a worker thread, so the command's lookups don't query the
+# backend. Anything that calls player_key outside a command awaits this first.
+async def prefetch_inventory(guild, user_id):
+    if guild is not None:
+        await inventory_store.prefetch(f"{guild.id}:{user_id}")
+    await inventory_store.prefetch(str(user_id))
 
-    guild = member.guild
-    bot_vc = discord.utils.get(bot.voice_clients, guild=guild)
 
-    # User leaves the voice channel
-    if before.channel and not after.channel:
-        if bot_vc and bot_vc.channel == before.channel:
-            # Wait for a delay before disconnecting the bot
-            await asyncio.sleep(10)  # Adjust delay as needed
-            if len(before.channel.members) == 0:  # Check if the channel is empty
-                await bot_vc.disconnect()
 
-    # User moves to another voice channel
-    elif after.channel and bot_vc:
-        if bot_vc.channel != after.channel:
-            await bot_vc.move_to(after.channel)
+
+# A guild member from the cache, fetched from the API when it isn't cached
+# (the lean startup profile only caches members who are in voice)
+async def get_member(guild, user_id):
+    member = guild.get_member(user_id)
+    if member is None:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.HTTPException:
+            return None
+    return member
+
+
+# Called by the inactivity scheduler once a player has been idle in a guild
+# for that guild's inactivity timeout
+async def end_inactive_game(game_key):
+    guild_id, user_id = game_key
+    # Only players with an active game have anything to clean up
+    game = game_channels.get(guild_id, user_id)
+    guild = bot.get_guild(guild_id) if game else None
+    member = await get_member(guild, user_id) if guild else None
+
+    if member:
+        # Clean up the user's game
+        text_channel, voice_channel = game_channels.channels(guild, user_id)
+        game_channels.unregister(user_id, guild_id)
+
+        if voice_channel:
+            await voice_pool.disconnect(voice_channel)
+        close_game_channels(guild, text_channel, voice_channel)
+
+        # Notify the user (if possible)
+        try:
+            await member.send("Your game has ended due to inactivity.")
+        except discord.Forbidden:
+            pass
+
+    logging.info(f"User {user_id} marked as inactive due to timeout.",
+                 extra={"category": "inactivity", "user": user_id, "guild": guild.id if guild else None})
+
+
+# Tracks each player's last activity per guild and fires end_inactive_game at their deadline
+inactivity = InactivityScheduler(lambda game_key: guild_config.get(game_key[0]).inactivity_timeout,
+                                 end_inactive_game)
+
+
+def touch_activity(guild, user_id):
+    if guild is not None:
+        inactivity.touch((guild.id, user_id))
+
+
+# Instrumentation: command latency and I/O timings are histograms, the rest
+# are gauges read when the metrics are scraped or `.stats` is run
+metrics.describe("voicebot_command_seconds", "Command latency by command")
+metrics.describe("voicebot_io_seconds", "Persistence, upload, voice and audio-source timings by operation")
+metrics.gauge("voicebot_voice_clients", lambda: voice_pool.connected_count, "Connected voice clients")
+metrics.gauge("voicebot_voice_workers_ready", lambda: voice_pool.ready_count, "Bot accounts available for voice")
+metrics.gauge("voicebot_tracked_players", lambda: len(inactivity), "Players tracked for inactivity")
+metrics.gauge("voicebot_active_games", lambda: len(game_channels.games), "Players with game channels")
+metrics.gauge("voicebot_ffmpeg_processes", lambda: child_processes("ffmpeg"), "Running ffmpeg children")
+metrics.gauge("voicebot_inventory_dirty", lambda: inventory_store.dirty_count, "Inventories waiting to be saved")
+metrics.gauge("voicebot_inventory_cached", lambda: inventory_store.cached_count, "Inventories held in memory")
+metrics.gauge("voicebot_inventory_cache_hits", lambda: inventory_store.hits, "Inventory lookups served from memory")
+metrics.gauge("voicebot_inventory_cache_misses", lambda: inventory_store.misses, "Inventory lookups that loaded")
+metrics.gauge("voicebot_inventory_cache_evictions", lambda: inventory_store.evictions, "Inventories dropped from memory")
+metrics.gauge("voicebot_inventory_cache_writebacks", lambda: inventory_store.writebacks,
+              "Evicted inventories that still had to be saved")
+metrics.gauge("voicebot_commands_queued", lambda: player_actors.queued, "Commands waiting in player mailboxes")
+metrics.gauge("voicebot_teardown_backlog", lambda: len(channel_reaper), "Channel teardown jobs pending")
+metrics.gauge("voicebot_ready_seconds", lambda: ready_seconds or 0, "Seconds from start to the first ready")
+metrics.gauge("voicebot_cached_members", lambda: sum(len(guild.members) for guild in bot.guilds),
+              "Guild members held in the cache")
+
+loop_lag = LoopLagMonitor(metrics)
+metrics_server = None
+
+
+async def start_metrics_server():
+    global metrics_server
+    if METRICS_PORT and metrics_server is None:
+        metrics_server = await serve_metrics(metrics, METRICS_HOST, int(METRICS_PORT))
+
+
+# Restarts: on SIGTERM the active games (channels, last activity) and the voice
+# channels in use are checkpointed, voice is left and pending saves are
+# flushed; the next start picks the games back up without a new `.start`
+def session_checkpoint():
+    players = {f"{guild_id}:{user_id}": dict(game, last_seen=inactivity.last_seen.get((guild_id, user_id)))
+               for (guild_id, user_id), game in game_channels.games.items()}
+    voice = [channel_id for worker in voice_pool.workers for _, channel_id in worker.channels()]
+    return {"players": players, "voice": voice}
+
+
+async def shutdown_sessions():
+    inactivity.stop()
+    await voice_pool.close()
+    await channel_reaper.stop()
+    await asyncio.gather(game_channels.flush(), channel_pool.flush(), guild_config.flush(),
+                         *([asset_cache.flush()] if asset_cache else []))
+    await inventory_store.close()
+    if metrics_server is not None:
+        metrics_server.close()
+
+
+async def resume_sessions(state, downtime):
+    resumed = 0
+    for user_key, game in state.get("players", {}).items():
+        user_id = int(user_key.rpartition(":")[2])
+        guild = bot.get_guild(game["guild_id"])
+        if guild is None:
+            continue
+        if (guild.id, user_id) not in game_channels:
+            game_channels.register(user_id, guild.id, game.get("text_id"), game.get("voice_id"))
+        text_channel, voice_channel = game_channels.channels(guild, user_id)
+        if not text_channel and not voice_channel:
+            game_channels.unregister(user_id, guild.id)  # Deleted while the bot was down
+            continue
+        # Time spent restarting doesn't count towards the player's inactivity timeout
+        last_seen = game.get("last_seen")
+        inactivity.touch((guild.id, user_id), now=last_seen + downtime if last_seen else None)
+        resumed += 1
+
+    reconnected = 0
+    await voice_pool.wait_ready()
+    for channel_id in state.get("voice", []):
+        channel = bot.get_channel(channel_id)
+        if channel is None or voice_pool.connected(channel) or not [m for m in channel.members if not m.bot]:
+            continue
+        try:
+            session = await voice_pool.connect(channel)
+        except (discord.ClientException, asyncio.TimeoutError):
+            logging.exception(f"Could not rejoin voice channel {channel_id}")
+            continue
+        await play_start_music(session)
+        reconnected += 1
+
+    logging.info(f"Resumed {resumed} games and {reconnected} voice connections after {downtime:.0f}s down")
+
+
+lifecycle = LifecycleManager(bot, SESSION_CHECKPOINT_FILE, session_checkpoint, shutdown_sessions, resume_sessions,
+                             budget=SHUTDOWN_BUDGET)
+
+
+# A command from a player in a voice channel we play in keeps that connection from going idle
+def touch_voice(ctx):
+    voice = getattr(ctx.author, "voice", None)
+    session = voice_pool.connected(voice.channel) if voice and voice.channel else None
+    if session is not None:
+        session.touch()
+
+
+@bot.before_invoke
+async def before_command(ctx):
+    ctx.started_at = time.perf_counter()
+    logging.info(f"Running .{ctx.command.name}", extra=command_fields(ctx))
+    touch_voice(ctx)
+    if ctx.interaction:
+        # Acknowledge slash commands right away (queued ones already are); replies are sent as follow-ups
+        touch_activity(ctx.guild, ctx.author.id)
+        if not ctx.interaction.response.is_done():
+            await ctx.defer()
+    await prefetch_inventory(ctx.guild, ctx.author.id)
+
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    metrics.observe("voicebot_command_seconds", time.perf_counter() - ctx.started_at, command=ctx.command.name)
+
 
 
 # Audio files mapped to outcomes
@@ -185,43 +576,106 @@ audio_files = {
     "treasure": "audio/treasure.mp3"
 }
 
-# Track the currently playing audio
-current_audio_task = None
+# Pre-encoded Opus clips, if the pack has been built
+audio_pack = AudioPack.open_if_exists(AUDIO_PACK)
 
 
-async def play_audio(ctx, file_path):
-    global current_audio_task
-    if current_audio_task:
-        current_audio_task.cancel()
-        try:
-            await current_audio_task
-        except asyncio.CancelledError:
-            pass
-
-    if ctx.author.voice:
-        voice_channel = ctx.author.voice.channel
-        existing_vc = discord.utils.get(bot.voice_clients, guild=ctx.guild)
-        if existing_vc:
-            await existing_vc.disconnect()
+# Create an audio source for a clip: stream the pre-encoded Opus frames when the
+# clip is in the pack, otherwise fall back to decoding the file with ffmpeg
+def make_audio_source(path):
+    if audio_pack is not None:
+        source = audio_pack.source(path)
+        if source is not None:
+            return source
+    with metrics.timer("voicebot_io_seconds", op="audio_source_ffmpeg"):
+        return discord.FFmpegPCMAudio(path)
 
-        vc = await voice_channel.connect()
 
+async def play_audio(ctx, file_path):
+    if ctx.author.voice:
         absolute_path = os.path.abspath(file_path)
         if not os.path.exists(absolute_path):
             await ctx.send(f"Audio file not found: {absolute_path}")
-            await vc.disconnect()
             return
 
-        vc.play(discord.FFmpegPCMAudio(absolute_path))
-        current_audio_task = asyncio.create_task(audio_completion_handler(vc))
+        # Reuse the connection in the author's channel, or bring an account in
+        session = await voice_pool.connect(ctx.author.voice.channel)
+        await play_effect(session, absolute_path)
     else:
         await ctx.send("You need to be in a voice channel for audio playback.")
 
 
-async def audio_completion_handler(vc):
-    while vc.is_playing():
-        await asyncio.sleep(1)
-    await vc.disconnect()
+# Play a clip in the author's voice channel, joining it if no account is there
+# yet, or else in their game's voice channel if the bot is in it. Returns
+# False if there is nowhere to play it.
+async def play_clip(ctx, audio_path):
+    session = await player_session(ctx)
+    if session is None:
+        return False
+    await play_effect(session, audio_path)
+    return True
+
+
+async def player_session(ctx):
+    return await member_session(ctx.guild, ctx.author)
+
+
+async def member_session(guild, member):
+    if member.voice and member.voice.channel:
+        return await voice_pool.connect(member.voice.channel)
+    _, voice_channel = game_channels.channels(guild, member.id)
+    return voice_pool.connected(voice_channel) if voice_channel else None
+
+
+# Decoded clips for the sessions' mixers (without audioop or NumPy, clips play one at a time)
+if AUDIO_MIXER and not MIXING_AVAILABLE:
+    logging.warning("AUDIO_MIXER is on but neither audioop nor NumPy is installed; playing clips one at a time.")
+clip_cache = PcmClipCache(audio_pack, AUDIO_CLIP_CACHE_BYTES) if AUDIO_MIXER and MIXING_AVAILABLE else None
+
+
+# The clip for the mixer (packed or decoded), or None when the mixer is off or it can't be decoded
+async def mixer_clip(path):
+    if clip_cache is None:
+        return None
+    with metrics.timer("voicebot_io_seconds", op="audio_source_mixer"):
+        return await clip_cache.get(path)
+
+
+# Whether a clip can be played without the mixer: it is in the pack or on disk
+def clip_exists(path):
+    return (audio_pack is not None and path in audio_pack) or os.path.exists(path)
+
+
+# Play a one-shot clip over the session's music (in place of it without the
+# mixer). A clip the mixer can't play is skipped so the music keeps going.
+async def play_effect(session, path):
+    if clip_cache is None:
+        if clip_exists(path):
+            session.play(make_audio_source(path))
+        return
+    clip = await mixer_clip(path)
+    if clip is not None:
+        session.play_effect(clip)
+
+
+# Loop a clip as the session's music bed (play it once, replacing any audio, without the mixer)
+async def play_music(session, path):
+    if clip_cache is None:
+        if clip_exists(path):
+            session.play(make_audio_source(path))
+        return
+    clip = await mixer_clip(path)
+    if clip is not None:
+        session.play_music(clip)
+
+
+# Start the "start" music bed; False if the file is missing
+async def play_start_music(session):
+    audio_file = audio_files.get("start")
+    if not (audio_file and os.path.exists(audio_file)):
+        return False
+    await play_music(session, audio_file)
+    return True
 
 
 # Function to create the expanded game commands menu embed
@@ -262,24 +716,17 @@ async def on_voice_state_update(member, before, after):
         return  # Ignore bot updates
 
     guild = member.guild
-    bot_vc = discord.utils.get(bot.voice_clients, guild=guild)
 
-    # User joins a new voice channel
-    if after.channel and (not bot_vc or bot_vc.channel != after.channel):
-        # Move the bot to the user's new channel
-        if bot_vc:
-            await bot_vc.move_to(after.channel)
-        else:
-            vc = await after.channel.connect()
-            # Play the "start" music if not already playing
-            audio_file = audio_files.get("start")
-            if audio_file and os.path.exists(audio_file):
-                vc.play(discord.FFmpegPCMAudio(audio_file))
-            else:
-                print("The starting music file is missing or cannot be played.")
+    # User joins a voice channel no account is playing in yet
+    if after.channel and after.channel != before.channel and not voice_pool.connected(after.channel):
+        session = await voice_pool.connect(after.channel)
+        # Play the "start" music
+        if not await play_start_music(session):
+            logging.warning("The starting music file is missing or cannot be played.",
+                            extra={"category": "voice", "guild": guild.id})
 
         # Send a message to a specific text channel by ID
-        text_channel = guild.get_channel(1332567997667086389)  # Replace with your channel ID
+        text_channel = guild.get_channel(guild_config.get(guild.id).announce_channel_id)
         if text_channel:
             embed = discord.Embed(
                 title=f"{member.name} has joined {after.channel.name}! 🎮",
@@ -294,38 +741,42 @@ async def on_voice_state_update(member, before, after):
             )
             await text_channel.send(embed=embed)
         else:
-            print("Text channel not found. Check the channel ID.")
+            logging.warning("Announcement channel not found. Set it with `.config announce_channel_id`.",
+                            extra={"category": "voice", "guild": guild.id})
 
-    # User leaves a voice channel
-    elif before.channel and not after.channel and bot_vc and bot_vc.channel == before.channel:
-        # Disconnect if the channel is empty after the user leaves
-        if len(before.channel.members) == 0:
-            await bot_vc.disconnect()
+    # User leaves (or moves out of) a voice channel the bot is playing in
+    if before.channel and before.channel != after.channel and voice_pool.connected(before.channel):
+        # Disconnect if only bots are left after the user leaves
+        if not [m for m in before.channel.members if not m.bot]:
+            await voice_pool.disconnect(before.channel)
 
 
 
-@bot.command(name="start")
+@bot.hybrid_command(name="start", description="Start a new game and create your private game channels.")
 async def start(ctx):
     guild = ctx.guild
     user = ctx.author
     user_name = user.name.lower()
 
-    # Check if the user already has a game text channel
+    # Check if the user already has game channels
+    text_channel, voice_channel = game_channels.channels(guild, user.id)
     text_channel_name = f"game-text-{user_name}"
-    text_channel = discord.utils.get(guild.text_channels, name=text_channel_name)
+    voice_channel_name = f"game-voice-{user_name}"
+
+    # Otherwise take a ready-made pair from the warm pool
+    if not text_channel and not voice_channel and channel_pool.enabled:
+        text_channel, voice_channel = await channel_pool.claim(guild, text_channel_name, voice_channel_name)
 
     if not text_channel:
         # Create a new text channel
         text_channel = await guild.create_text_channel(text_channel_name)
 
-    # Check if the user already has a game voice channel
-    voice_channel_name = f"game-voice-{user_name}"
-    voice_channel = discord.utils.get(guild.voice_channels, name=voice_channel_name)
-
     if not voice_channel:
         # Create a new voice channel
         voice_channel = await guild.create_voice_channel(voice_channel_name)
 
+    game_channels.register(user.id, guild.id, text_channel.id, voice_channel.id)
+
     # Send message in the original command channel
     await ctx.send(
         f"{user.mention}, your game channels are ready!\n"
@@ -334,66 +785,48 @@ async def start(ctx):
         f"➡️ **Please go to {text_channel.mention} for game commands!**"
     )
 
-    # Auto-connect the bot to the new voice channel
-    bot_vc = discord.utils.get(bot.voice_clients, guild=guild)
-
-    if bot_vc and bot_vc.channel != voice_channel:
-        await bot_vc.move_to(voice_channel)
-        await text_channel.send(f"The bot has moved to {voice_channel.mention}.")
-    elif not bot_vc:
-        vc = await voice_channel.connect()
-        assert isinstance(vc, discord.VoiceClient), "Failed to connect as a VoiceClient"
+    # Auto-connect an account to the new voice channel
+    if not voice_pool.connected(voice_channel):
+        session = await voice_pool.connect(voice_channel)
 
         # Play starting audio if available
-        audio_file = audio_files.get("start")
-        if audio_file and os.path.exists(audio_file):
-            vc.play(discord.FFmpegPCMAudio(audio_file))
-        else:
+        if not await play_start_music(session):
             await text_channel.send("Starting audio not found or cannot be played.")
 
     # "Move" the user to the new text channel by tagging them and deleting the original message
-    try:
-        await ctx.message.delete()  # Delete the original message
-    except discord.Forbidden:
-        pass  # If the bot lacks permission to delete messages
+    if ctx.interaction is None:
+        try:
+            await ctx.message.delete()  # Delete the original message
+        except discord.Forbidden:
+            pass  # If the bot lacks permission to delete messages
 
     await text_channel.send(f"{user.mention}, your game session has started here! Use this channel for all game-related commands.")
 
-    # Call `get_command_menu` in the user's new text channel
-    command_menu = bot.get_command("menu")
-    if command_menu:
-        new_ctx = await bot.get_context(await text_channel.send(f"Loading game menu for {user.mention}..."))
-        await command_menu.callback(new_ctx)
-    else:
-        await text_channel.send("Command menu not found.")
+    # Show the command menu in the user's new text channel
+    await send_menu(text_channel, guild, user)
 
 
 # The .menu command
-@bot.command(name="menu")
+@bot.hybrid_command(name="menu", description="Show the game commands menu.")
 async def menu(ctx):
-    # Display the command menu
-    embed = get_command_menu()
-    await ctx.send(embed=embed)
+    await send_menu(ctx, ctx.guild, ctx.author)
 
-    # Define the audio path for menu music
-    menu_audio_path = "audio/menu.mp3"
 
-    # Ensure the bot connects to the user's voice channel
-    vc = discord.utils.get(bot.voice_clients, guild=ctx.guild)
-    if not vc or not vc.channel:
-        if ctx.author.voice and ctx.author.voice.channel:
-            vc = await ctx.author.voice.channel.connect()
-            assert isinstance(vc, discord.VoiceClient), "Failed to obtain a valid VoiceClient"
-        else:
-            await ctx.send("You must be in a voice channel to play menu music.")
-            return
+# Show the command menu in `destination` and play the menu music for `member`,
+# replacing the current music, in their voice channel or their game's
+async def send_menu(destination, guild, member):
+    await destination.send(embed=get_command_menu())
 
-    # Play the menu music
-    if os.path.exists(menu_audio_path):
-        vc.stop()  # Stop any current audio
-        vc.play(discord.FFmpegPCMAudio(menu_audio_path))
-    else:
-        await ctx.send("Menu music file not found.")
+    menu_audio_path = audio_files["menu"]
+    if not os.path.exists(menu_audio_path):
+        await destination.send("Menu music file not found.")
+        return
+
+    session = await member_session(guild, member)
+    if not session:
+        await destination.send("You must be in a voice channel to play menu music.")
+        return
+    await play_music(session, menu_audio_path)
 
 
 # Dictionary mapping outcomes to their corresponding image files
@@ -418,44 +851,62 @@ image_folders = {
     "rare_coin": "img/rare_coin/"
 }
 
-# Dictionary of treasures with descriptions
-mystical_items = {
-    "Ruby of Radiance": "A gem that glows with the fiery light of dawn.",
-    "Sapphire of Serenity": "A tranquil blue gem that calms the soul.",
-    "Emerald of Eternity": "A deep green gem said to hold the secret of everlasting life.",
-    "Diamond of Destiny": "A brilliant diamond that sparkles with glimpses of the future.",
-    "Amethyst of Ambition": "A regal purple gem that inspires greatness.",
-    "Golden Idol of the Sun": "A golden figurine that radiates warmth and light.",
-    "Crystal Orb of Visions": "A clear orb said to reveal glimpses of hidden truths.",
-    "Silver Chalice of Eternity": "A finely crafted cup that never runs dry.",
-    "Enchanted Scroll of Wisdom": "A magical scroll containing knowledge of ancient times.",
-    "Obsidian Dagger of Shadows": "A sleek blade that blends with the darkness.",
-    "Wand of Starlight": "A wand that sparkles with celestial magic.",
-    "Ring of Infinite Echoes": "A mysterious ring that whispers forgotten secrets.",
-    "Pendant of the Forgotten Realm": "A jeweled pendant that connects to another world.",
-    "Tome of the Ancients": "A leather-bound book brimming with arcane power.",
-    "Cloak of Hidden Paths": "A shadowy cloak that conceals the wearer.",
-    "Dragon Scale": "A shimmering scale from a mighty dragon.",
-    "Phoenix Feather": "A blazing feather from an immortal phoenix.",
-    "Starlit Crown": "A golden crown adorned with tiny stars.",
-    "Moonlit Mirror": "A silver mirror that reflects only in moonlight.",
-    "Eternal Flame in a Bottle": "A bottle that holds an undying flame.",
-    "key": "A KEY to UNLOCK a HIDDEN DOOR!"
-}
+FINAL_DOOR_IMAGE = "img/final_door/final_door.jpg"
 
-# Define outcomes and weights
-outcomes = {
-    "hallway": 50,
-    "fall": 30,
-    "trapped": 20,
-    "door": 10,
-    "treasure": 15,
-    "key": 10,
-    "rare_coin": 10
-}
+# Index the artwork once at startup; use `.reload_images` after changing it
+image_index = ImageIndex(image_folders, image_files, extra_files=[FINAL_DOOR_IMAGE],
+                         cache_bytes=IMAGE_CACHE_BYTES)
+
+# CDN URLs of artwork already uploaded to the asset channel
+asset_cache = AssetUrlCache(bot, int(ASSET_CHANNEL_ID), image_index) if ASSET_CHANNEL_ID else None
+
+
+@tasks.loop(hours=1)
+async def refresh_asset_urls():
+    # Upload missing artwork and renew signed URLs before they expire
+    await asset_cache.refresh_all(sorted(image_index.known))
+
+
+# Send an embed showing a local image by its cached CDN URL. On a miss the
+# image is uploaded once to the asset channel and its URL used; the file is
+# only attached to the message itself without an asset channel or when that
+# upload fails.
+async def send_embed_with_image(ctx, embed, image_path, filename):
+    url = None
+    if asset_cache:
+        url = asset_cache.url_for(image_path)
+        if url is None:
+            with metrics.timer("voicebot_io_seconds", op="asset_upload"):
+                url = await asset_cache.request(image_path)
+    if url:
+        embed.set_image(url=url)
+        await ctx.send(embed=embed)
+        return
+
+    file = await image_index.file(image_path, filename=filename)
+    embed.set_image(url=f"attachment://{filename}")
+    with metrics.timer("voicebot_io_seconds", op="attachment_upload"):
+        await ctx.send(embed=embed, file=file)
+
+
+# Outcome sampler and embed templates, compiled once
+outcome_engine = OutcomeEngine(outcomes, outcome_texts,
+                               rng=random.Random(OUTCOME_SEED) if OUTCOME_SEED else None)
 
-# Required coins
-required_coins = ["coin1", "coin2", "coin3", "coin4", "coin5"]
+# Guild ID -> (weight overrides, engine) for guilds with their own `.open` weights
+guild_outcome_engines = {}
+
+
+# The engine for the guild's weights; engines share the default engine's RNG
+def outcome_engine_for(guild):
+    overrides = guild_config.get(guild.id).outcome_weights if guild else None
+    if not overrides:
+        return outcome_engine
+    cached = guild_outcome_engines.get(guild.id)
+    if cached is None or cached[0] != overrides:
+        engine = OutcomeEngine(dict(outcomes, **overrides), outcome_texts, rng=outcome_engine.rng)
+        cached = guild_outcome_engines[guild.id] = (overrides, engine)
+    return cached[1]
 
 key = {"keys": "This opens a HIDDEN DOOR! Use **.unlock!**"}
 
@@ -470,7 +921,7 @@ def get_audio_path(outcome):
     if os.path.exists(audio_path):
         return audio_path
     else:
-        print(f"Audio file not found: {audio_path}")
+        logging.warning(f"Audio file not found: {audio_path}")
         return None
 
 
@@ -479,180 +930,179 @@ def get_image_path(outcome):
     image_path = image_files.get(outcome, "Voice Bot/img/treasure.jpg")  # Default image if not found
 
     # Check if the image file exists
-    if os.path.exists(image_path):
+    if image_index.exists(image_path):
         return image_path
     else:
-        print(f"Image file not found for outcome: {outcome}. Using fallback image.")
+        logging.warning(f"Image file not found for outcome: {outcome}. Using fallback image.")
         return "Voice Bot/img/treasure.jpg"  # Fallback image
 
 
 def get_random_image(outcome):
-    # Retrieve the folder path for the outcome
-    folder_path = image_folders.get(outcome)
-
-    # Check if the folder exists
-    if not folder_path or not os.path.exists(folder_path):
-        print(f"Image folder not found for outcome: {outcome}")
-        return "img/default.jpg"  # Fallback image
-
-    # List all valid image files in the folder
-    images = [f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-
-    # Return a random image if available
-    if images:
-        chosen_image = random.choice(images)
-        return os.path.join(folder_path, chosen_image)
-    else:
-        print(f"No valid images found in folder: {folder_path}")
-        return "img/default.jpg"  # Fallback image
+    # Pick from the candidates indexed at startup (falls back to img/default.jpg)
+    return image_index.random_image(outcome)
 
 
-@bot.command(name="open")
-async def open_door(ctx):
-    global user_activity
-    user_activity[ctx.author.id] = datetime.now(timezone.utc)  # Update user's last activity
-
-    # Choose a random outcome
-    outcome = random.choices(list(outcomes.keys()), weights=list(outcomes.values()), k=1)[0]
-
-    # Fetch the image and audio paths
-    image_path = get_random_image(outcome)
-    audio_path = audio_files.get(outcome)
+# Roll one door for the player and apply the result to their inventory.
+# Returns the outcome and its embed, with a field describing any loot.
+def roll_open(guild, player_id):
+    # Choose a random outcome with the guild's weights
+    engine = outcome_engine_for(guild)
+    outcome = engine.roll()
+    rng = engine.rng
 
-    # Customize the text based on the outcome
-    outcome_texts = {
-        "hallway": {"title": "You found a Hallway!",
-                    "description": "The door creaks open, and you step into a dimly lit hallway. Where will it lead?"},
-        "fall": {"title": "You Fell!",
-                 "description": "The ground beneath your feet gives way, and you tumble down into the unknown. Ouch!"},
-        "trapped": {"title": "You're Trapped!",
-                    "description": "The door slams shut behind you. You're trapped! Look around for clues to escape."},
-        "door": {"title": "You Found a Door to the Prize!",
-                 "description": "Congratulations! Use `.choose` to claim your reward!"},
-        "treasure": {"title": "You Found a Treasure Chest!",
-                     "description": "Inside the chest, you discover something magical!"},
-        "key": {"title": "You Found a Key!",
-                "description": "A mysterious key lies on the ground. What door might it unlock? 🗝"},
-        "rare_coin": {"title": "You Found a Rare Coin!",
-                      "description": "One of the five rare coins glimmers in the corner. Collect them all! 🪙"}
-    }
-
-    # Initialize embed
-    embed = discord.Embed(
-        title=outcome_texts[outcome]["title"],
-        description=outcome_texts[outcome]["description"],
-        color=discord.Color.blue() if outcome != "trapped" else discord.Color.red()
-    )
+    # Initialize embed from the outcome's template
+    embed = engine.embed(outcome)
 
     # If outcome is treasure, select a random mystical item and add it to inventory
-    player_id = str(ctx.author.id)
-    if player_id not in player_inventories:
-        player_inventories[player_id] = {"items": [], "coins": []}
+    inventory = get_inventory(player_id)
 
     if outcome == "treasure":
-        available_items = list(set(mystical_items.keys()) - set(player_inventories[player_id]["items"]))
-        if available_items:
-            item_name = random.choice(available_items)
-            item_description = mystical_items[item_name]
-            player_inventories[player_id]["items"].append(item_name)
-            save_inventories(player_inventories)
-            embed.add_field(name=f"You found: {item_name}!", value=item_description)
+        # Any treasure not collected yet, or the chest's key if the player holds none
+        missing = len(TREASURES) - inventory.treasure_count
+        choices = missing + (1 if inventory.keys == 0 else 0)
+        if choices:
+            if rng.randrange(choices) < missing:
+                item_name = inventory.random_missing_treasure(rng)
+                inventory.add_treasure(item_name)
+            else:
+                item_name = "key"
+                inventory.add_key()
+            inventory_store.mark_dirty(player_id)
+            embed.add_field(name=f"You found: {item_name}!", value=mystical_items[item_name])
         else:
             embed.add_field(name="Duplicate Item", value="You've already collected all available treasures!")
 
     # If outcome is key, add it to the inventory
     if outcome == "key":
-        player_inventories[player_id]["items"].append("key")
-        save_inventories(player_inventories)
+        inventory.add_key()
+        inventory_store.mark_dirty(player_id)
         embed.add_field(name="Inventory Update!", value="You have gained a key! 🗝")
 
     # If outcome is rare_coin, add a new unique coin to the inventory
-    collected_coins = player_inventories[player_id]["coins"]
-    available_coins = list(set(required_coins) - set(collected_coins))
-    if outcome == "rare_coin" and available_coins:
-        new_coin = random.choice(available_coins)
-        collected_coins.append(new_coin)
-        save_inventories(player_inventories)
+    if outcome == "rare_coin" and not inventory.has_all_coins():
+        new_coin = inventory.random_missing_coin(rng)
+        inventory.add_coin(new_coin)
+        inventory_store.mark_dirty(player_id)
         embed.add_field(name="Rare Coin Collected!", value=f"You have collected: **{new_coin}**! 🪙")
 
+    return outcome, embed
+
+
+@bot.hybrid_command(name="open", description="Open a door and discover a random outcome.")
+async def open_door(ctx):
+    touch_activity(ctx.guild, ctx.author.id)  # Update user's last activity
+
+    outcome, embed = roll_open(ctx.guild, player_key(ctx.guild, ctx.author.id))
+
+    # Fetch the image and audio paths
+    image_path = get_random_image(outcome)
+    audio_path = audio_files.get(outcome)
+
     # Add the image to the embed
-    if image_path and os.path.exists(image_path):
-        file = discord.File(image_path, filename=f"{outcome}.jpg")
-        embed.set_image(url=f"attachment://{outcome}.jpg")
-        await ctx.send(embed=embed, file=file)
+    if image_path and image_index.exists(image_path):
+        await send_embed_with_image(ctx, embed, image_path, f"{outcome}.jpg")
     else:
         await ctx.send(embed=embed)
 
     # Play the audio file
     if audio_path:
-        vc = discord.utils.get(bot.voice_clients, guild=ctx.guild)
-        if vc and vc.channel:
-            vc.stop()  # Stop current audio
-            vc.play(discord.FFmpegPCMAudio(audio_path))
-        else:
-            if ctx.author.voice and ctx.author.voice.channel:
-                vc = await ctx.author.voice.channel.connect()
-                vc.play(discord.FFmpegPCMAudio(audio_path))
-            else:
-                await ctx.send("The bot is not connected to a voice channel to play audio.")
+        if not await play_clip(ctx, audio_path):
+            await ctx.send("The bot is not connected to a voice channel to play audio.")
 
 
-@bot.command(name="choose")
-async def choose(ctx):
-    # Define reactions and their corresponding prize channels
-    prize_channels = {
-        "🔴": "red-prize",
-        "🟢": "green-prize",
-        "🔵": "blue-prize"
-    }
-
-    # Embed for choosing the prize
-    embed = discord.Embed(
-        title="Choose Your Prize",
-        description="React to pick a prize door:\n🔴 Red Prize Door\n🟢 Green Prize Door\n🔵 Blue Prize Door",
-        color=discord.Color.purple()
+# Answer several throttled `.open`s with one embed: every door is rolled and
+# applied, but only a single message is sent and only the last door's sound plays
+async def open_summary(ctx, count):
+    with metrics.timer("voicebot_command_seconds", command="open_summary"):
+        await send_open_summary(ctx, count)
+
+
+async def send_open_summary(ctx, count):
+    touch_activity(ctx.guild, ctx.author.id)
+    await prefetch_inventory(ctx.guild, ctx.author.id)  # Not a command, so before_command didn't
+    player_id = player_key(ctx.guild, ctx.author.id)
+    results = [roll_open(ctx.guild, player_id) for _ in range(count)]
+
+    tally = {}
+    loot = []
+    for outcome, embed in results:
+        tally[outcome] = tally.get(outcome, 0) + 1
+        loot.extend(field.name for field in embed.fields if field.name != "Duplicate Item")
+
+    summary = discord.Embed(
+        title=f"You opened {count} doors in a hurry!",
+        description="\n".join(f"{outcome_texts[outcome]['title']} × {n}" for outcome, n in tally.items()),
+        color=discord.Color.blue()
     )
-    message = await ctx.send(embed=embed)
+    if loot:
+        summary.add_field(name="Loot", value="\n".join(loot)[:1024], inline=False)
+    summary.set_footer(text="Slow down to see each door on its own.")
+    await ctx.send(embed=summary)
 
-    # Add reaction options
-    for emoji in prize_channels.keys():
-        await message.add_reaction(emoji)
+    audio_path = audio_files.get(results[-1][0])
+    if audio_path:
+        await play_clip(ctx, audio_path)
 
-    def check(reaction, user):
-        return user == ctx.author and str(reaction.emoji) in prize_channels
 
-    try:
-        # Wait for the user to react within 30 seconds
-        reaction, _ = await bot.wait_for("reaction_add", timeout=30.0, check=check)
-        selected_emoji = str(reaction.emoji)
+# Prize doors: color -> (emoji, prize channel name)
+PRIZE_DOORS = {
+    "red": ("🔴", "red-prize"),
+    "green": ("🟢", "green-prize"),
+    "blue": ("🔵", "blue-prize")
+}
+
 
-        # Find the corresponding prize channel
-        prize_channel_name = prize_channels[selected_emoji]
-        guild = ctx.guild
-        prize_channel = discord.utils.get(guild.channels, name=prize_channel_name)
+# One prize door button. The custom_id is fixed, so clicks are routed here by
+# Discord even on messages sent before a restart.
+class PrizeDoorButton(discord.ui.Button):
+    def __init__(self, color):
+        emoji, self.prize_channel_name = PRIZE_DOORS[color]
+        super().__init__(label=f"{color.title()} Prize Door", emoji=emoji,
+                         style=discord.ButtonStyle.secondary, custom_id=f"prize_door:{color}")
 
+    async def callback(self, interaction):
+        touch_activity(interaction.guild, interaction.user.id)
+        prize_channel = discord.utils.get(interaction.guild.channels, name=self.prize_channel_name)
         if prize_channel:
-            await ctx.send(
-                f"You chose the {selected_emoji} prize door! Your prize awaits here: {prize_channel.mention}"
+            await interaction.response.send_message(
+                f"You chose the {self.emoji} prize door! Your prize awaits here: {prize_channel.mention}",
+                ephemeral=True
             )
         else:
-            await ctx.send(
-                f"Oops! The prize channel for {selected_emoji} doesn't exist. Please contact the admin."
+            await interaction.response.send_message(
+                f"Oops! The prize channel for {self.emoji} doesn't exist. Please contact the admin.",
+                ephemeral=True
             )
-    except asyncio.TimeoutError:
-        await ctx.send("You took too long to choose! Try again by running `.choose`.")
 
 
-@bot.command(name="open_sesame")
+# Persistent view with the three prize door buttons (registered in setup_hook)
+class PrizeDoorView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=None)
+        for color in PRIZE_DOORS:
+            self.add_item(PrizeDoorButton(color))
+
+
+@bot.hybrid_command(name="choose", description="Pick one of the prize doors.")
+async def choose(ctx):
+    # Embed for choosing the prize; the buttons answer each player privately
+    embed = discord.Embed(
+        title="Choose Your Prize",
+        description="Pick a prize door:\n🔴 Red Prize Door\n🟢 Green Prize Door\n🔵 Blue Prize Door",
+        color=discord.Color.purple()
+    )
+    await ctx.send(embed=embed, view=PrizeDoorView())
+
+
+@bot.hybrid_command(name="open_sesame", description="Unlock the ultimate door if all five rare coins are collected.")
 async def open_sesame(ctx):
-    player_id = str(ctx.author.id)
-    inventory = player_inventories.get(player_id, {"items": [], "coins": []})
+    player_id = player_key(ctx.guild, ctx.author.id)
+    inventory = player_inventories.get(player_id, PlayerInventory())
 
     # Check for all 5 coins
-    required_coins = {"coin1", "coin2", "coin3", "coin4", "coin5"}
-    if required_coins.issubset(set(inventory["coins"])):
-        inventory["coins"] = []  # Reset coins after use
-        save_inventories(player_inventories)
+    if inventory.has_all_coins():
+        inventory.clear_coins()  # Reset coins after use
+        inventory_store.mark_dirty(player_id)
 
         # Create an embed for exiting the game
         embed = discord.Embed(
@@ -664,18 +1114,16 @@ async def open_sesame(ctx):
             color=discord.Color.green()
         )
         # Define the image path
-        image_path = "img/final_door/final_door.jpg"
+        image_path = FINAL_DOOR_IMAGE
 
         # Check if the image exists and attach it
-        if os.path.exists(image_path):
-            file = discord.File(image_path, filename="final_door.jpg")
-            embed.set_image(url="attachment://final_door.jpg")
-            await ctx.send(embed=embed, file=file)
+        if image_index.exists(image_path):
+            await send_embed_with_image(ctx, embed, image_path, "final_door.jpg")
         else:
             await ctx.send("🚪 The image for the final door could not be found. Please check the file path.")
 
         # Add a link to the specific channel
-        special_channel = ctx.guild.get_channel(1336175463877578762)
+        special_channel = ctx.guild.get_channel(guild_config.get(ctx.guild.id).final_door_channel_id)
         if special_channel:
             embed.add_field(
                 name="🎉 Special Channel",
@@ -691,14 +1139,7 @@ async def open_sesame(ctx):
 
         # Play a song (replace with your song file path)
         audio_path = "audio/final_song.mp3"
-        vc = discord.utils.get(bot.voice_clients, guild=ctx.guild)
-        if vc and vc.channel:
-            vc.stop()
-            vc.play(discord.FFmpegPCMAudio(audio_path))
-        else:
-            if ctx.author.voice and ctx.author.voice.channel:
-                vc = await ctx.author.voice.channel.connect()
-                vc.play(discord.FFmpegPCMAudio(audio_path))
+        await play_clip(ctx, audio_path)
 
         # Send the embed
         await ctx.send(embed=embed)
@@ -706,22 +1147,19 @@ async def open_sesame(ctx):
         await ctx.send("🪙 You don't have all the rare coins yet. Keep exploring!")
 
 
-@bot.command(name="inventory")
+@bot.hybrid_command(name="inventory", description="View your current inventory of items and rare coins.")
 async def inventory(ctx):
-    player_id = str(ctx.author.id)
+    player_id = player_key(ctx.guild, ctx.author.id)
 
     # Ensure the player's inventory is initialized correctly
-    if player_id not in player_inventories:
-        player_inventories[player_id] = {"items": [], "coins": []}
-
-    inventory = player_inventories[player_id]  # Get the player's inventory safely
+    inventory = get_inventory(player_id)
 
     # Format treasures with their descriptions
     treasures = "\n".join([f"**{item}**: _{mystical_items.get(item, 'No description available')}_"
-                           for item in inventory.get("items", [])]) or "None"
+                           for item in inventory.items]) or "None"
 
     # Format rare coins
-    coins = ", ".join(inventory.get("coins", [])) or "None"
+    coins = ", ".join(inventory.coin_names) or "None"
 
 
     # Send inventory details
@@ -733,19 +1171,18 @@ async def inventory(ctx):
 
 
 
-@bot.command(name="unlock")
+@bot.hybrid_command(name="unlock", description="Use a key to unlock a special door.")
 async def unlock_door(ctx):
-    player_id = str(ctx.author.id)
+    player_id = player_key(ctx.guild, ctx.author.id)
 
     # Check if the player has the key in their inventory
-    inventory = player_inventories.get(player_id, {"items": [], "coins": []})
+    inventory = player_inventories.get(player_id, PlayerInventory())
 
-    if "key" in inventory["items"]:
-        inventory["items"].remove("key")  # Use the key
-        save_inventories(player_inventories)  # Save the updated inventory
+    if inventory.use_key():
+        inventory_store.mark_dirty(player_id)  # Save the updated inventory
 
         # Fetch the special channel
-        special_channel = ctx.guild.get_channel(1336175530398978118)
+        special_channel = ctx.guild.get_channel(guild_config.get(ctx.guild.id).unlock_channel_id)
 
         # Create an embed for the special door
         embed = discord.Embed(
@@ -771,14 +1208,7 @@ async def unlock_door(ctx):
 
         # Play a special song (replace with your song file path)
         audio_path = "audio/special_song.mp3"
-        vc = discord.utils.get(bot.voice_clients, guild=ctx.guild)
-        if vc and vc.channel:
-            vc.stop()
-            vc.play(discord.FFmpegPCMAudio(audio_path))
-        else:
-            if ctx.author.voice and ctx.author.voice.channel:
-                vc = await ctx.author.voice.channel.connect()
-                vc.play(discord.FFmpegPCMAudio(audio_path))
+        await play_clip(ctx, audio_path)
 
         # Send the embed
         await ctx.send(embed=embed)
@@ -791,111 +1221,95 @@ async def unlock_door(ctx):
 
 
 
-@bot.command(name="collect_all_treasures")
+@bot.hybrid_command(name="collect_all_treasures", description="Collect all mystical treasures at once.")
 async def collect_all_treasures(ctx):
-    player_id = str(ctx.author.id)
+    player_id = player_key(ctx.guild, ctx.author.id)
 
     # Initialize inventory if it doesn't exist
-    if player_id not in player_inventories:
-        player_inventories[player_id] = {"items": [], "coins": []}
-
-    inventory = player_inventories[player_id]
+    inventory = get_inventory(player_id)
 
-    # Add all mystical items to the player's inventory
-    collected_treasures = mystical_items.keys()  # All treasure names
-    for treasure in collected_treasures:
-        if treasure not in inventory["items"]:  # Prevent duplicates
-            inventory["items"].append(treasure)
+    # Add all mystical items (including the key) to the player's inventory
+    inventory.collect_all_treasures()
+    if inventory.keys == 0:
+        inventory.add_key()
 
     # Save the updated inventory
-    save_inventories(player_inventories)
+    inventory_store.mark_dirty(player_id)
 
     # Notify the user
     await ctx.send(f"✨ You have collected all mystical treasures!\n"
                    f"Check your inventory with `.inventory`.")
 
 
-@bot.command(name="treasure_list")
+@bot.hybrid_command(name="treasure_list", description="View the full list of mystical treasures.")
 async def treasure_list(ctx):
     treasures = "\n".join([f"**{name}**: {desc}" for name, desc in mystical_items.items()])
     await ctx.send(f"📜 **Mystical Treasures to Collect:**\n{treasures}")
 
 
 
-@bot.command(name="collect_treasure")
+@bot.hybrid_command(name="collect_treasure", description="Collect a random mystical treasure.")
 async def collect_treasure(ctx):
-    player_id = str(ctx.author.id)
+    player_id = player_key(ctx.guild, ctx.author.id)
 
     # Initialize inventory if it doesn't exist
-    if player_id not in player_inventories:
-        player_inventories[player_id] = {"items": [], "coins": []}
-
-    inventory = player_inventories[player_id]
+    inventory = get_inventory(player_id)
     mystical_items = ["gem", "ancient scroll", "golden idol", "crystal orb", "silver chalice"]
     new_treasure = random.choice(mystical_items)
 
-    inventory["items"].append(new_treasure)
-    save_inventories(player_inventories)
+    inventory.add_extra(new_treasure)
+    inventory_store.mark_dirty(player_id)
 
     await ctx.send(f"✨ You found a mystical treasure: **{new_treasure}**!\n"
-                   f"Current treasures: {', '.join(inventory['items'])}")
+                   f"Current treasures: {', '.join(inventory.items)}")
 
 
-@bot.command(name="collect_key")
+@bot.hybrid_command(name="collect_key", description="Collect a key for unlocking special doors.")
 async def collect_key(ctx):
-    player_id = str(ctx.author.id)
+    player_id = player_key(ctx.guild, ctx.author.id)
 
     # Initialize inventory if it doesn't exist
-    if player_id not in player_inventories:
-        player_inventories[player_id] = {"items": [], "coins": []}
-
-    inventory = player_inventories[player_id]
+    inventory = get_inventory(player_id)
 
     # Check if the player already has a key
-    if "key" in inventory["items"]:
+    if inventory.keys:
         await ctx.send("🗝 You already have a key! Use it to unlock a special door before collecting another.")
         return
 
     # Add a key to the inventory
-    inventory["items"].append("key")
-    save_inventories(player_inventories)
+    inventory.add_key()
+    inventory_store.mark_dirty(player_id)
 
     await ctx.send("🗝 You collected a key! Use it wisely to unlock a special door.\n"
                    "Use .unlock to OPEN the a special PRIZE DOOR!")
 
 
-@bot.command(name="collect_coin")
+@bot.hybrid_command(name="collect_coin", description="Collect a rare coin (one of five).")
 async def collect_coin(ctx):
-    player_id = str(ctx.author.id)
+    player_id = player_key(ctx.guild, ctx.author.id)
 
     # Initialize inventory if it doesn't exist
-    if player_id not in player_inventories:
-        player_inventories[player_id] = {"items": [], "coins": []}
-
-    inventory = player_inventories[player_id]
-    required_coins = ["coin1", "coin2", "coin3", "coin4", "coin5"]
-    collected_coins = inventory["coins"]
+    inventory = get_inventory(player_id)
 
     # Check if the player already has all 5 coins
-    if set(required_coins).issubset(collected_coins):
+    if inventory.has_all_coins():
         await ctx.send("🪙 You already have all the rare coins! Try using `.open_sesame` to unlock the special door.")
         return
 
     # Add a random coin that the player doesn't already have
-    available_coins = list(set(required_coins) - set(collected_coins))
-    if available_coins:
-        new_coin = random.choice(available_coins)
-        collected_coins.append(new_coin)
-        save_inventories(player_inventories)  # Save the updated inventory
+    new_coin = inventory.random_missing_coin()
+    if new_coin:
+        inventory.add_coin(new_coin)
+        inventory_store.mark_dirty(player_id)  # Save the updated inventory
 
         await ctx.send(f"🎉 You collected a rare coin: **{new_coin}**!\n"
-                       f"Current coins: {', '.join(collected_coins)}")
+                       f"Current coins: {', '.join(inventory.coin_names)}")
     else:
         await ctx.send("✨ You've collected all the rare coins already! Use `.open_sesame` to unlock the special door.")
 
 
 
-@bot.command(name="testdoor")
+@bot.hybrid_command(name="testdoor", description="Open the prize door outcome directly.")
 async def test_door(ctx):
     # Simulate the "door" outcome directly
     outcome = "door"
@@ -914,10 +1328,8 @@ async def test_door(ctx):
     )
 
     # Attach the image if available
-    if image_path:
-        file = discord.File(image_path, filename="door.jpg")
-        embed.set_image(url="attachment://door.jpg")
-        await ctx.send(embed=embed, file=file)
+    if image_path and image_index.exists(image_path):
+        await send_embed_with_image(ctx, embed, image_path, "door.jpg")
     else:
         embed.add_field(name="Oops!", value="No images are available for this outcome.")
         await ctx.send(embed=embed)
@@ -926,10 +1338,111 @@ async def test_door(ctx):
     await play_audio(ctx, audio_files[outcome])
 
 
-@bot.command(name="special_door")
+@bot.hybrid_command(name="reload_images", description="Rescan the outcome artwork (admins only).")
+@commands.has_permissions(administrator=True)
+async def reload_images(ctx):
+    # Rescan the image folders after artwork has been added or replaced
+    await asyncio.to_thread(image_index.reload)
+    count = sum(len(images) for images in image_index.candidates.values())
+    await ctx.send(f"🖼 Reloaded {count} outcome images.")
+
+
+@bot.hybrid_command(name="throttle_stats", description="Show command throttle counters (admins only).")
+@commands.has_permissions(administrator=True)
+async def throttle_stats(ctx, member: discord.Member = None):
+    # Per-user throttle counters: one member's, or the most throttled users
+    if member:
+        stats = command_throttle.stats(member.id)
+        await ctx.send(f"{member.display_name}: {stats['allowed']} allowed, "
+                       f"{stats['throttled']} throttled, {stats['coalesced']} coalesced")
+        return
+    top = command_throttle.top_throttled()
+    if not top:
+        await ctx.send("Nobody has been throttled.")
+        return
+    lines = [f"<@{user_id}>: {stats['throttled']} throttled, {stats['coalesced']} coalesced"
+             for user_id, stats in top]
+    await ctx.send("\n".join(lines))
+
+
+@bot.hybrid_command(name="stats", description="Show bot performance stats (admins only).")
+@commands.has_permissions(administrator=True)
+async def stats(ctx):
+    # Latency percentiles (bucket upper bounds) per command and I/O operation, plus the gauges
+    def rows(name, label):
+        lines = [f"`{key}`: {h.count}× p50 ≤ {h.quantile(0.5) * 1000:g} ms, p95 ≤ {h.quantile(0.95) * 1000:g} ms"
+                 for key, h in sorted(metrics.series(name, label).items())]
+        return "\n".join(lines)[:1024] or "No data yet"
+
+    embed = discord.Embed(title="Bot Stats", color=discord.Color.dark_grey())
+    embed.add_field(name="Commands", value=rows("voicebot_command_seconds", "command"), inline=False)
+    embed.add_field(name="I/O", value=rows("voicebot_io_seconds", "op"), inline=False)
+    gauges = "\n".join(f"`{name.removeprefix('voicebot_')}`: {value:g}"
+                       for name, value in sorted(metrics.gauge_values().items()))
+    embed.add_field(name="Now", value=gauges, inline=False)
+    await ctx.send(embed=embed)
+
+
+@bot.hybrid_command(name="config", description="Show or change this server's game settings (admins only).")
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def config(ctx, setting: str = None, *, value: str = None):
+    settings = guild_config.get(ctx.guild.id)
+
+    # Without arguments, show the current settings
+    if setting is None:
+        embed = discord.Embed(title="Server Settings", color=discord.Color.dark_grey())
+        for field in CHANNEL_FIELDS:
+            channel = ctx.guild.get_channel(getattr(settings, field))
+            embed.add_field(name=field, value=channel.mention if channel else "Not set", inline=False)
+        for field in TIMEOUT_FIELDS:
+            embed.add_field(name=field, value=f"{getattr(settings, field):g}s", inline=False)
+        weights = dict(outcomes, **settings.outcome_weights)
+        embed.add_field(name="outcome_weights", value=", ".join(f"{name}={weight:g}" for name, weight in weights.items()),
+                        inline=False)
+        embed.set_footer(text="Change one with `.config <setting> <value>`; `default` resets it.")
+        await ctx.send(embed=embed)
+        return
+
+    if setting not in CHANNEL_FIELDS + TIMEOUT_FIELDS + ("outcome_weights",) or value is None:
+        await ctx.send(f"Usage: `.config <setting> <value>` with one of: "
+                       f"{', '.join(CHANNEL_FIELDS + TIMEOUT_FIELDS)}, outcome_weights.")
+        return
+
+    if value == "default":
+        new_value = None
+    elif setting in CHANNEL_FIELDS:
+        channel_id = value.strip("<#>")
+        new_value = int(channel_id) if channel_id.isdigit() else None
+        if new_value is None or ctx.guild.get_channel(new_value) is None:
+            await ctx.send(f"Channel not found: {value}")
+            return
+    elif setting in TIMEOUT_FIELDS:
+        try:
+            new_value = float(value)
+        except ValueError:
+            new_value = 0
+        if not math.isfinite(new_value) or new_value <= 0:
+            await ctx.send("Timeouts are a positive number of seconds.")
+            return
+    else:
+        try:
+            new_value = parse_weight_overrides(value, outcomes)
+        except ValueError as e:
+            await ctx.send(f"Bad weights: {e}")
+            return
+        if sum(dict(outcomes, **new_value).values()) <= 0:
+            await ctx.send("At least one outcome needs a positive weight.")
+            return
+
+    guild_config.set(ctx.guild.id, setting, new_value)
+    await ctx.send(f"`{setting}` {'reset to the default' if new_value is None else 'updated'}.")
+
+
+@bot.hybrid_command(name="special_door", description="Visit the special door.")
 async def special_door(ctx):
     # Fetch the special channel
-    special_channel = ctx.guild.get_channel(1332802606237487157)
+    special_channel = ctx.guild.get_channel(guild_config.get(ctx.guild.id).special_door_channel_id)
 
     # Create an embed for the special door
     embed = discord.Embed(
@@ -955,89 +1468,87 @@ async def special_door(ctx):
 
     # Play a special song (replace with your song file path)
     audio_path = "audio/special_song.mp3"
-    vc = discord.utils.get(bot.voice_clients, guild=ctx.guild)
-    if vc and vc.channel:
-        vc.stop()
-        vc.play(discord.FFmpegPCMAudio(audio_path))
-    else:
-        if ctx.author.voice and ctx.author.voice.channel:
-            vc = await ctx.author.voice.channel.connect()
-            vc.play(discord.FFmpegPCMAudio(audio_path))
+    await play_clip(ctx, audio_path)
 
     # Send the embed
     await ctx.send(embed=embed)
 
 
 
-@bot.command(name="reset")
+@bot.hybrid_command(name="reset", description="Clear your inventory and close your game channels.")
 async def reset(ctx):
     guild = ctx.guild
-    user_name = ctx.author.name.lower()
-    user_id = str(ctx.author.id)
+    user_id = player_key(guild, ctx.author.id)
 
     # Get the user's text and voice channels
-    text_channel = discord.utils.get(guild.channels, name=f"game-text-{user_name}")
-    voice_channel = discord.utils.get(guild.channels, name=f"game-voice-{user_name}")
+    text_channel, voice_channel = game_channels.channels(guild, ctx.author.id)
+    game_channels.unregister(ctx.author.id, guild.id)
 
     # Clear the user's inventory
     if user_id in player_inventories:
         del player_inventories[user_id]
-        save_inventories(player_inventories)  # Save updated inventories
+        inventory_store.mark_dirty(user_id)  # Save updated inventories
         await ctx.send("Your game inventory has been cleared.")
 
-    # Delete the voice channel if it exists
+    # Report which channels will be closed (before closing them, since the
+    # command may have been sent from the game text channel itself)
     if voice_channel:
-        await voice_channel.delete()
-        await ctx.send(f"Deleted your game voice channel: {voice_channel.name}")
+        await ctx.send(f"Closing your game voice channel: {voice_channel.name}")
     else:
         await ctx.send("No game voice channel found to delete.")
 
-    # Delete the text channel if it exists
     if text_channel:
-        await asyncio.sleep(3)  # Wait for 3 seconds before deleting
-        await text_channel.delete()
-        await ctx.send(f"Deleted your game text channel: {text_channel.name}")
+        await ctx.send(f"Closing your game text channel: {text_channel.name}")
     else:
         await ctx.send("No game text channel found to delete.")
 
-
     # Notify if no channels or inventory exist
     if not text_channel and not voice_channel and user_id not in player_inventories:
         await ctx.send("You don't have any saved game channels or inventory to reset.")
 
+    # Leave the voice channel before it goes, then close the channels in the
+    # background, 3 seconds from now so the messages can be read
+    if voice_channel and voice_pool.connected(voice_channel):
+        await voice_pool.disconnect(voice_channel)
+    close_game_channels(guild, text_channel, voice_channel, delay=3)
 
-@bot.command(name="end")
+
+@bot.hybrid_command(name="end", description="End your game and delete the associated channels.")
 async def end(ctx):
     guild = ctx.guild
-    user_name = ctx.author.name.lower()
-    user_id = str(ctx.author.id)
 
     # Get the user's text and voice channels
-    text_channel = discord.utils.get(guild.channels, name=f"game-text-{user_name}")
-    voice_channel = discord.utils.get(guild.channels, name=f"game-voice-{user_name}")
+    text_channel, voice_channel = game_channels.channels(guild, ctx.author.id)
+    game_channels.unregister(ctx.author.id, guild.id)
 
-    # Delete the user's voice channel
+    # Report which channels will be closed (before closing them, since the
+    # command may have been sent from the game text channel itself)
     if voice_channel:
-        await voice_channel.delete()
-        await ctx.send(f"Your game voice channel `{voice_channel.name}` has been deleted.")
+        await ctx.send(f"Your game voice channel `{voice_channel.name}` has been closed.")
     else:
         await ctx.send("No game voice channel found to delete.")
 
-    # Delete the user's text channel
     if text_channel:
-        await text_channel.delete()
-        await ctx.send(f"Your game text channel `{text_channel.name}` has been deleted.")
+        await ctx.send(f"Your game text channel `{text_channel.name}` has been closed.")
     else:
         await ctx.send("No game text channel found to delete.")
 
-
-
     # Disconnect the bot if it's in the voice channel
-    existing_vc = discord.utils.get(bot.voice_clients, guild=guild)
-    if existing_vc:
-        await existing_vc.disconnect()
+    if voice_channel and voice_pool.connected(voice_channel):
+        await voice_pool.disconnect(voice_channel)
         await ctx.send("The bot has been disconnected from the voice channel.")
 
+    # Close the channels in the background
+    close_game_channels(guild, text_channel, voice_channel)
 
-# Run the bot
-bot.run(DISCORD_TOKEN)
+
+if __name__ == "__main__":
+    # Treat SIGTERM (dyno restarts) like Ctrl+C until the lifecycle manager
+    # takes both signals over in setup_hook
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    # Run the bot, then persist any inventory changes still waiting to be saved
+    try:
+        bot.run(DISCORD_TOKEN, log_handler=None)  # Logging is already configured
+    finally:
+        inventory_store.flush_now()
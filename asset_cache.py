@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from urllib.parse import parse_qs, urlparse
+
+import discord
+
+from state_files import JsonStateFile, load_json
+
+
+# Discord CDN attachment URLs are signed; `ex` is the expiry as a hex unix timestamp
+def url_expiry(url):
+    values = parse_qs(urlparse(url).query).get("ex")
+    if not values:
+        return float("inf")
+    try:
+        return int(values[0], 16)
+    except ValueError:
+        return float("inf")
+
+
+# Maps local image paths to Discord CDN URLs so each image is uploaded once.
+# Images are uploaded to a dedicated asset channel; the channel/message IDs are
+# persisted with the URL so a fresh signed URL can be fetched before it expires.
+# Only URLs from that channel are cached: messages in game channels are purged
+# or deleted with the game, which would break every embed pointing at them.
+class AssetUrlCache:
+    def __init__(self, bot, channel_id, image_index, path="asset_urls.json", refresh_margin=6 * 3600):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.image_index = image_index
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self._pending = {}
+        self.entries = load_json(path, {})
+        self._state = JsonStateFile(path, lambda: self.entries)
+
+    # The cached URL for an image, or None if it is unknown or about to expire
+    def url_for(self, image_path):
+        entry = self.entries.get(image_path)
+        if entry and entry["expires_at"] - time.time() > self.refresh_margin:
+            return entry["url"]
+        return None
+
+    # Upload (or refresh) an image in the background; concurrent requests share one task
+    def request(self, image_path):
+        task = self._pending.get(image_path)
+        if task is None or task.done():
+            task = asyncio.create_task(self._ensure(image_path))
+            self._pending[image_path] = task
+        return task
+
+    async def _ensure(self, image_path):
+        try:
+            if image_path in self.entries:
+                url = await self.refresh(image_path)
+                if url:
+                    return url
+            return await self.upload(image_path)
+        except discord.HTTPException:
+            logging.exception(f"Could not cache asset URL for {image_path}")
+            return None
+        finally:
+            self._pending.pop(image_path, None)
+
+    def _channel(self):
+        channel = self.bot.get_channel(self.channel_id)
+        if channel is None:
+            logging.warning(f"Asset channel {self.channel_id} not found; images will be uploaded per message")
+        return channel
+
+    async def upload(self, image_path):
+        channel = self._channel()
+        if channel is None:
+            return None
+        filename = image_path.replace("/", "_")
+        message = await channel.send(file=await self.image_index.file(image_path, filename=filename))
+        return await self._store(image_path, message)
+
+    # Re-fetch the asset message to get a newly signed URL; None if the message is gone
+    async def refresh(self, image_path):
+        entry = self.entries[image_path]
+        channel = self._channel()
+        if channel is None:
+            return None
+        try:
+            message = await channel.fetch_message(entry["message_id"])
+        except discord.NotFound:
+            del self.entries[image_path]
+            self._state.changed()
+            return None
+        return await self._store(image_path, message)
+
+    async def _store(self, image_path, message):
+        if not message.attachments:
+            return None
+        url = message.attachments[0].url
+        self.entries[image_path] = {
+            "channel_id": message.channel.id,
+            "message_id": message.id,
+            "url": url,
+            "expires_at": url_expiry(url)
+        }
+        self._state.changed()
+        return url
+
+    # Upload anything missing and refresh URLs that expire within the margin
+    async def refresh_all(self, image_paths):
+        for image_path in image_paths:
+            if self.url_for(image_path) is None:
+                await self.request(image_path)
+
+    async def flush(self):
+        await self._state.flush()
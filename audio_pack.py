@@ -0,0 +1,168 @@
+import argparse
+import glob
+import mmap
+import os
+import struct
+import subprocess
+
+import discord
+
+
+# Pre-encoded Opus audio pack.
+#
+# Build it once, offline, from the MP3s in audio/:
+#     python audio_pack.py                    (writes audio/clips.opuspack)
+#
+# Layout (little endian):
+#     header      b"VBOPUS01", u32 track count
+#     directory   per track: u16 name length, name (utf-8), u64 index offset, u32 frame count
+#     per track   u64[frame count + 1] frame offsets, then the raw 20 ms Opus frames
+#
+# At runtime the pack is memory-mapped and PackedOpusSource hands slices of the
+# map straight to discord.py, so starting a clip costs no subprocess and no decode.
+
+MAGIC = b"VBOPUS01"
+DEFAULT_PACK_PATH = "audio/clips.opuspack"
+
+FRAME_MS = 20
+SAMPLE_RATE = 48000
+CHANNELS = 2
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+FRAME_BYTES = FRAME_SAMPLES * CHANNELS * 2  # 16-bit PCM
+
+
+# Pack entries are keyed by the clip's path relative to the working directory
+# ("audio/door.mp3"), which is how the bot refers to them
+def clip_name(path):
+    return os.path.relpath(path).replace(os.sep, "/")
+
+
+# Decode a file to 48 kHz stereo 16-bit PCM with ffmpeg
+def decode_pcm(path):
+    return subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-f", "s16le", "-ar", str(SAMPLE_RATE),
+         "-ac", str(CHANNELS), "pipe:1"],
+        check=True, stdout=subprocess.PIPE
+    ).stdout
+
+
+# Decode a file and encode it into Opus frames
+def encode_clip(path, bitrate_kbps):
+    pcm = decode_pcm(path)
+    encoder = discord.opus.Encoder()
+    encoder.set_bitrate(bitrate_kbps)
+    frames = []
+    for start in range(0, len(pcm), FRAME_BYTES):
+        chunk = pcm[start:start + FRAME_BYTES]
+        if len(chunk) < FRAME_BYTES:
+            chunk += b"\x00" * (FRAME_BYTES - len(chunk))
+        frames.append(encoder.encode(chunk, FRAME_SAMPLES))
+    return frames
+
+
+def write_pack(pack_path, tracks):
+    names = [name.encode("utf-8") for name in tracks]
+    directory_size = sum(2 + len(name) + 8 + 4 for name in names)
+    offset = len(MAGIC) + 4 + directory_size
+
+    directory = bytearray()
+    bodies = []
+    for name, frames in zip(names, tracks.values()):
+        index_offset = offset
+        frame_offset = index_offset + 8 * (len(frames) + 1)
+        offsets = [frame_offset]
+        for frame in frames:
+            offsets.append(offsets[-1] + len(frame))
+        directory += struct.pack("<H", len(name)) + name + struct.pack("<QI", index_offset, len(frames))
+        bodies.append(struct.pack(f"<{len(offsets)}Q", *offsets) + b"".join(frames))
+        offset = offsets[-1]
+
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(names)))
+        f.write(directory)
+        for body in bodies:
+            f.write(body)
+    os.replace(tmp_path, pack_path)
+
+
+def build_pack(sources, pack_path=DEFAULT_PACK_PATH, bitrate_kbps=96):
+    tracks = {}
+    for path in sources:
+        if not os.path.exists(path):
+            print(f"Skipping missing audio file: {path}")
+            continue
+        frames = encode_clip(path, bitrate_kbps)
+        tracks[clip_name(path)] = frames
+        print(f"Encoded {path}: {len(frames)} frames")
+    write_pack(pack_path, tracks)
+    return tracks
+
+
+# Streams one track of a pack as ready-made Opus packets
+class PackedOpusSource(discord.AudioSource):
+    def __init__(self, pack, index_offset, frame_count):
+        self._pack = pack
+        self._index_offset = index_offset
+        self._frame_count = frame_count
+        self._position = 0
+
+    def read(self):
+        if self._position >= self._frame_count:
+            return b""
+        start, end = struct.unpack_from("<QQ", self._pack.map, self._index_offset + 8 * self._position)
+        self._position += 1
+        return self._pack.view[start:end]
+
+    def is_opus(self):
+        return True
+
+    def rewind(self):
+        self._position = 0
+
+
+class AudioPack:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an audio pack")
+
+        self.tracks = {}
+        (count,) = struct.unpack_from("<I", self.map, len(MAGIC))
+        position = len(MAGIC) + 4
+        for _ in range(count):
+            (name_length,) = struct.unpack_from("<H", self.map, position)
+            position += 2
+            name = bytes(self.map[position:position + name_length]).decode("utf-8")
+            position += name_length
+            self.tracks[name] = struct.unpack_from("<QI", self.map, position)
+            position += 12
+
+    @classmethod
+    def open_if_exists(cls, path=DEFAULT_PACK_PATH):
+        if os.path.exists(path):
+            return cls(path)
+        return None
+
+    def __contains__(self, path):
+        return clip_name(path) in self.tracks
+
+    # A fresh source for the clip, or None if the clip is not in the pack
+    def source(self, path):
+        entry = self.tracks.get(clip_name(path))
+        if entry is None:
+            return None
+        return PackedOpusSource(self, *entry)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-encode the bot's audio clips into an Opus pack.")
+    parser.add_argument("sources", nargs="*", help="audio files to include (default: audio/*.mp3)")
+    parser.add_argument("-o", "--output", default=DEFAULT_PACK_PATH)
+    parser.add_argument("--bitrate", type=int, default=96, help="Opus bitrate in kbps")
+    args = parser.parse_args()
+
+    build_pack(args.sources or sorted(glob.glob("audio/*.mp3")), args.output, args.bitrate)
@@ -0,0 +1,289 @@
+import asyncio
+import itertools
+import os
+import subprocess
+import threading
+import time
+from collections import Counter
+
+import discord
+from discord.ext import commands
+
+import mixer
+from audio_pack import FRAME_BYTES
+
+_ids = itertools.count(10 ** 17)
+
+
+def next_id():
+    return next(_ids)
+
+
+# Stands in for Discord's REST API: every call waits `latency` seconds and is
+# counted by kind, so load runs report how many requests a scenario costs
+class FakeApi:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+
+    async def call(self, kind):
+        self.calls[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class FakeRole:
+    def __init__(self, guild, name):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+
+
+class FakeVoiceState:
+    def __init__(self, channel):
+        self.channel = channel
+
+
+class FakeMember:
+    def __init__(self, guild, name, bot=False):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.voice = None
+        self.mention = f"<@{self.id}>"
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.api.call("dm")
+
+    async def move_to(self, channel):
+        await self.guild.api.call("move_member")
+        if self.voice:
+            self.voice.channel.members.remove(self)
+        self.voice = FakeVoiceState(channel) if channel else None
+        if channel:
+            channel.members.append(self)
+
+
+class FakeMessage:
+    def __init__(self, state, channel, author, content="", embed=None, file=None):
+        self.id = next_id()
+        self._state = state
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.embed = embed
+        self.file = file
+        # Read by commands.Context / hybrid argument parsing
+        self.attachments = []
+        self.mentions = []
+        self.role_mentions = []
+        self.channel_mentions = []
+        self.mention_everyone = False
+        self.reference = None
+        self.interaction = None
+        self.webhook_id = None
+        self.jump_url = f"https://discord.com/channels/{self.guild.id}/{channel.id}/{self.id}"
+
+    async def delete(self):
+        await self.guild.api.call("delete_message")
+
+    async def add_reaction(self, emoji):
+        await self.guild.api.call("add_reaction")
+
+
+class FakeChannel:
+    def __init__(self, guild, name, overwrites=None):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.overwrites = dict(overwrites or {})
+        self.mention = f"<#{self.id}>"
+        self.jump_url = f"https://discord.com/channels/{guild.id}/{self.id}"
+
+    async def edit(self, name=None, overwrites=None, **kwargs):
+        await self.guild.api.call("edit_channel")
+        if name is not None:
+            self.name = name
+        if overwrites is not None:
+            self.overwrites = dict(overwrites)
+
+    async def delete(self, reason=None):
+        await self.guild.api.call("delete_channel")
+        self.guild.channels.pop(self.id, None)
+
+
+class FakeTextChannel(FakeChannel):
+    def __init__(self, guild, name, overwrites=None):
+        super().__init__(guild, name, overwrites)
+        self.messages_sent = 0
+
+    async def send(self, content=None, embed=None, file=None, **kwargs):
+        await self.guild.api.call("send_message")
+        self.messages_sent += 1
+        if file is not None:
+            file.close()
+        return FakeMessage(self.guild.state, self, self.guild.me, content or "", embed, file)
+
+    async def purge(self, limit=None):
+        await self.guild.api.call("purge")
+        self.messages_sent = 0
+
+
+class FakeVoiceChannel(FakeChannel):
+    def __init__(self, guild, name, overwrites=None):
+        super().__init__(guild, name, overwrites)
+        self.members = []
+
+    async def connect(self):
+        await self.guild.api.call("voice_connect")
+        return FakeVoiceClient(self)
+
+
+# A voice connection whose audio goes nowhere. Sources are drained on a thread
+# at `speed` times real time (20 ms per frame), like discord.py's AudioPlayer,
+# so ffmpeg processes live as long as they would in production; speed 0
+# finishes every clip immediately without reading it.
+class FakeVoiceClient:
+    speed = 1.0
+    frames_played = 0
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.guild = channel.guild
+        self._connected = True
+        self._player = None
+        self._source = None
+        self._stop = None
+
+    # Like VoiceClient.source: what the player is (or was last) playing
+    @property
+    def source(self):
+        return self._source if self._player is not None else None
+
+    def is_connected(self):
+        return self._connected
+
+    def is_playing(self):
+        return self._player is not None and self._player.is_alive()
+
+    def is_paused(self):
+        return False
+
+    async def move_to(self, channel):
+        await self.guild.api.call("voice_move")
+        self.channel = channel
+
+    async def disconnect(self, force=False):
+        self.stop()
+        self._connected = False
+
+    def play(self, source, after=None):
+        self.stop()
+        stop = self._stop = threading.Event()
+        self._source = source
+        self._player = threading.Thread(target=self._drain, args=(source, after, stop), daemon=True)
+        self._player.start()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+        self._stop = None
+
+    def _drain(self, source, after, stop):
+        error = None
+        try:
+            if self.speed > 0:
+                delay = 0.02 / self.speed
+                while not stop.is_set() and source.read():
+                    FakeVoiceClient.frames_played += 1
+                    time.sleep(delay)
+        except Exception as e:
+            error = e
+        finally:
+            source.cleanup()
+        if after is not None:
+            after(error)
+
+
+# Stand-ins for ffmpeg: every clip that exists "decodes" to `FAKE_CLIP_SECONDS`
+# of silence, so runs don't need ffmpeg installed. Missing files fail the way
+# ffmpeg does.
+FAKE_CLIP_SECONDS = 2.0
+FAKE_CLIP_FRAMES = int(FAKE_CLIP_SECONDS * 50)
+
+
+def fake_decode_pcm(path):
+    if not os.path.exists(path):
+        raise subprocess.CalledProcessError(1, ["ffmpeg", "-i", path])
+    return bytes(FAKE_CLIP_FRAMES * FRAME_BYTES)
+
+
+class FakePCMAudio(discord.AudioSource):
+    def __init__(self, source, **kwargs):
+        self.remaining = FAKE_CLIP_FRAMES
+
+    def read(self):
+        if not self.remaining:
+            return b""
+        self.remaining -= 1
+        return bytes(FRAME_BYTES)
+
+    def is_opus(self):
+        return False
+
+
+# Route the bot's audio decoding (the mixer's clip cache and discord.FFmpegPCMAudio) to the fakes
+def install_fake_audio():
+    mixer.decode_pcm = fake_decode_pcm
+    discord.FFmpegPCMAudio = FakePCMAudio
+
+
+class FakeGuild:
+    def __init__(self, state, api, name):
+        self.id = next_id()
+        self.state = state
+        self.api = api
+        self.name = name
+        self.channels = {}
+        self.members = {}
+        self.default_role = FakeRole(self, "@everyone")
+        self.me = FakeMember(self, "VoiceBot", bot=True)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    # Used by the client's get_channel() when resolving across guilds
+    def _resolve_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+    def add_member(self, name):
+        member = FakeMember(self, name)
+        self.members[member.id] = member
+        return member
+
+    def add_text_channel(self, name, overwrites=None):
+        channel = FakeTextChannel(self, name, overwrites)
+        self.channels[channel.id] = channel
+        return channel
+
+    async def create_text_channel(self, name, overwrites=None, **kwargs):
+        await self.api.call("create_channel")
+        return self.add_text_channel(name, overwrites)
+
+    async def create_voice_channel(self, name, overwrites=None, **kwargs):
+        await self.api.call("create_channel")
+        channel = FakeVoiceChannel(self, name, overwrites)
+        self.channels[channel.id] = channel
+        return channel
+
+
+# Context whose replies go to the fake channel instead of the HTTP client
+class FakeContext(commands.Context):
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
@@ -0,0 +1,365 @@
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_discord import (FakeApi, FakeContext, FakeGuild, FakeMember, FakeMessage, FakeVoiceClient, FakeVoiceState,
+                          install_fake_audio)
+from metrics import child_processes
+
+
+# Offline load test for app3.py.
+#
+# Thousands of simulated players, spread over fake guilds, each run
+# `.start` -> `.open` x N -> `.unlock` -> `.open_sesame` -> `.end` against the
+# real command handlers. Discord is replaced by the in-process fakes in
+# fake_discord.py (REST calls only sleep for --api-latency; voice audio is
+# drained into a no-op sink; clips decode to silence unless --ffmpeg is given).
+# Every command is sent as a message through the bot's on_message, so it passes
+# the throttle and the per-player actors like a real one. A throttled `.open`
+# is left to the bot to answer with the others; any other throttled command is
+# sent again after --retry seconds. The THROTTLE_* variables apply as usual.
+#
+# The report is JSON: per-command latency percentiles (of successful runs,
+# from message to completion, queueing included), error and throttle counts,
+# event-loop lag, inventory save times, REST call counts and peak file
+# descriptors, ffmpeg processes and RSS. Any failed command makes the run exit
+# non-zero. Pass --baseline with an earlier report to compare.
+#
+#     python bench/loadtest.py --players 2000 --opens 10 --output after.json --baseline before.json
+
+SCRIPT = ["start", "open", "unlock", "open_sesame", "end"]
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Count, mean and percentiles of a list of seconds, reported in milliseconds
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99": round(percentile(ordered, 0.99) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3)
+    }
+
+
+def open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.throttled = Counter()
+        self.outcomes = {}
+        self.invoked = set()
+        self.loop_lag = []
+        self.saves = []
+        self.peaks = {"fds": 0, "ffmpeg": 0, "rss_mb": 0.0}
+
+    # Resolve each message's outcome (None, or the error) when the bot finishes its command
+    def watch(self, bot):
+        invoke = bot.invoke
+
+        async def watched(ctx):
+            self.invoked.add(ctx.message.id)
+            try:
+                await invoke(ctx)
+            except Exception as e:
+                self._resolve(ctx, e)
+                raise
+
+        async def completed(ctx):
+            self._resolve(ctx, None)
+
+        async def failed(ctx, error):
+            self._resolve(ctx, error)
+
+        bot.invoke = watched
+        bot.add_listener(completed, "on_command_completion")
+        bot.add_listener(failed, "on_command_error")
+
+    def _resolve(self, ctx, error):
+        self.invoked.discard(ctx.message.id)
+        outcome = self.outcomes.pop(ctx.message.id, None)
+        if outcome is not None and not outcome.done():
+            outcome.set_result(error)
+
+    def expect(self, message):
+        outcome = self.outcomes[message.id] = asyncio.get_running_loop().create_future()
+        return outcome
+
+    # Only successful commands are timed; failures are counted by error type
+    def record(self, name, seconds, error):
+        if error is None:
+            self.latency[name].append(seconds)
+            return
+        error = getattr(error, "original", error)
+        if not self.errors[name]:
+            logging.error(f".{name} failed", exc_info=error)
+        self.errors[name][type(error).__name__] += 1
+
+    # Time every inventory write the store makes (they run on a worker thread)
+    def time_saves(self, store):
+        write = store.backend.write
+
+        def timed(payload):
+            start = time.perf_counter()
+            try:
+                return write(payload)
+            finally:
+                self.saves.append(time.perf_counter() - start)
+
+        store.backend.write = timed
+
+    # Samples event-loop lag and resource usage until cancelled
+    async def monitor(self, interval=0.1):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(loop.time() - start - interval, 0))
+            self.peaks["fds"] = max(self.peaks["fds"], open_fds() or 0)
+            self.peaks["ffmpeg"] = max(self.peaks["ffmpeg"], child_processes("ffmpeg"))
+            self.peaks["rss_mb"] = max(self.peaks["rss_mb"], rss_mb())
+
+
+# Point the bot's state files at a scratch directory before app3 is imported
+def configure_environment(workdir, args):
+    os.environ.update({
+        "INVENTORY_FILE": os.path.join(workdir, "player_inventories.json"),
+        "INVENTORY_DB": os.path.join(workdir, "player_inventories.db"),
+        "INVENTORY_BACKEND": args.backend,
+        "GAME_CHANNELS_FILE": os.path.join(workdir, "game_channels.json"),
+        "CHANNEL_POOL_FILE": os.path.join(workdir, "channel_pool.json"),
+        "CHANNEL_POOL_SIZE": str(args.pool_size),
+        "TEARDOWN_FILE": os.path.join(workdir, "pending_teardown.json"),
+        "GUILD_CONFIG_FILE": os.path.join(workdir, "guild_config.json"),
+        "OUTCOME_SEED": str(args.seed),
+        "ASSET_CHANNEL_ID": "",
+        "LOG_FILE": os.path.join(workdir, "bot.log"),
+        "LOG_LEVEL": "WARNING"
+    })
+
+
+async def play(app, recorder, guild, member, lobby, args):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+
+    async def command(name, channel):
+        while True:
+            message = FakeMessage(guild.state, channel, member, f".{name}")
+            outcome = recorder.expect(message)
+            start = time.perf_counter()
+            await app.on_message(message)
+            # Read-only commands have run by now; the rest are waiting in the player's actor
+            actor = app.player_actors.actors.get(member.id)
+            if message.id in recorder.invoked or (actor is not None and actor.pending(name)):
+                recorder.record(name, time.perf_counter() - start, await outcome)
+                break
+            del recorder.outcomes[message.id]
+            recorder.throttled[name] += 1
+            if name == "open":
+                break
+            await asyncio.sleep(args.retry)
+        if args.think:
+            await asyncio.sleep(args.think)
+
+    await command("start", lobby)
+
+    # Walk into the game's channels like a player would
+    text_channel, voice_channel = app.game_channels.channels(guild, member.id)
+    if voice_channel:
+        member.voice = FakeVoiceState(voice_channel)
+        voice_channel.members.append(member)
+    channel = text_channel or lobby
+
+    for _ in range(args.opens):
+        await command("open", channel)
+    await command("unlock", channel)
+    await command("open_sesame", channel)
+    await command("end", lobby)
+
+    if member.voice:
+        member.voice.channel.members.remove(member)
+        member.voice = None
+
+
+async def run(app, args):
+    recorder = Recorder()
+    api = FakeApi(args.api_latency)
+    FakeVoiceClient.speed = args.audio_speed
+    if not args.ffmpeg:
+        install_fake_audio()
+    app.bot.loop = asyncio.get_running_loop()  # Normally set on login; bot.dispatch needs it
+    recorder.watch(app.bot)
+    state = app.bot._connection
+
+    # Commands that build their own context (e.g. `.start` opening the menu) get fakes too
+    app.bot.get_context = functools.partial(app.bot.get_context, cls=FakeContext)
+    state.user = FakeMember(None, "VoiceBot", bot=True)
+
+    guilds = []
+    for i in range(args.guilds):
+        guild = FakeGuild(state, api, f"guild-{i}")
+        state._guilds[guild.id] = guild
+        guilds.append((guild, guild.add_text_channel("lobby")))
+
+    recorder.time_saves(app.inventory_store)
+    app.inventory_store.start()
+    app.channel_reaper.start()
+    app.inactivity.start()
+    monitor = asyncio.create_task(recorder.monitor())
+
+    started = time.perf_counter()
+    players = []
+    for i in range(args.players):
+        guild, lobby = guilds[i % len(guilds)]
+        players.append(play(app, recorder, guild, guild.add_member(f"player{i}"), lobby, args))
+    await asyncio.gather(*players)
+    # Throttled `.open`s are still being answered
+    while app.deferred_opens or any(actor.mailbox or actor.running for actor in app.player_actors.actors.values()):
+        await asyncio.sleep(0.05)
+    duration = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    await app.inventory_store.flush()
+    final_flush = time.perf_counter() - flush_started
+    await app.voice_pool.disconnect_all()
+    monitor.cancel()
+
+    return {
+        "version": git_version(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "duration_s": round(duration, 3),
+        "commands_per_s": round(sum(len(s) for s in recorder.latency.values()) / duration, 1),
+        "failed_commands": sum(sum(errors.values()) for errors in recorder.errors.values()),
+        "throttled_commands": sum(recorder.throttled.values()),
+        "commands": {
+            name: dict(summarize(recorder.latency[name]), errors=dict(recorder.errors[name]),
+                       throttled=recorder.throttled[name])
+            for name in SCRIPT
+        },
+        "loop_lag_ms": summarize(recorder.loop_lag),
+        "inventory_save_ms": summarize(recorder.saves),
+        "final_flush_ms": round(final_flush * 1000, 3),
+        "api_calls": dict(api.calls),
+        "audio_frames": FakeVoiceClient.frames_played,
+        "teardown_backlog": len(app.channel_reaper),
+        "peak": {key: round(value, 1) for key, value in recorder.peaks.items()},
+        "final_rss_mb": round(rss_mb(), 1)
+    }
+
+
+# Compare p95s with an earlier report; returns the metrics that got slower by
+# more than `tolerance` (a fraction)
+def compare(report, baseline, tolerance):
+    rows = [(f"{name} p95", report["commands"][name].get("p95"), baseline["commands"].get(name, {}).get("p95"))
+            for name in SCRIPT]
+    rows.append(("loop lag p95", report["loop_lag_ms"].get("p95"), baseline["loop_lag_ms"].get("p95")))
+    rows.append(("inventory save p95", report["inventory_save_ms"].get("p95"),
+                 baseline["inventory_save_ms"].get("p95")))
+    rows.append(("peak rss MB", report["peak"]["rss_mb"], baseline["peak"]["rss_mb"]))
+
+    regressions = []
+    for label, current, previous in rows:
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        print(f"{label:>20}: {previous:10.3f} -> {current:10.3f} ({change:+.0%})", file=sys.stderr)
+        if change > tolerance:
+            regressions.append(label)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the VoiceBot game")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--opens", type=int, default=10, help="`.open`s per player")
+    parser.add_argument("--think", type=float, default=0.05, help="seconds between a player's commands")
+    parser.add_argument("--ramp", type=float, default=5.0, help="players start spread over this many seconds")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per fake REST call")
+    parser.add_argument("--audio-speed", type=float, default=1.0,
+                        help="audio drain speed relative to real time; 0 skips playback")
+    parser.add_argument("--retry", type=float, default=1.0, help="seconds before resending a throttled command")
+    parser.add_argument("--ffmpeg", action="store_true", help="decode clips with ffmpeg instead of into silence")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--pool-size", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown before failing")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir, args)
+        os.chdir(ROOT)  # Audio and image paths are relative to the repository
+        import app3
+        report = asyncio.run(run(app3, args))
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    # Latencies of a run where commands fail don't describe the bot; don't let it pass as a result
+    if report["failed_commands"]:
+        sys.exit(f"{report['failed_commands']} commands failed; see the errors in the report")
+
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(f"Slower than baseline: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+# Extra record attributes copied into JSON output
+CONTEXT_FIELDS = ("category", "guild", "user", "command", "channel")
+
+
+# One JSON object per line with the message, level, logger and any context fields
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Keeps 1 in N records per category (records without a category are all kept)
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._counters = {category: itertools.count() for category in self.rates}
+
+    def filter(self, record):
+        category = getattr(record, "category", None)
+        rate = self.rates.get(category)
+        if not rate or rate <= 1:
+            return True
+        return next(self._counters[category]) % rate == 0
+
+
+# Hands records to the listener thread. The message and traceback are
+# rendered into strings here, so the queued record holds no references to
+# the caller's arguments or exception; formatting and writing happen on the
+# listener thread.
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# "activity=100,voice=10" -> {"activity": 100, "voice": 10}
+def parse_sample_rates(spec):
+    rates = {}
+    for item in (spec or "").split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = int(rate)
+    return rates
+
+
+# Route all logging through a queue to a background listener thread that
+# writes a rotating log file and stderr. Rotation is by size unless `when`
+# (a TimedRotatingFileHandler interval such as "midnight") is given. Returns
+# the listener; it is stopped, flushing the queue, at exit.
+def setup_logging(path="bot.log", level=logging.INFO, json_format=True, max_bytes=10 * 1024 * 1024,
+                  backup_count=5, when=None, sample_rates=None):
+    if when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count,
+                                                                 encoding="utf-8")
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                            encoding="utf-8")
+    stream_handler = logging.StreamHandler(sys.stderr)
+
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler.setFormatter(formatter)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+# Flush and stop the listener; safe if it was already stopped
+def _stop_listener(listener):
+    if listener._thread is not None:
+        listener.stop()
+
+
+# Context fields for a log call about a command invocation
+def command_fields(ctx, category="command"):
+    return {
+        "category": category,
+        "guild": ctx.guild.id if ctx.guild else None,
+        "user": ctx.author.id,
+        "command": ctx.command.name if ctx.command else None
+    }
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections import deque
+
+import discord
+
+from state_files import JsonStateFile, load_json
+
+POOL_TEXT_NAME = "pool-text"
+POOL_VOICE_NAME = "pool-voice"
+
+
+# Pooled channels are hidden from everyone except the bot
+def hidden_overwrites(guild):
+    return {
+        guild.default_role: discord.PermissionOverwrite(view_channel=False),
+        guild.me: discord.PermissionOverwrite(view_channel=True, manage_channels=True, manage_messages=True,
+                                              connect=True, speak=True, move_members=True)
+    }
+
+
+# Warm pool of pre-created, hidden (text, voice) channel pairs per guild, so
+# `.start` only has to rename a pair and clear its overwrites (leaving it just
+# like a newly created channel) instead of creating two channels. Pairs are handed out oldest first, which spreads
+# renames out under Discord's per-channel rename limit. Pool membership is
+# persisted so pairs survive restarts. A pair that fails to be handed out may
+# already be half opened up, so it is passed to `discard(guild, channels)`
+# (the teardown queue, which scrubs or deletes it) rather than dropped.
+class ChannelPool:
+    def __init__(self, target_size, path="channel_pool.json", discard=None):
+        self.target_size = target_size
+        self.discard = discard
+        self.pairs = {}
+        self._refills = {}
+        self._state = JsonStateFile(path, self._snapshot)
+        for guild_id, pairs in load_json(path, {}).items():
+            self.pairs[int(guild_id)] = deque(tuple(pair) for pair in pairs)
+
+    def _snapshot(self):
+        return {str(guild_id): [list(pair) for pair in pairs] for guild_id, pairs in self.pairs.items()}
+
+    @property
+    def enabled(self):
+        return self.target_size > 0
+
+    def size(self, guild_id):
+        return len(self.pairs.get(guild_id, ()))
+
+    # Take a pooled pair for a new game; returns (None, None) if the pool is empty
+    async def claim(self, guild, text_name, voice_name):
+        pairs = self.pairs.get(guild.id)
+        while pairs:
+            text_id, voice_id = pairs.popleft()
+            self._state.changed()
+            text_channel, voice_channel = guild.get_channel(text_id), guild.get_channel(voice_id)
+            if text_channel is None or voice_channel is None:
+                continue  # Deleted while pooled
+            self.refill(guild)
+            overwrites = {}
+            try:
+                await text_channel.edit(**self._edit_args(text_channel, text_name, overwrites))
+                await voice_channel.edit(**self._edit_args(voice_channel, voice_name, overwrites))
+            except discord.HTTPException:
+                logging.exception(f"Could not claim pooled channels in guild {guild.id}")
+                if self.discard is not None:
+                    self.discard(guild, (text_channel, voice_channel))
+                continue
+            return text_channel, voice_channel
+        self.refill(guild)
+        return None, None
+
+    # Skip the rename when the name already matches; renames are heavily rate limited
+    def _edit_args(self, channel, name, overwrites):
+        args = {"overwrites": overwrites}
+        if channel.name != name:
+            args["name"] = name
+        return args
+
+    # Scrub a finished game's pair and put it back in the pool.
+    # Returns False if the pool is full (or disabled) and the caller should delete it.
+    async def release(self, guild, text_channel, voice_channel):
+        if self.size(guild.id) >= self.target_size:
+            return False
+        try:
+            await text_channel.edit(overwrites=hidden_overwrites(guild))
+            await voice_channel.edit(overwrites=hidden_overwrites(guild))
+            for member in list(voice_channel.members):
+                if member != guild.me:
+                    await member.move_to(None)
+            await text_channel.purge(limit=None)
+        except discord.HTTPException:
+            logging.exception(f"Could not return channels to the pool in guild {guild.id}")
+            return False
+        self.pairs.setdefault(guild.id, deque()).append((text_channel.id, voice_channel.id))
+        self._state.changed()
+        return True
+
+    # Top the guild's pool up to the target size in the background
+    def refill(self, guild):
+        task = self._refills.get(guild.id)
+        if self.enabled and (task is None or task.done()):
+            self._refills[guild.id] = asyncio.create_task(self._refill(guild))
+
+    async def _refill(self, guild):
+        while self.size(guild.id) < self.target_size:
+            try:
+                overwrites = hidden_overwrites(guild)
+                text_channel = await guild.create_text_channel(POOL_TEXT_NAME, overwrites=overwrites)
+                voice_channel = await guild.create_voice_channel(POOL_VOICE_NAME, overwrites=overwrites)
+            except discord.HTTPException:
+                logging.exception(f"Could not pre-create game channels in guild {guild.id}")
+                return
+            self.pairs.setdefault(guild.id, deque()).append((text_channel.id, voice_channel.id))
+            self._state.changed()
+
+    async def flush(self):
+        await self._state.flush()
+
+    def channel_deleted(self, guild_id, channel_id):
+        pairs = self.pairs.get(guild_id)
+        if not pairs:
+            return
+        remaining = deque(pair for pair in pairs if channel_id not in pair)
+        if len(remaining) != len(pairs):
+            self.pairs[guild_id] = remaining
+            self._state.changed()
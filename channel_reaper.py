@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+import discord
+
+from state_files import JsonStateFile, load_json
+
+
+# Background teardown queue for game channels.
+#
+# Commands enqueue a job and return immediately. Each job lists a guild's
+# channel IDs and whether the pair may be recycled into the warm pool first.
+# The worker takes up to `batch_size` due jobs at a time and runs them
+# concurrently (channel deletes are rate limited per channel, so a batch does
+# not contend for one bucket), pauses `batch_interval` seconds between batches
+# to stay clear of the guild-wide limits, and retries 429s, 5xx responses and
+# connection errors with exponential backoff. Pending jobs are persisted so
+# teardown resumes after a restart.
+class ChannelReaper:
+    def __init__(self, bot, pool, path="pending_teardown.json", batch_size=5, batch_interval=1.0,
+                 max_attempts=6, max_backoff=300):
+        self.bot = bot
+        self.pool = pool
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.jobs = load_json(path, [])
+        self._state = JsonStateFile(path, lambda: self.jobs)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._in_flight = []
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def enqueue(self, guild, channels, recycle=True, delay=0):
+        channel_ids = [channel.id for channel in channels if channel]
+        if not channel_ids:
+            return
+        self.jobs.append({
+            "guild_id": guild.id,
+            "channel_ids": channel_ids,
+            "recycle": recycle and len(channel_ids) == 2,
+            "attempts": 0,
+            "not_before": time.time() + delay
+        })
+        self._state.changed()
+        self._wakeup.set()
+
+    # Start the worker (safe to call again on reconnect)
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = [job for job in self.jobs if job["not_before"] <= now][:self.batch_size]
+            if not due:
+                timeout = min((job["not_before"] for job in self.jobs), default=now + 3600) - now
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for job in due:
+                self.jobs.remove(job)
+            self._in_flight = due
+            retries = await asyncio.gather(*(self._process(job) for job in due))
+            self._in_flight = []
+            self.jobs.extend(job for job in retries if job is not None)
+            self._state.changed()
+            await asyncio.sleep(self.batch_interval)
+
+    # Stop the worker and save the queue; jobs cut off mid-batch are kept and
+    # run again on the next start (deleting a deleted channel is harmless)
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            self.jobs.extend(self._in_flight)
+            self._in_flight = []
+            self._state.changed()
+        await self._state.flush()
+
+    # Returns the job to retry, or None when it is finished (or given up)
+    async def _process(self, job):
+        guild = self.bot.get_guild(job["guild_id"])
+        if guild is None:
+            return None
+        channels = [guild.get_channel(channel_id) for channel_id in job["channel_ids"]]
+        channels = [channel for channel in channels if channel is not None]
+
+        if job["recycle"] and len(channels) == 2 and await self.pool.release(guild, *channels):
+            return None
+
+        remaining = []
+        for channel in channels:
+            try:
+                await channel.delete(reason="Game ended")
+            except discord.NotFound:
+                pass
+            except discord.Forbidden:
+                logging.error(f"Missing permission to delete channel {channel.id} in guild {guild.id}")
+            except discord.HTTPException as e:
+                if e.status == 429 or e.status >= 500:
+                    remaining.append(channel.id)
+                else:
+                    logging.error(f"Could not delete channel {channel.id}: {e}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                remaining.append(channel.id)
+
+        if not remaining:
+            return None
+        job["attempts"] += 1
+        if job["attempts"] >= self.max_attempts:
+            logging.error(f"Giving up deleting channels {remaining} in guild {guild.id}")
+            return None
+        job["channel_ids"] = remaining
+        job["recycle"] = False
+        job["not_before"] = time.time() + min(2 ** job["attempts"], self.max_backoff)
+        return job
@@ -0,0 +1,113 @@
+import discord
+
+from state_files import JsonStateFile, load_json
+
+TEXT_PREFIX = "game-text-"
+VOICE_PREFIX = "game-voice-"
+
+
+# Persistent map of (guild ID, user ID) -> the guild and channel IDs of that
+# player's game there, with a reverse index from channel ID so channel events
+# resolve in O(1). Channels are looked up with guild.get_channel() instead of
+# scanning by name. A player can have a game in each guild.
+class ChannelRegistry:
+    def __init__(self, path="game_channels.json"):
+        self.games = {}
+        self._by_channel = {}
+        self._state = JsonStateFile(path, self._snapshot)
+        for user_key, entry in load_json(path, {}).items():
+            # Keys are "guild:user" ("user" in files from before games were per guild)
+            self._index((entry["guild_id"], int(user_key.rpartition(":")[2])), entry)
+
+    def _index(self, game_key, entry):
+        self.games[game_key] = entry
+        for key in ("text_id", "voice_id"):
+            if entry.get(key):
+                self._by_channel[entry[key]] = game_key
+
+    def __contains__(self, game_key):
+        return game_key in self.games
+
+    def get(self, guild_id, user_id):
+        return self.games.get((guild_id, user_id))
+
+    # The user ID whose game uses `channel_id`, or None
+    def owner_of(self, channel_id):
+        game_key = self._by_channel.get(channel_id)
+        return game_key[1] if game_key else None
+
+    def register(self, user_id, guild_id, text_id=None, voice_id=None):
+        self.unregister(user_id, guild_id, save=False)
+        self._index((guild_id, user_id), {"guild_id": guild_id, "text_id": text_id, "voice_id": voice_id})
+        self._changed()
+
+    def unregister(self, user_id, guild_id, save=True):
+        entry = self.games.pop((guild_id, user_id), None)
+        if entry is None:
+            return None
+        for key in ("text_id", "voice_id"):
+            self._by_channel.pop(entry.get(key), None)
+        if save:
+            self._changed()
+        return entry
+
+    # The user's (text channel, voice channel) in `guild`; either may be None
+    def channels(self, guild, user_id):
+        entry = self.games.get((guild.id, user_id))
+        if entry is None:
+            return None, None
+        text_channel = guild.get_channel(entry["text_id"]) if entry.get("text_id") else None
+        voice_channel = guild.get_channel(entry["voice_id"]) if entry.get("voice_id") else None
+        return text_channel, voice_channel
+
+    # Keep the registry in sync when a game channel is deleted outside the bot
+    def channel_deleted(self, channel_id):
+        game_key = self._by_channel.pop(channel_id, None)
+        if game_key is None:
+            return None
+        entry = self.games[game_key]
+        for key in ("text_id", "voice_id"):
+            if entry.get(key) == channel_id:
+                entry[key] = None
+        if not entry.get("text_id") and not entry.get("voice_id"):
+            del self.games[game_key]
+        self._changed()
+        return game_key[1]
+
+    # Adopt a game channel created outside `.start` when it is clearly owned by
+    # one member (a per-member permission overwrite on a game-* channel)
+    def channel_created(self, channel):
+        if isinstance(channel, discord.TextChannel) and channel.name.startswith(TEXT_PREFIX):
+            key = "text_id"
+        elif isinstance(channel, discord.VoiceChannel) and channel.name.startswith(VOICE_PREFIX):
+            key = "voice_id"
+        else:
+            return None
+
+        # Uncached members (lean startup profile) appear as discord.Object targets
+        owners = [target for target in channel.overwrites
+                  if (isinstance(target, discord.Member) and not target.bot)
+                  or (isinstance(target, discord.Object) and target.type is discord.Member)]
+        if len(owners) != 1 or self.owner_of(channel.id) is not None:
+            return None
+
+        user_id = owners[0].id
+        game_key = (channel.guild.id, user_id)
+        entry = self.games.get(game_key)
+        if entry is None:
+            entry = {"guild_id": channel.guild.id, "text_id": None, "voice_id": None}
+        elif entry.get(key):
+            self._by_channel.pop(entry[key], None)
+        entry[key] = channel.id
+        self._index(game_key, entry)
+        self._changed()
+        return user_id
+
+    def _changed(self):
+        self._state.changed()
+
+    async def flush(self):
+        await self._state.flush()
+
+    def _snapshot(self):
+        return {f"{guild_id}:{user_id}": entry for (guild_id, user_id), entry in self.games.items()}
@@ -0,0 +1,58 @@
+# Game catalogue shared by the bot and the tools that model it
+
+# Dictionary of treasures with descriptions
+mystical_items = {
+    "Ruby of Radiance": "A gem that glows with the fiery light of dawn.",
+    "Sapphire of Serenity": "A tranquil blue gem that calms the soul.",
+    "Emerald of Eternity": "A deep green gem said to hold the secret of everlasting life.",
+    "Diamond of Destiny": "A brilliant diamond that sparkles with glimpses of the future.",
+    "Amethyst of Ambition": "A regal purple gem that inspires greatness.",
+    "Golden Idol of the Sun": "A golden figurine that radiates warmth and light.",
+    "Crystal Orb of Visions": "A clear orb said to reveal glimpses of hidden truths.",
+    "Silver Chalice of Eternity": "A finely crafted cup that never runs dry.",
+    "Enchanted Scroll of Wisdom": "A magical scroll containing knowledge of ancient times.",
+    "Obsidian Dagger of Shadows": "A sleek blade that blends with the darkness.",
+    "Wand of Starlight": "A wand that sparkles with celestial magic.",
+    "Ring of Infinite Echoes": "A mysterious ring that whispers forgotten secrets.",
+    "Pendant of the Forgotten Realm": "A jeweled pendant that connects to another world.",
+    "Tome of the Ancients": "A leather-bound book brimming with arcane power.",
+    "Cloak of Hidden Paths": "A shadowy cloak that conceals the wearer.",
+    "Dragon Scale": "A shimmering scale from a mighty dragon.",
+    "Phoenix Feather": "A blazing feather from an immortal phoenix.",
+    "Starlit Crown": "A golden crown adorned with tiny stars.",
+    "Moonlit Mirror": "A silver mirror that reflects only in moonlight.",
+    "Eternal Flame in a Bottle": "A bottle that holds an undying flame.",
+    "key": "A KEY to UNLOCK a HIDDEN DOOR!"
+}
+
+# Define outcomes and weights
+outcomes = {
+    "hallway": 50,
+    "fall": 30,
+    "trapped": 20,
+    "door": 10,
+    "treasure": 15,
+    "key": 10,
+    "rare_coin": 10
+}
+
+# Text shown for each outcome
+outcome_texts = {
+    "hallway": {"title": "You found a Hallway!",
+                "description": "The door creaks open, and you step into a dimly lit hallway. Where will it lead?"},
+    "fall": {"title": "You Fell!",
+             "description": "The ground beneath your feet gives way, and you tumble down into the unknown. Ouch!"},
+    "trapped": {"title": "You're Trapped!",
+                "description": "The door slams shut behind you. You're trapped! Look around for clues to escape."},
+    "door": {"title": "You Found a Door to the Prize!",
+             "description": "Congratulations! Use `.choose` to claim your reward!"},
+    "treasure": {"title": "You Found a Treasure Chest!",
+                 "description": "Inside the chest, you discover something magical!"},
+    "key": {"title": "You Found a Key!",
+            "description": "A mysterious key lies on the ground. What door might it unlock? 🗝"},
+    "rare_coin": {"title": "You Found a Rare Coin!",
+                  "description": "One of the five rare coins glimmers in the corner. Collect them all! 🪙"}
+}
+
+# Required coins
+required_coins = ["coin1", "coin2", "coin3", "coin4", "coin5"]
@@ -0,0 +1,82 @@
+import math
+
+from state_files import JsonStateFile, load_json
+
+CHANNEL_FIELDS = ("announce_channel_id", "unlock_channel_id", "final_door_channel_id", "special_door_channel_id")
+TIMEOUT_FIELDS = ("inactivity_timeout", "voice_idle_timeout")
+
+
+# One guild's settings: the channels the game links to, `.open` weight
+# overrides (on top of the game's weights) and timeouts in seconds. Anything a
+# guild hasn't set falls back to the deployment-wide defaults.
+class GuildSettings:
+    __slots__ = CHANNEL_FIELDS + TIMEOUT_FIELDS + ("outcome_weights",)
+
+    def __init__(self, outcome_weights=None, **values):
+        for field in CHANNEL_FIELDS + TIMEOUT_FIELDS:
+            setattr(self, field, values.get(field))
+        self.outcome_weights = dict(outcome_weights or {})
+
+    def to_record(self):
+        record = {field: getattr(self, field) for field in CHANNEL_FIELDS + TIMEOUT_FIELDS
+                  if getattr(self, field) is not None}
+        if self.outcome_weights:
+            record["outcome_weights"] = self.outcome_weights
+        return record
+
+
+# "hallway=40,treasure=25" -> {"hallway": 40.0, "treasure": 25.0}, checked against `known` outcomes
+def parse_weight_overrides(spec, known):
+    overrides = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip():
+            continue
+        if name.strip() not in known:
+            raise ValueError(f"Unknown outcome: {name.strip()}")
+        weight = float(value)
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Weight for {name.strip()} must be a non-negative number")
+        overrides[name.strip()] = weight
+    return overrides
+
+
+# Persistent guild ID -> GuildSettings. get() returns the guild's settings
+# merged over `defaults` (a GuildSettings with every field filled in), so
+# callers never deal with unset values.
+class GuildConfigStore:
+    def __init__(self, defaults, path="guild_config.json"):
+        self.defaults = defaults
+        self.guilds = {int(guild_id): GuildSettings(**record) for guild_id, record in load_json(path, {}).items()}
+        self._merged = {}
+        self._state = JsonStateFile(path, self._snapshot)
+
+    def _snapshot(self):
+        return {str(guild_id): settings.to_record() for guild_id, settings in self.guilds.items()}
+
+    def get(self, guild_id):
+        merged = self._merged.get(guild_id)
+        if merged is None:
+            own = self.guilds.get(guild_id)
+            values = {field: getattr(self.defaults, field) for field in CHANNEL_FIELDS + TIMEOUT_FIELDS}
+            weights = dict(self.defaults.outcome_weights)
+            if own is not None:
+                values.update((field, getattr(own, field)) for field in CHANNEL_FIELDS + TIMEOUT_FIELDS
+                              if getattr(own, field) is not None)
+                weights.update(own.outcome_weights)
+            merged = self._merged[guild_id] = GuildSettings(weights, **values)
+        return merged
+
+    # Set one field for a guild; None (or {} for weights) goes back to the default
+    def set(self, guild_id, field, value):
+        if field not in GuildSettings.__slots__:
+            raise KeyError(field)
+        settings = self.guilds.setdefault(guild_id, GuildSettings())
+        setattr(settings, field, dict(value or {}) if field == "outcome_weights" else value)
+        if not settings.to_record():
+            del self.guilds[guild_id]
+        self._merged.pop(guild_id, None)
+        self._state.changed()
+
+    async def flush(self):
+        await self._state.flush()
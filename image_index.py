@@ -0,0 +1,124 @@
+import asyncio
+import io
+import logging
+import os
+import random
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+import discord
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+# Index of the outcome artwork, built once at startup so the `.open` hot path
+# never touches the filesystem. Candidate lists per outcome are immutable and
+# swapped in one step by reload(); file bytes are kept in a size-bounded LRU.
+# reload() and read() do disk I/O; on the event loop use file(), which reads
+# cache misses in a worker thread, and run reload() with asyncio.to_thread.
+class ImageIndex:
+    def __init__(self, folders, files, extra_files=(), fallback="img/default.jpg", cache_bytes=32 * 1024 * 1024):
+        self.folders = dict(folders)
+        self.files = dict(files)
+        self.extra_files = tuple(extra_files)
+        self.fallback = fallback
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_size = 0
+        self._lock = threading.Lock()
+        self.reload()
+
+    # Rescan the image folders; call after the artwork on disk changes
+    def reload(self):
+        candidates = {}
+        for outcome, folder in self.folders.items():
+            if not os.path.isdir(folder):
+                logging.warning(f"Image folder not found for outcome: {outcome}")
+                continue
+            images = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+            if images:
+                candidates[outcome] = tuple(os.path.join(folder, f) for f in images)
+            else:
+                logging.warning(f"No valid images found in folder: {folder}")
+
+        known = {path for paths in candidates.values() for path in paths}
+        known.update(path for path in list(self.files.values()) + list(self.extra_files) if os.path.isfile(path))
+
+        self._mtimes = self._folder_mtimes()
+        self.candidates = MappingProxyType(candidates)
+        self.known = frozenset(known)
+        with self._lock:
+            self._cache.clear()
+            self._cached_size = 0
+        self._warm()
+
+    # Preload as many images as fit in the cache so first use is also served from memory
+    def _warm(self):
+        remaining = self.cache_bytes
+        for path in sorted(self.known):
+            size = os.path.getsize(path)
+            if size <= remaining:
+                self.read(path)
+                remaining -= size
+
+    def _folder_mtimes(self):
+        mtimes = {}
+        for folder in self.folders.values():
+            try:
+                mtimes[folder] = os.stat(folder).st_mtime_ns
+            except OSError:
+                mtimes[folder] = None
+        return mtimes
+
+    # Reload only if a folder was modified since the last scan
+    def reload_if_changed(self):
+        if self._folder_mtimes() != self._mtimes:
+            self.reload()
+            return True
+        return False
+
+    def exists(self, path):
+        return path in self.known
+
+    def random_image(self, outcome, rng=random):
+        images = self.candidates.get(outcome)
+        if not images:
+            return self.fallback
+        return rng.choice(images)
+
+    def image_path(self, outcome):
+        path = self.files.get(outcome)
+        return path if path in self.known else None
+
+    def _cached(self, path):
+        with self._lock:
+            data = self._cache.get(path)
+            if data is not None:
+                self._cache.move_to_end(path)
+            return data
+
+    def read(self, path):
+        data = self._cached(path)
+        if data is not None:
+            return data
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if len(data) <= self.cache_bytes:
+            with self._lock:
+                if path not in self._cache:
+                    self._cache[path] = data
+                    self._cached_size += len(data)
+                while self._cached_size > self.cache_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_size -= len(evicted)
+        return data
+
+    # A discord.File served from the in-memory cache, read in a worker thread on a miss
+    async def file(self, path, filename):
+        data = self._cached(path)
+        if data is None:
+            data = await asyncio.to_thread(self.read, path)
+        return discord.File(io.BytesIO(data), filename=filename)
@@ -0,0 +1,96 @@
+import asyncio
+import heapq
+import logging
+import time
+
+
+# Deadline scheduler for player inactivity.
+#
+# touch() records a user's latest activity. Each tracked user has at most one
+# (deadline, user) entry in a min-heap; when an entry comes due the user's real
+# deadline is recomputed from their last activity and the entry is pushed back
+# if they were active in the meantime (lazy invalidation). The runner sleeps
+# exactly until the earliest deadline, so work scales with expirations rather
+# than with the number of tracked users.
+#
+# `timeout` is a number of seconds or a function of the user key returning
+# one (e.g. a per-guild timeout when keys are (guild ID, user ID)).
+class InactivityScheduler:
+    def __init__(self, timeout, on_expire):
+        self.timeout = timeout
+        self.on_expire = on_expire
+        self.last_seen = {}
+        self._heap = []
+        self._queued = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __contains__(self, user_id):
+        return user_id in self.last_seen
+
+    def __len__(self):
+        return len(self.last_seen)
+
+    def touch(self, user_id, now=None):
+        now = time.time() if now is None else now
+        self.last_seen[user_id] = now
+        if user_id not in self._queued:
+            self._push(now + self.timeout_for(user_id), user_id)
+
+    def timeout_for(self, user_id):
+        return self.timeout(user_id) if callable(self.timeout) else self.timeout
+
+    # Stop tracking a user without firing on_expire
+    def forget(self, user_id):
+        self.last_seen.pop(user_id, None)
+
+    def _push(self, deadline, user_id):
+        heapq.heappush(self._heap, (deadline, user_id))
+        self._queued.add(user_id)
+        if self._heap[0][1] == user_id:
+            self._wakeup.set()
+
+    # Start the runner (safe to call again on reconnect)
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, user_id = heapq.heappop(self._heap)
+            self._queued.discard(user_id)
+            last_seen = self.last_seen.get(user_id)
+            if last_seen is None:
+                continue  # Forgotten since it was scheduled
+
+            deadline = last_seen + self.timeout_for(user_id)
+            if deadline > time.time():
+                self._push(deadline, user_id)  # Active again; reschedule
+                continue
+
+            del self.last_seen[user_id]
+            asyncio.create_task(self._expire(user_id))
+
+    async def _expire(self, user_id):
+        try:
+            await self.on_expire(user_id)
+        except Exception:
+            logging.exception(f"Inactivity cleanup failed for user {user_id}")
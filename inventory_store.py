@@ -0,0 +1,479 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from metrics import registry
+from player_inventory import PlayerInventory
+from state_files import atomic_write_text, load_json
+
+
+# Copy a player record so it can be written while commands keep mutating the original
+def copy_record(record):
+    return {"items": list(record.get("items", [])), "coins": list(record.get("coins", []))}
+
+
+# Inventory backends share one small interface:
+#   load(player_id)      -> record dict or None
+#   exists(player_id)    -> bool
+#   player_ids()         -> iterable of every stored player ID
+#   snapshot(changes)    -> payload; runs on the event loop (keep it cheap),
+#                           changes maps player_id -> record copy (None means delete)
+#   write(payload)       -> persists a snapshot; runs in a worker thread
+#   close()
+#   blocking_reads       -> True when load()/exists() do I/O, so the store
+#                           prefetches players in a worker thread
+
+
+# The original monolithic format: one JSON object holding every player. Every
+# player is held in memory here, whatever the store's cache size, and each
+# save rewrites the whole file; the store's memory bound only holds with SQLite.
+class JsonInventoryBackend:
+    blocking_reads = False
+
+    def __init__(self, path):
+        self.path = path
+        self._data = load_json(path, {})
+
+    def load(self, player_id):
+        record = self._data.get(player_id)
+        return copy_record(record) if record is not None else None
+
+    def exists(self, player_id):
+        return player_id in self._data
+
+    def player_ids(self):
+        return list(self._data)
+
+    def snapshot(self, changes):
+        for player_id, record in changes.items():
+            if record is None:
+                self._data.pop(player_id, None)
+            else:
+                self._data[player_id] = record
+        # Stored records are never mutated, so a shallow copy is a stable
+        # snapshot; serializing it is left to the worker thread
+        return dict(self._data)
+
+    def write(self, payload):
+        atomic_write_text(self.path, json.dumps(payload))
+
+    def close(self):
+        pass
+
+
+# One row per (player, item/coin) in an SQLite database running in WAL mode.
+# Duplicate entries (stacked keys) share a row with a quantity; `position`
+# keeps the order in which entries were first collected.
+class SqliteInventoryBackend:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS players (
+            player_id TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS inventory_entries (
+            player_id TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('items', 'coins')),
+            name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (player_id, kind, name)
+        ) WITHOUT ROWID;
+    """
+    blocking_reads = True
+
+    def __init__(self, path):
+        self.path = path
+        # Reads happen in prefetch threads (and on the event loop for anything
+        # not prefetched), writes in a worker thread; WAL lets the two
+        # connections work side by side
+        self._writer = self._connect()
+        self._writer.executescript(self.SCHEMA)
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, player_id):
+        with self._read_lock:
+            if self._reader.execute("SELECT 1 FROM players WHERE player_id = ?", (player_id,)).fetchone() is None:
+                return None
+            rows = self._reader.execute(
+                "SELECT kind, name, quantity FROM inventory_entries WHERE player_id = ? ORDER BY position",
+                (player_id,)
+            ).fetchall()
+        record = {"items": [], "coins": []}
+        for kind, name, quantity in rows:
+            record[kind].extend([name] * quantity)
+        return record
+
+    def exists(self, player_id):
+        with self._read_lock:
+            row = self._reader.execute("SELECT 1 FROM players WHERE player_id = ?", (player_id,)).fetchone()
+        return row is not None
+
+    def player_ids(self):
+        with self._read_lock:
+            return [row[0] for row in self._reader.execute("SELECT player_id FROM players")]
+
+    def snapshot(self, changes):
+        return changes
+
+    def write(self, payload):
+        with self._write_lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for player_id, record in payload.items():
+                    if record is None:
+                        conn.execute("DELETE FROM inventory_entries WHERE player_id = ?", (player_id,))
+                        conn.execute("DELETE FROM players WHERE player_id = ?", (player_id,))
+                    else:
+                        self._write_player(conn, player_id, record)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    # Only touch the rows that actually changed for this player
+    def _write_player(self, conn, player_id, record):
+        wanted = {}
+        for kind in ("items", "coins"):
+            for name in record.get(kind, []):
+                quantity, position = wanted.get((kind, name), (0, len(wanted)))
+                wanted[(kind, name)] = (quantity + 1, position)
+
+        current = {
+            (kind, name): (quantity, position)
+            for kind, name, quantity, position in conn.execute(
+                "SELECT kind, name, quantity, position FROM inventory_entries WHERE player_id = ?",
+                (player_id,)
+            )
+        }
+
+        conn.execute("INSERT OR IGNORE INTO players (player_id) VALUES (?)", (player_id,))
+        for (kind, name), (quantity, position) in wanted.items():
+            if current.get((kind, name)) != (quantity, position):
+                conn.execute(
+                    "INSERT INTO inventory_entries (player_id, kind, name, quantity, position) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (player_id, kind, name) DO UPDATE SET "
+                    "quantity = excluded.quantity, position = excluded.position",
+                    (player_id, kind, name, quantity, position)
+                )
+        for kind, name in current.keys() - wanted.keys():
+            conn.execute(
+                "DELETE FROM inventory_entries WHERE player_id = ? AND kind = ? AND name = ?",
+                (player_id, kind, name)
+            )
+
+    def is_empty(self):
+        with self._read_lock:
+            return self._reader.execute("SELECT 1 FROM players LIMIT 1").fetchone() is None
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+# One-shot import of player_inventories.json into an SQLite database.
+# Does nothing if the database already holds players; returns the number imported.
+def migrate_json_to_sqlite(json_path, db_path):
+    backend = SqliteInventoryBackend(db_path)
+    try:
+        if not backend.is_empty() or not os.path.exists(json_path):
+            return 0
+        source = JsonInventoryBackend(json_path)
+        changes = {player_id: source.load(player_id) for player_id in source.player_ids()}
+        backend.write(changes)
+        logging.info(f"Migrated {len(changes)} player inventories from {json_path} to {db_path}")
+        return len(changes)
+    finally:
+        backend.close()
+
+
+def open_backend(kind, json_path, db_path):
+    if kind == "json":
+        return JsonInventoryBackend(json_path)
+    if kind == "sqlite":
+        migrate_json_to_sqlite(json_path, db_path)
+        return SqliteInventoryBackend(db_path)
+    raise ValueError(f"Unknown inventory backend: {kind}")
+
+
+# Mapping of player ID -> PlayerInventory backed by a pluggable backend, with
+# write-behind persistence. Backends store plain JSON-shaped records; they are
+# converted to PlayerInventory on first access. Commands mutate inventories in
+# place and call mark_dirty() before their next await. A background task
+# coalesces those mutations and flushes them every `flush_interval` seconds,
+# or sooner once `batch_size` players are dirty.
+#
+# Only a hot set of players is kept in memory: at most `max_players` (least
+# recently used go first) and none idle for longer than `ttl` seconds, when
+# set. An evicted player with unsaved changes is held aside until the next
+# flush has written it back, and is revived from there if used again.
+# Deleted players are tracked until the delete is written; a dirty player that
+# is neither in memory nor deleted has nothing to save and is skipped.
+#
+# Lookups are synchronous. With a backend whose reads do I/O, await
+# prefetch() before a command touches a player: it loads the player in a
+# worker thread, or remembers that there is nothing stored (up to
+# `max_players` such players), so the command's lookups stay in memory.
+class InventoryStore(MutableMapping):
+    def __init__(self, backend, flush_interval=5.0, batch_size=50, max_players=None, ttl=None):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_players = max_players
+        self.ttl = ttl
+        self._cache = OrderedDict()
+        self._last_used = {}
+        self._evicted = {}
+        self._dirty = set()
+        self._deleted = set()
+        self._absent = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def __getitem__(self, player_id):
+        inventory = self._cache.get(player_id)
+        if inventory is not None:
+            self.hits += 1
+            self._touch(player_id)
+            return inventory
+
+        self.misses += 1
+        inventory = self._evicted.pop(player_id, None)
+        if inventory is None:
+            if player_id in self._deleted:
+                raise KeyError(player_id)  # Deleted but not flushed yet
+            if player_id in self._absent:
+                raise KeyError(player_id)
+            record = self.backend.load(player_id)
+            if record is None:
+                raise KeyError(player_id)
+            inventory = PlayerInventory.from_record(record)
+        self._insert(player_id, inventory)
+        return inventory
+
+    def __setitem__(self, player_id, inventory):
+        self._evicted.pop(player_id, None)
+        self._insert(player_id, inventory)
+        self.mark_dirty(player_id)
+
+    def __delitem__(self, player_id):
+        if player_id not in self:
+            raise KeyError(player_id)
+        self._cache.pop(player_id, None)
+        self._last_used.pop(player_id, None)
+        self._evicted.pop(player_id, None)
+        self._deleted.add(player_id)
+        self.mark_dirty(player_id)
+
+    def __contains__(self, player_id):
+        if player_id in self._cache or player_id in self._evicted:
+            return True
+        if player_id in self._deleted or player_id in self._absent:
+            return False
+        return self.backend.exists(player_id)
+
+    def __iter__(self):
+        seen = set(self._cache) | set(self._evicted)
+        yield from seen
+        for player_id in self.backend.player_ids():
+            if player_id not in seen and player_id not in self._deleted:
+                yield player_id
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    # The player's inventory, or a new empty one that is only saved once it is marked dirty
+    def get_or_create(self, player_id):
+        try:
+            return self[player_id]
+        except KeyError:
+            inventory = PlayerInventory()
+            self._insert(player_id, inventory)
+            return inventory
+
+    async def prefetch(self, player_id):
+        if not self.backend.blocking_reads or self._known(player_id):
+            return
+        record = await asyncio.to_thread(self.backend.load, player_id)
+        if self._known(player_id):
+            return  # Created, deleted or prefetched while loading
+        self.misses += 1
+        if record is None:
+            self._absent[player_id] = None
+            if self.max_players is not None and len(self._absent) > self.max_players:
+                self._absent.popitem(last=False)
+        else:
+            self._insert(player_id, PlayerInventory.from_record(record))
+
+    # Whether a lookup can be answered without the backend
+    def _known(self, player_id):
+        return (player_id in self._cache or player_id in self._evicted or player_id in self._deleted
+                or player_id in self._absent)
+
+    # Move the record saved under `old_id` to `new_id` when only `old_id` has
+    # one; returns whether anything moved
+    def move(self, old_id, new_id):
+        if new_id in self or old_id not in self:
+            return False
+        self[new_id] = self[old_id]
+        del self[old_id]
+        return True
+
+    def _touch(self, player_id):
+        self._cache.move_to_end(player_id)
+        self._last_used[player_id] = time.monotonic()
+
+    def _insert(self, player_id, inventory):
+        self._deleted.discard(player_id)
+        self._absent.pop(player_id, None)
+        self._cache[player_id] = inventory
+        self._touch(player_id)
+        self.evict()
+
+    # Drop players beyond `max_players` or idle past `ttl`, oldest first
+    def evict(self):
+        now = time.monotonic()
+        while self._cache:
+            player_id = next(iter(self._cache))
+            over_size = self.max_players is not None and len(self._cache) > self.max_players
+            expired = self.ttl is not None and now - self._last_used[player_id] > self.ttl
+            if not (over_size or expired):
+                break
+            inventory = self._cache.pop(player_id)
+            del self._last_used[player_id]
+            self.evictions += 1
+            if player_id in self._dirty:
+                self._evicted[player_id] = inventory
+                self.writebacks += 1
+                self._wakeup.set()
+
+    def mark_dirty(self, player_id):
+        self._dirty.add(player_id)
+        if len(self._dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def dirty_count(self):
+        return len(self._dirty)
+
+    @property
+    def cached_count(self):
+        return len(self._cache)
+
+    def stats(self):
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "writebacks": self.writebacks, "dirty": len(self._dirty)}
+
+    # Start the background flusher (safe to call again on reconnect)
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self.evict()
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Background inventory flush failed; will retry")
+
+    def _take_changes(self):
+        dirty, self._dirty = self._dirty, set()
+        changes = {}
+        written = {}
+        for player_id in dirty:
+            if player_id in self._deleted:
+                changes[player_id] = None
+                continue
+            inventory = self._cache.get(player_id)
+            if inventory is None:
+                inventory = self._evicted.get(player_id)
+                if inventory is None:
+                    logging.warning(f"Player {player_id} was marked dirty but is not in memory; nothing to save")
+                    continue
+                written[player_id] = inventory
+            changes[player_id] = inventory.to_record()
+        return dirty, changes, written
+
+    # Evicted players whose changes are now on disk no longer need holding,
+    # and written deletes no longer need remembering
+    def _written_back(self, changes, written):
+        for player_id, inventory in written.items():
+            if player_id not in self._dirty and self._evicted.get(player_id) is inventory:
+                del self._evicted[player_id]
+        for player_id, record in changes.items():
+            if record is None and player_id not in self._dirty:
+                self._deleted.discard(player_id)
+
+    # Flush dirty inventories; the snapshot is taken on the event loop and the
+    # disk write happens in a worker thread
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, changes, written = self._take_changes()
+            try:
+                payload = self.backend.snapshot(changes)
+                with registry.timer("voicebot_io_seconds", op="inventory_save"):
+                    await asyncio.to_thread(self.backend.write, payload)
+            except BaseException:
+                self._dirty |= dirty
+                raise
+            self._written_back(changes, written)
+
+    # Synchronous flush for use once the event loop has stopped
+    def flush_now(self):
+        if not self._dirty:
+            return
+        dirty, changes, written = self._take_changes()
+        try:
+            self.backend.write(self.backend.snapshot(changes))
+        except BaseException:
+            self._dirty |= dirty
+            raise
+        self._written_back(changes, written)
+
+    # Stop the background flusher and persist anything still pending
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+if __name__ == "__main__":
+    # Usage: python inventory_store.py player_inventories.json player_inventories.db
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        sys.exit("usage: python inventory_store.py <inventories.json> <inventories.db>")
+    count = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"Imported {count} players")
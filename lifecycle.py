@@ -0,0 +1,88 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+
+from state_files import atomic_write_text, load_json
+
+
+# Graceful shutdown and resume across process restarts.
+#
+# SIGTERM (a Heroku dyno restart) or SIGINT starts one shutdown: the
+# `checkpoint` callback's state is written to `path`, then `shutdown` runs
+# (disconnect voice, flush saves) and the bot is closed. The whole sequence
+# gets `budget` seconds, after which the bot is closed anyway; a second
+# signal closes it right away. On the next start restore() hands the
+# checkpoint, with its age in seconds, to `resume` exactly once, then removes
+# the file so an older checkpoint is never replayed.
+class LifecycleManager:
+    def __init__(self, bot, path, checkpoint, shutdown, resume, budget=25.0):
+        self.bot = bot
+        self.path = path
+        self.checkpoint = checkpoint
+        self.shutdown = shutdown
+        self.resume = resume
+        self.budget = budget
+        self.closing = False
+        self._restored = False
+        self._task = None
+
+    # Route SIGTERM/SIGINT to request_shutdown (call once the loop is running)
+    def install(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_shutdown, sig.name)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform; bot.run's KeyboardInterrupt handling still applies
+
+    def request_shutdown(self, reason="request"):
+        if self._task is not None:
+            logging.warning(f"Received {reason} during shutdown; closing now")
+            self._task.cancel()
+            return
+        logging.info(f"Received {reason}; shutting down (budget {self.budget:g}s)")
+        self.closing = True
+        self._task = asyncio.create_task(self._shutdown())
+
+    async def _shutdown(self):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._drain(), timeout=self.budget)
+        except asyncio.TimeoutError:
+            logging.warning(f"Shutdown budget of {self.budget:g}s used up; closing anyway")
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logging.exception("Shutdown failed; closing anyway")
+        finally:
+            logging.info(f"Shutdown finished in {time.monotonic() - started:.1f}s")
+            await self.bot.close()
+
+    async def _drain(self):
+        await self.save_checkpoint()
+        await self.shutdown()
+
+    async def save_checkpoint(self):
+        state = dict(self.checkpoint(), saved_at=time.time())
+        await asyncio.to_thread(atomic_write_text, self.path, json.dumps(state))
+        logging.info(f"Saved session checkpoint to {self.path}")
+
+    # Resume from the last checkpoint, if any; later calls (reconnects) do nothing
+    async def restore(self):
+        if self._restored:
+            return
+        self._restored = True
+        state = await asyncio.to_thread(load_json, self.path, None)
+        if state is None:
+            return
+        try:
+            await self.resume(state, max(time.time() - state.get("saved_at", time.time()), 0.0))
+        except Exception:
+            logging.exception("Could not resume from the session checkpoint")
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
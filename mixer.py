@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+
+import discord
+
+from audio_pack import FRAME_BYTES, PackedOpusSource, decode_pcm
+
+try:
+    import audioop  # Deprecated since 3.11 and gone in 3.13 (the audioop-lts package restores it)
+except ImportError:
+    audioop = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The mixer needs audioop or NumPy; without either, clips are played one at a time
+AVAILABLE = audioop is not None or np is not None
+
+SILENCE = bytes(FRAME_BYTES)
+DUCK_STEP = 0.05  # Largest music gain change per 20 ms frame, so ducking fades instead of clicking
+
+
+# One clip being mixed: a read position into its PCM and a gain
+class Layer:
+    __slots__ = ("pcm", "position", "volume", "loop")
+
+    def __init__(self, pcm, volume, loop=False):
+        self.pcm = memoryview(pcm)
+        self.position = 0
+        self.volume = volume
+        self.loop = loop
+
+    # The next 20 ms of PCM (padded with silence at the end), or None when finished
+    def next_frame(self):
+        if self.position >= len(self.pcm):
+            if not self.loop or not self.pcm:
+                return None
+            self.position = 0
+        chunk = self.pcm[self.position:self.position + FRAME_BYTES]
+        self.position += FRAME_BYTES
+        if len(chunk) < FRAME_BYTES:
+            return bytes(chunk) + bytes(FRAME_BYTES - len(chunk))
+        return chunk
+
+
+# A clip streamed from the Opus pack, decoded one frame per read, so only the
+# compressed frames (already memory-mapped) are ever held for it
+class OpusLayer:
+    __slots__ = ("source", "decoder", "volume", "loop")
+
+    def __init__(self, source, volume, loop=False):
+        self.source = source
+        self.decoder = discord.opus.Decoder()
+        self.volume = volume
+        self.loop = loop
+
+    def next_frame(self):
+        packet = self.source.read()
+        if not packet and self.loop:
+            self.source.rewind()
+            packet = self.source.read()
+        if not packet:
+            return None
+        pcm = self.decoder.decode(bytes(packet))
+        if len(pcm) < FRAME_BYTES:
+            return pcm + bytes(FRAME_BYTES - len(pcm))
+        return pcm
+
+
+# A layer for a clip from PcmClipCache: decoded PCM or a packed track
+def make_layer(clip, volume, loop=False):
+    if isinstance(clip, PackedOpusSource):
+        return OpusLayer(clip, volume, loop)
+    return Layer(clip, volume, loop)
+
+
+def _scaled(chunk, volume):
+    if volume == 1.0:
+        return chunk
+    if audioop is not None:
+        return audioop.mul(chunk, 2, volume)
+    samples = np.frombuffer(chunk, dtype="<i2") * volume
+    return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+
+# Sum of two frames, saturating on overflow
+def _added(frame, chunk):
+    if audioop is not None:
+        return audioop.add(frame, chunk, 2)
+    samples = np.frombuffer(frame, dtype="<i2").astype(np.int32) + np.frombuffer(chunk, dtype="<i2")
+    return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+
+# A single PCM stream per voice session that overlays a looping music bed with
+# one-shot effects. Mixing is done a frame at a time with audioop, or NumPy
+# where audioop is gone (C loops over the samples, saturating on overflow).
+# While any effect plays the music is ducked to `duck_volume`, gliding there
+# over a few frames. At most `max_effects` effects overlap; adding one more
+# drops the oldest. read() runs on discord.py's audio thread; layers are added
+# from the event loop under a lock.
+#
+# When nothing is left to play read() returns b"" and the player stops; the
+# add methods return True when the mixer has to be started again.
+class MixerSource(discord.AudioSource):
+    def __init__(self, music_volume=0.5, effect_volume=1.0, duck_volume=0.25, max_effects=2):
+        self.music_volume = music_volume
+        self.effect_volume = effect_volume
+        self.duck_volume = duck_volume
+        self.max_effects = max(1, max_effects)
+        self.music = None
+        self.effects = []
+        self.active = False
+        self._duck = 1.0
+        self._lock = threading.Lock()
+
+    def _activate(self):
+        was_active, self.active = self.active, True
+        return not was_active
+
+    def set_music(self, clip, loop=True):
+        with self._lock:
+            self.music = make_layer(clip, self.music_volume, loop)
+            return self._activate()
+
+    def stop_music(self):
+        with self._lock:
+            self.music = None
+
+    def add_effect(self, clip, volume=None):
+        with self._lock:
+            del self.effects[:max(0, len(self.effects) - self.max_effects + 1)]
+            self.effects.append(make_layer(clip, self.effect_volume if volume is None else volume))
+            return self._activate()
+
+    def clear(self):
+        with self._lock:
+            self.music = None
+            self.effects.clear()
+
+    def read(self):
+        with self._lock:
+            if self.music is None and not self.effects:
+                self.active = False
+                return b""
+
+            target = self.duck_volume if self.effects else 1.0
+            self._duck += max(-DUCK_STEP, min(DUCK_STEP, target - self._duck))
+
+            frame = None
+            if self.music is not None:
+                chunk = self.music.next_frame()
+                if chunk is None:
+                    self.music = None
+                else:
+                    frame = _scaled(chunk, self.music.volume * self._duck)
+
+            finished = []
+            for layer in self.effects:
+                chunk = layer.next_frame()
+                if chunk is None:
+                    finished.append(layer)
+                    continue
+                chunk = _scaled(chunk, layer.volume)
+                frame = chunk if frame is None else _added(frame, chunk)
+            for layer in finished:
+                self.effects.remove(layer)
+
+            return bytes(frame) if frame is not None else SILENCE
+
+    def is_opus(self):
+        return False
+
+    # Called by the player whenever a run ends, including when read() ran dry
+    # and a new run is starting; the layers are left alone
+    def cleanup(self):
+        pass
+
+
+# Clips for the mixer. Clips in the Opus pack are handed out as packed
+# sources and decoded a frame at a time while they play, so they cost no
+# memory beyond the map. Other clips are decoded with ffmpeg in a worker thread
+# and kept in memory (LRU, bounded by `max_bytes`), so mixing an effect never
+# starts a subprocess after its first use; concurrent requests for the same
+# clip share one decode. Decoded PCM is large (about 11 MB per minute: the
+# shipped clips come to ~140 MB), so without a pack the default budget holds
+# all of them rather than thrashing. A clip that is missing or fails to decode
+# is logged once and then skipped without trying again.
+class PcmClipCache:
+    def __init__(self, pack=None, max_bytes=160 * 1024 * 1024):
+        self.pack = pack
+        self.max_bytes = max_bytes
+        self._clips = OrderedDict()
+        self._size = 0
+        self._loading = {}
+        self._unplayable = set()
+
+    # The clip (a fresh packed source, or its PCM), or None if it can't be decoded
+    async def get(self, path):
+        if self.pack is not None:
+            source = self.pack.source(path)
+            if source is not None:
+                return source
+
+        pcm = self._clips.get(path)
+        if pcm is not None:
+            self._clips.move_to_end(path)
+            return pcm
+        if path in self._unplayable:
+            return None
+        if not os.path.exists(path):
+            self._unplayable.add(path)
+            logging.warning(f"Audio clip {path} not found; it will not be played")
+            return None
+
+        task = self._loading.get(path)
+        if task is None:
+            task = self._loading[path] = asyncio.ensure_future(asyncio.to_thread(decode_pcm, path))
+        try:
+            pcm = await asyncio.shield(task)
+        except (OSError, subprocess.CalledProcessError, discord.DiscordException):
+            if path not in self._unplayable:
+                self._unplayable.add(path)
+                logging.exception(f"Could not decode {path}; it will not be played")
+            return None
+        finally:
+            if self._loading.get(path) is task and task.done():
+                del self._loading[path]
+
+        if path not in self._clips and len(pcm) <= self.max_bytes:
+            self._clips[path] = pcm
+            self._size += len(pcm)
+            while self._size > self.max_bytes:
+                _, evicted = self._clips.popitem(last=False)
+                self._size -= len(evicted)
+        return pcm
@@ -0,0 +1,63 @@
+import random
+
+import discord
+
+
+# Walker/Vose alias table: O(n) to build, O(1) per draw
+class AliasSampler:
+    def __init__(self, weights):
+        if not weights or any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0:
+            raise ValueError("weights must be non-negative with a positive total")
+        self.keys = tuple(weights)
+        n = len(self.keys)
+        total = sum(weights.values())
+        scaled = [weights[k] * n / total for k in self.keys]
+
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    # One uniform draw picks the column and decides between it and its alias
+    def sample(self, rng=random):
+        x = rng.random() * len(self.keys)
+        i = int(x)
+        return self.keys[i] if x - i < self.prob[i] else self.keys[self.alias[i]]
+
+    def sample_many(self, n, rng=random):
+        return [self.sample(rng) for _ in range(n)]
+
+
+# Compiles the `.open` outcome table once: an alias sampler over the weights,
+# an injectable (seedable) RNG, and a prebuilt embed per outcome that each
+# roll copies instead of constructing from scratch.
+class OutcomeEngine:
+    def __init__(self, weights, texts, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.sampler = AliasSampler(weights)
+        self._templates = {
+            outcome: discord.Embed(
+                title=texts[outcome]["title"],
+                description=texts[outcome]["description"],
+                color=discord.Color.blue() if outcome != "trapped" else discord.Color.red()
+            )
+            for outcome in weights
+        }
+
+    def roll(self):
+        return self.sampler.sample(self.rng)
+
+    def sample_many(self, n):
+        return self.sampler.sample_many(n, self.rng)
+
+    # A fresh embed for the outcome; callers may add fields to it freely
+    def embed(self, outcome):
+        return self._templates[outcome].copy()
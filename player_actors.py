@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from collections import deque
+
+QUEUED = "queued"
+COALESCED = "coalesced"
+DROPPED = "dropped"
+
+
+# One player's mailbox: jobs run strictly one after another on a dedicated task
+class PlayerActor:
+    def __init__(self, router, key):
+        self.router = router
+        self.key = key
+        self.mailbox = deque()
+        self.running = None
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def pending(self, name):
+        return any(job_name == name for job_name, _ in self.mailbox)
+
+    def post(self, name, job):
+        self.mailbox.append((name, job))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self.mailbox:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.router.idle_timeout)
+                except asyncio.TimeoutError:
+                    if not self.mailbox:
+                        self.router._retire(self)
+                        return
+                continue
+
+            name, job = self.mailbox.popleft()
+            self.running = name
+            try:
+                await job()
+            except Exception:
+                logging.exception(f"Command {name} failed for player {self.key}")
+            finally:
+                self.running = None
+
+
+# Routes commands to per-player actors: each player's commands run in order,
+# different players run concurrently. Mailboxes are bounded; a full mailbox
+# drops new commands, and commands with the "coalesce" policy are merged
+# into an identical one that is already waiting. Actors retire after
+# `idle_timeout` seconds without work.
+class ActorRouter:
+    def __init__(self, max_queue=5, idle_timeout=60.0, policies=None):
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self.policies = policies or {}
+        self.actors = {}
+        self.dropped = 0
+        self.coalesced = 0
+
+    def submit(self, key, name, job):
+        actor = self.actors.get(key)
+        if actor is None:
+            actor = self.actors[key] = PlayerActor(self, key)
+
+        if self.policies.get(name) == "coalesce" and actor.pending(name):
+            self.coalesced += 1
+            return COALESCED
+        if len(actor.mailbox) >= self.max_queue:
+            self.dropped += 1
+            return DROPPED
+        actor.post(name, job)
+        return QUEUED
+
+    def _retire(self, actor):
+        if self.actors.get(actor.key) is actor:
+            del self.actors[actor.key]
+
+    @property
+    def queued(self):
+        return sum(len(actor.mailbox) for actor in self.actors.values())
@@ -0,0 +1,160 @@
+import random
+
+from game_data import mystical_items, required_coins
+
+# Bit positions follow catalogue order. "key" is listed in mystical_items but
+# is tracked as a stackable counter rather than a treasure bit.
+TREASURES = tuple(name for name in mystical_items if name != "key")
+COINS = tuple(required_coins)
+TREASURE_BITS = {name: 1 << i for i, name in enumerate(TREASURES)}
+COIN_BITS = {name: 1 << i for i, name in enumerate(COINS)}
+ALL_TREASURES = (1 << len(TREASURES)) - 1
+ALL_COINS = (1 << len(COINS)) - 1
+
+
+# Pick uniformly among the bits of `available` and return its index
+def _random_bit(available, rng):
+    n = rng.randrange(available.bit_count())
+    for _ in range(n):
+        available &= available - 1  # Drop the lowest set bit
+    return (available & -available).bit_length() - 1
+
+
+# Compact player inventory: collected treasures and coins are bitmasks over
+# the fixed catalogue, keys are a counter, and anything outside the catalogue
+# (e.g. `.collect_treasure` trinkets) is kept in `extras` / `extra_coins` so
+# conversion to and from the JSON record ({"items": [...], "coins": [...]})
+# loses nothing but the original collection order.
+class PlayerInventory:
+    __slots__ = ("treasures", "coins", "keys", "extras", "extra_coins")
+
+    def __init__(self, treasures=0, coins=0, keys=0, extras=(), extra_coins=()):
+        self.treasures = treasures
+        self.coins = coins
+        self.keys = keys
+        self.extras = tuple(extras)
+        self.extra_coins = tuple(extra_coins)
+
+    @classmethod
+    def from_record(cls, record):
+        inventory = cls()
+        extras = []
+        extra_coins = []
+        for name in record.get("items", []):
+            if name == "key":
+                inventory.keys += 1
+            elif name in TREASURE_BITS:
+                inventory.treasures |= TREASURE_BITS[name]
+            else:
+                extras.append(name)
+        for name in record.get("coins", []):
+            if name in COIN_BITS:
+                inventory.coins |= COIN_BITS[name]
+            else:
+                extra_coins.append(name)
+        inventory.extras = tuple(extras)
+        inventory.extra_coins = tuple(extra_coins)
+        return inventory
+
+    def to_record(self):
+        return {"items": self.items, "coins": self.coin_names}
+
+    # Read-only access in the JSON record shape, for code that expects it
+    def __getitem__(self, kind):
+        return self.to_record()[kind]
+
+    def get(self, kind, default=None):
+        return self.to_record().get(kind, default)
+
+    def __eq__(self, other):
+        if not isinstance(other, PlayerInventory):
+            return NotImplemented
+        return (self.treasures, self.coins, self.keys, self.extras, self.extra_coins) == \
+            (other.treasures, other.coins, other.keys, other.extras, other.extra_coins)
+
+    def __repr__(self):
+        return (f"PlayerInventory(treasures={self.treasures:#x}, coins={self.coins:#x}, keys={self.keys}, "
+                f"extras={self.extras!r}, extra_coins={self.extra_coins!r})")
+
+    @property
+    def items(self):
+        return self.treasure_names + ["key"] * self.keys + list(self.extras)
+
+    @property
+    def treasure_names(self):
+        return [name for name, bit in TREASURE_BITS.items() if self.treasures & bit]
+
+    @property
+    def coin_names(self):
+        return [name for name, bit in COIN_BITS.items() if self.coins & bit] + list(self.extra_coins)
+
+    # Treasures
+
+    def has_treasure(self, name):
+        return bool(self.treasures & TREASURE_BITS.get(name, 0))
+
+    def add_treasure(self, name):
+        bit = TREASURE_BITS[name]
+        if self.treasures & bit:
+            return False
+        self.treasures |= bit
+        return True
+
+    @property
+    def treasure_count(self):
+        return self.treasures.bit_count()
+
+    def has_all_treasures(self):
+        return self.treasures == ALL_TREASURES
+
+    def random_missing_treasure(self, rng=random):
+        missing = ALL_TREASURES & ~self.treasures
+        if not missing:
+            return None
+        return TREASURES[_random_bit(missing, rng)]
+
+    def collect_all_treasures(self):
+        self.treasures = ALL_TREASURES
+
+    # Coins
+
+    def has_coin(self, name):
+        return bool(self.coins & COIN_BITS.get(name, 0))
+
+    def add_coin(self, name):
+        bit = COIN_BITS[name]
+        if self.coins & bit:
+            return False
+        self.coins |= bit
+        return True
+
+    @property
+    def coin_count(self):
+        return self.coins.bit_count()
+
+    def has_all_coins(self):
+        return self.coins == ALL_COINS
+
+    def random_missing_coin(self, rng=random):
+        missing = ALL_COINS & ~self.coins
+        if not missing:
+            return None
+        return COINS[_random_bit(missing, rng)]
+
+    def clear_coins(self):
+        self.coins = 0
+        self.extra_coins = ()
+
+    # Keys and other items
+
+    def add_key(self):
+        self.keys += 1
+
+    def use_key(self):
+        if not self.keys:
+            return False
+        self.keys -= 1
+        return True
+
+    def add_extra(self, name):
+        self.extras += (name,)
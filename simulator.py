@@ -0,0 +1,231 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from game_data import outcomes, required_coins
+from player_inventory import TREASURES
+
+try:
+    import numpy as np
+except ImportError:  # Only the batched engine needs NumPy
+    np = None
+
+
+# Monte-Carlo model of `.open` pacing.
+#
+# Follows roll_open() in app3.py: an outcome is drawn from the weights; a
+# treasure roll picks uniformly among the treasures not collected yet plus the
+# key when the player holds none (nothing happens once both are exhausted); a
+# key roll adds a key; a rare_coin roll adds a coin not collected yet. Each
+# simulated player opens doors until every goal is met or `max_opens` is hit.
+#
+#     python simulator.py --players 1000000
+#     python simulator.py --weights hallway=40,treasure=25 --json
+
+GOALS = ("first_key", "all_coins", "all_treasures", "complete")
+
+
+# One player, one door at a time: the reference the batched engine must match
+def simulate_player(weights, rng, max_opens, treasure_count=len(TREASURES), coin_count=len(required_coins)):
+    names = list(weights)
+    values = list(weights.values())
+    treasures = coins = keys = 0
+    done = {}
+    for opens in range(1, max_opens + 1):
+        outcome = rng.choices(names, weights=values)[0]
+        if outcome == "treasure":
+            missing = treasure_count - treasures
+            choices = missing + (1 if keys == 0 else 0)
+            if choices:
+                if rng.randrange(choices) < missing:
+                    treasures += 1
+                else:
+                    keys += 1
+        elif outcome == "key":
+            keys += 1
+        elif outcome == "rare_coin" and coins < coin_count:
+            coins += 1
+
+        if keys and "first_key" not in done:
+            done["first_key"] = opens
+        if coins == coin_count and "all_coins" not in done:
+            done["all_coins"] = opens
+        if treasures == treasure_count and "all_treasures" not in done:
+            done["all_treasures"] = opens
+        if "all_coins" in done and "all_treasures" in done:
+            if "complete" not in done:
+                done["complete"] = opens
+            if "first_key" in done:
+                break
+    return done
+
+
+def simulate_python(weights, players, max_opens, seed=None):
+    rng = random.Random(seed)
+    results = {goal: [] for goal in GOALS}
+    for _ in range(players):
+        done = simulate_player(weights, rng, max_opens)
+        for goal in GOALS:
+            results[goal].append(done.get(goal, 0))
+    return results
+
+
+# All players advance one door per step as arrays; players that have met
+# every goal are dropped from the arrays so later steps only touch the rest.
+# Returns {goal: opens needed per player}, 0 where the goal wasn't reached.
+def simulate_numpy(weights, players, max_opens, seed=None,
+                   treasure_count=len(TREASURES), coin_count=len(required_coins)):
+    if np is None:
+        raise RuntimeError("The batched simulator needs NumPy (pip install numpy)")
+    rng = np.random.default_rng(seed)
+    names = list(weights)
+    probabilities = np.array(list(weights.values()), dtype=np.float64)
+    cdf = np.cumsum(probabilities / probabilities.sum())
+    cdf[-1] = 1.0
+    treasure_i, key_i, coin_i = (names.index(name) if name in names else -1
+                                 for name in ("treasure", "key", "rare_coin"))
+
+    ids = np.arange(players)
+    treasures = np.zeros(players, dtype=np.int16)
+    coins = np.zeros(players, dtype=np.int16)
+    keys = np.zeros(players, dtype=np.int32)
+    results = {goal: np.zeros(players, dtype=np.int32) for goal in GOALS}
+    reached = {goal: np.zeros(players, dtype=bool) for goal in GOALS}
+
+    for opens in range(1, max_opens + 1):
+        if not ids.size:
+            break
+        rolled = np.searchsorted(cdf, rng.random(ids.size), side="right")
+
+        is_treasure = rolled == treasure_i
+        missing = treasure_count - treasures
+        choices = missing + (keys == 0)
+        pick = np.floor(rng.random(ids.size) * np.maximum(choices, 1))
+        new_treasure = is_treasure & (choices > 0) & (pick < missing)
+        treasure_key = is_treasure & (choices > 0) & (pick >= missing)
+        treasures += new_treasure
+        keys += treasure_key | (rolled == key_i)
+        coins += (rolled == coin_i) & (coins < coin_count)
+
+        for goal, met in (("first_key", keys > 0),
+                          ("all_coins", coins == coin_count),
+                          ("all_treasures", treasures == treasure_count)):
+            first = met & ~reached[goal][ids]
+            results[goal][ids[first]] = opens
+            reached[goal][ids[first]] = True
+        complete = reached["all_coins"][ids] & reached["all_treasures"][ids]
+        first = complete & ~reached["complete"][ids]
+        results["complete"][ids[first]] = opens
+        reached["complete"][ids[first]] = True
+
+        finished = complete & reached["first_key"][ids]
+        if finished.any():
+            keep = ~finished
+            ids, treasures, coins, keys = ids[keep], treasures[keep], coins[keep], keys[keep]
+
+    return results
+
+
+# Distribution of opens-to-goal over the players who reached it
+def summarize(values):
+    values = sorted(v for v in values if v)
+    if not values:
+        return {"reached": 0}
+    n = len(values)
+
+    def q(p):
+        return values[min(n - 1, int(p * n))]
+
+    return {
+        "reached": n,
+        "mean": round(sum(values) / n, 1),
+        "p10": q(0.10), "p50": q(0.50), "p90": q(0.90), "p99": q(0.99),
+        "max": values[-1]
+    }
+
+
+def summarize_numpy(values):
+    reached = values[values > 0]
+    if not reached.size:
+        return {"reached": 0}
+    p10, p50, p90, p99 = np.percentile(reached, [10, 50, 90, 99], method="inverted_cdf")
+    return {
+        "reached": int(reached.size),
+        "mean": round(float(reached.mean()), 1),
+        "p10": int(p10), "p50": int(p50), "p90": int(p90), "p99": int(p99),
+        "max": int(reached.max())
+    }
+
+
+# "hallway=40,treasure=25" on top of the game's weights, or a JSON file of weights
+def parse_weights(spec):
+    weights = dict(outcomes)
+    if not spec:
+        return weights
+    if spec.endswith(".json"):
+        with open(spec, encoding="utf-8") as f:
+            overrides = json.load(f)
+    else:
+        overrides = {}
+        for item in spec.split(","):
+            name, _, value = item.partition("=")
+            overrides[name.strip()] = float(value)
+    unknown = set(overrides) - set(outcomes)
+    if unknown:
+        raise ValueError(f"Unknown outcomes: {', '.join(sorted(unknown))}")
+    weights.update(overrides)
+    if any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0:
+        raise ValueError("Weights must be non-negative with a positive total")
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate how many `.open`s players need to reach each goal")
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--weights", help="overrides like hallway=40,treasure=25, or a JSON file of weights")
+    parser.add_argument("--max-opens", type=int, default=20_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--engine", choices=["numpy", "python"], default="numpy",
+                        help="python runs the one-player-at-a-time reference (slow, no NumPy needed)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        weights = parse_weights(args.weights)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Bad weights: {e}")
+
+    started = time.perf_counter()
+    if args.engine == "numpy":
+        try:
+            results = simulate_numpy(weights, args.players, args.max_opens, args.seed)
+        except RuntimeError as e:
+            sys.exit(str(e))
+        report = {goal: summarize_numpy(values) for goal, values in results.items()}
+    else:
+        results = simulate_python(weights, args.players, args.max_opens, args.seed)
+        report = {goal: summarize(values) for goal, values in results.items()}
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({"weights": weights, "players": args.players, "seconds": round(elapsed, 2),
+                          "goals": report}, indent=2))
+        return
+
+    total = sum(weights.values())
+    print("Weights: " + ", ".join(f"{name} {w:g} ({w / total:.1%})" for name, w in weights.items()))
+    print(f"{args.players:,} players in {elapsed:.1f}s\n")
+    print(f"{'goal':<14}{'reached':>10}{'mean':>9}{'p10':>7}{'p50':>7}{'p90':>7}{'p99':>7}{'max':>8}")
+    for goal in GOALS:
+        row = report[goal]
+        if not row["reached"]:
+            print(f"{goal:<14}{0:>10.1%}")
+            continue
+        print(f"{goal:<14}{row['reached'] / args.players:>10.1%}{row['mean']:>9}{row['p10']:>7}"
+              f"{row['p50']:>7}{row['p90']:>7}{row['p99']:>7}{row['max']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+
+# Write text to path atomically: write a temp file in the same directory,
+# fsync it, then rename it over the target so readers never see a partial file
+def atomic_write_text(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_json(path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+# Small JSON state file saved off the event loop. changed() schedules a save;
+# changes made while a write is in flight are picked up by one follow-up
+# write, so saves never overlap or land out of order. `snapshot` returns the
+# JSON-serializable state and is always called on the event loop.
+class JsonStateFile:
+    def __init__(self, path, snapshot):
+        self.path = path
+        self.snapshot = snapshot
+        self._dirty = False
+        self._task = None
+
+    def changed(self):
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save_now()
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._save_soon())
+
+    async def _save_soon(self):
+        while self._dirty:
+            self._dirty = False
+            payload = json.dumps(self.snapshot())
+            try:
+                await asyncio.to_thread(atomic_write_text, self.path, payload)
+            except OSError:
+                logging.exception(f"Could not save {self.path}")
+
+    # Wait for any pending save to land (used at shutdown)
+    async def flush(self):
+        if self._task is not None and not self._task.done():
+            await self._task
+        if self._dirty:
+            self.save_now()
+
+    def save_now(self):
+        self._dirty = False
+        atomic_write_text(self.path, json.dumps(self.snapshot()))
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+from asset_cache import AssetUrlCache, url_expiry  # noqa: E402
+
+URL = "https://cdn.discordapp.com/attachments/1/2/door.png?ex=7fffffff&is=1&hm=abc"
+
+
+class FakeResponse:
+    status = 404
+    reason = "Not Found"
+
+
+class FakeAttachment:
+    def __init__(self, url):
+        self.url = url
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, url):
+        self.channel = channel
+        self.id = message_id
+        self.attachments = [FakeAttachment(url)]
+
+
+class FakeChannel:
+    id = 5
+
+    def __init__(self):
+        self.messages = {}
+        self.sent = []
+
+    async def send(self, file=None):
+        self.sent.append(file)
+        message = self.messages[len(self.sent)] = FakeMessage(self, len(self.sent), URL)
+        return message
+
+    async def fetch_message(self, message_id):
+        try:
+            return self.messages[message_id]
+        except KeyError:
+            raise discord.NotFound(FakeResponse(), "Unknown Message") from None
+
+
+class FakeBot:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_channel(self, channel_id):
+        return self.channel if channel_id == self.channel.id else None
+
+
+class FakeImageIndex:
+    async def file(self, path, filename):
+        return filename
+
+
+def test_url_expiry():
+    assert url_expiry(URL) == 0x7fffffff
+    assert url_expiry("https://cdn.discordapp.com/a.png") == float("inf")
+    assert url_expiry("https://cdn.discordapp.com/a.png?ex=zz") == float("inf")
+
+
+def test_concurrent_requests_upload_once(tmp_path):
+    channel = FakeChannel()
+    cache = AssetUrlCache(FakeBot(channel), channel.id, FakeImageIndex(), path=str(tmp_path / "urls.json"))
+
+    async def scenario():
+        urls = await asyncio.gather(cache.request("img/door.png"), cache.request("img/door.png"))
+        assert urls == [URL, URL]
+        assert channel.sent == ["img_door.png"]
+        assert cache.url_for("img/door.png") == URL
+        await cache.flush()
+
+    asyncio.run(scenario())
+    saved = json.loads((tmp_path / "urls.json").read_text())
+    assert saved["img/door.png"]["message_id"] == 1
+
+
+def test_refresh_drops_deleted_messages(tmp_path):
+    channel = FakeChannel()
+    path = tmp_path / "urls.json"
+    cache = AssetUrlCache(FakeBot(channel), channel.id, FakeImageIndex(), path=str(path))
+
+    async def scenario():
+        await cache.request("img/door.png")
+        await cache.flush()
+        channel.messages.clear()
+        assert await cache.refresh("img/door.png") is None
+        await cache.flush()
+
+    asyncio.run(scenario())
+    assert json.loads(path.read_text()) == {}
+
+
+def test_without_the_asset_channel(tmp_path):
+    cache = AssetUrlCache(FakeBot(FakeChannel()), 99, FakeImageIndex(), path=str(tmp_path / "urls.json"))
+    assert asyncio.run(cache.upload("img/door.png")) is None
+    assert cache.entries == {}
@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("discord")
+
+from audio_pack import AudioPack, write_pack  # noqa: E402
+
+TRACKS = {
+    "audio/door.mp3": [b"\x01\x02", b"\x03", b"\x04\x05\x06"],
+    "audio/key.mp3": [b"\xff" * 40],
+    "audio/empty.mp3": []
+}
+
+
+@pytest.fixture
+def pack(tmp_path):
+    path = str(tmp_path / "clips.opuspack")
+    write_pack(path, TRACKS)
+    return AudioPack(path)
+
+
+def read_all(source):
+    frames = []
+    while True:
+        frame = source.read()
+        if not frame:
+            return frames
+        frames.append(bytes(frame))
+
+
+def test_round_trip(pack):
+    assert set(pack.tracks) == set(TRACKS)
+    for name, frames in TRACKS.items():
+        assert name in pack
+        assert read_all(pack.source(name)) == frames
+
+
+def test_sources_are_independent_and_rewind(pack):
+    first, second = pack.source("audio/door.mp3"), pack.source("audio/door.mp3")
+    assert first.is_opus()
+    assert bytes(first.read()) == b"\x01\x02"
+    assert bytes(second.read()) == b"\x01\x02"
+    first.rewind()
+    assert read_all(first) == TRACKS["audio/door.mp3"]
+
+
+def test_missing_clip(pack, tmp_path):
+    assert "audio/menu.mp3" not in pack
+    assert pack.source("audio/menu.mp3") is None
+    assert AudioPack.open_if_exists(str(tmp_path / "none.opuspack")) is None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "clips.opuspack"
+    path.write_bytes(b"not a pack")
+    with pytest.raises(ValueError):
+        AudioPack(str(path))
@@ -0,0 +1,66 @@
+import json
+import logging
+
+import pytest
+
+from bot_logging import JsonFormatter, SamplingFilter, _stop_listener, parse_sample_rates, setup_logging
+
+
+def record(msg, *args, **extra):
+    record = logging.LogRecord("bot", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("activity=100, voice=10") == {"activity": 100, "voice": 10}
+    assert parse_sample_rates("") == {}
+    assert parse_sample_rates(None) == {}
+
+
+def test_json_formatter():
+    entry = json.loads(JsonFormatter().format(record("Opened %d doors", 3, category="command", user=42)))
+    assert entry["msg"] == "Opened 3 doors"
+    assert entry["level"] == "INFO"
+    assert entry["category"] == "command" and entry["user"] == 42
+    assert "guild" not in entry
+
+
+def test_sampling_filter():
+    sampler = SamplingFilter({"activity": 3, "voice": 1})
+    kept = [sampler.filter(record("x", category="activity")) for _ in range(9)]
+    assert kept.count(True) == 3
+    assert all(sampler.filter(record("x", category="voice")) for _ in range(3))
+    assert all(sampler.filter(record("x")) for _ in range(3))
+
+
+def test_setup_logging_writes_through_the_queue(tmp_path, root_logger):
+    path = tmp_path / "bot.log"
+    listener = setup_logging(str(path), sample_rates={"activity": 2})
+    try:
+        logging.info("Activity", extra={"category": "activity", "user": 1})
+        logging.info("Activity", extra={"category": "activity", "user": 2})
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logging.exception("Command failed")
+    finally:
+        _stop_listener(listener)
+        _stop_listener(listener)  # Safe to call again, as atexit will
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [entry["msg"] for entry in entries] == ["Activity", "Command failed"]
+    assert entries[0]["user"] == 1
+    assert "RuntimeError: boom" in entries[1]["exc"]
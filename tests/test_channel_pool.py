@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import json
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+from channel_pool import POOL_TEXT_NAME, ChannelPool  # noqa: E402
+
+_ids = itertools.count(1000)
+
+
+class FakeResponse:
+    status = 500
+    reason = "Internal Server Error"
+
+
+class FakeChannel:
+    def __init__(self, guild, name, overwrites):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = name
+        self.overwrites = overwrites
+        self.members = []
+        self.purged = False
+        self.fail_edits = False
+
+    async def edit(self, name=None, overwrites=None):
+        if self.fail_edits:
+            raise discord.HTTPException(FakeResponse(), "edit failed")
+        if name is not None:
+            self.name = name
+        if overwrites is not None:
+            self.overwrites = overwrites
+
+    async def purge(self, limit=None):
+        self.purged = True
+
+
+class FakeGuild:
+    id = 1
+    default_role = "@everyone"
+    me = "bot"
+
+    def __init__(self):
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def create_text_channel(self, name, overwrites=None):
+        channel = FakeChannel(self, name, overwrites)
+        self.channels[channel.id] = channel
+        return channel
+
+    create_voice_channel = create_text_channel
+
+
+def test_claim_hands_out_the_oldest_pair_and_refills(tmp_path):
+    guild = FakeGuild()
+    pool = ChannelPool(2, path=str(tmp_path / "pool.json"))
+
+    async def scenario():
+        pool.refill(guild)
+        await pool._refills[guild.id]
+        first = pool.pairs[guild.id][0]
+        assert guild.get_channel(first[0]).name == POOL_TEXT_NAME
+        assert guild.get_channel(first[0]).overwrites["@everyone"].view_channel is False
+
+        text_channel, voice_channel = await pool.claim(guild, "game-text-ann", "game-voice-ann")
+        assert (text_channel.id, voice_channel.id) == first
+        assert text_channel.name == "game-text-ann" and voice_channel.name == "game-voice-ann"
+        assert text_channel.overwrites == {} and voice_channel.overwrites == {}
+        await pool._refills[guild.id]
+        assert pool.size(guild.id) == 2
+        await pool.flush()
+
+    asyncio.run(scenario())
+    assert len(json.loads((tmp_path / "pool.json").read_text())["1"]) == 2
+
+
+def test_claim_skips_deleted_and_failing_pairs(tmp_path):
+    guild = FakeGuild()
+    discarded = []
+    pool = ChannelPool(3, path=str(tmp_path / "pool.json"), discard=lambda guild, channels: discarded.append(channels))
+
+    async def scenario():
+        pool.refill(guild)
+        await pool._refills[guild.id]
+        deleted, failing, good = list(pool.pairs[guild.id])
+        del guild.channels[deleted[0]]
+        pool.target_size = 0  # No refills, so the pool runs dry
+        guild.get_channel(failing[0]).fail_edits = True
+
+        text_channel, voice_channel = await pool.claim(guild, "game-text-ann", "game-voice-ann")
+        assert (text_channel.id, voice_channel.id) == good
+        assert [(text.id, voice.id) for text, voice in discarded] == [failing]
+        assert await pool.claim(guild, "game-text-bob", "game-voice-bob") == (None, None)
+
+    asyncio.run(scenario())
+
+
+def test_release(tmp_path):
+    guild = FakeGuild()
+    pool = ChannelPool(1, path=str(tmp_path / "pool.json"))
+
+    async def scenario():
+        text_channel = await guild.create_text_channel("game-text-ann", overwrites={})
+        voice_channel = await guild.create_voice_channel("game-voice-ann", overwrites={})
+        assert await pool.release(guild, text_channel, voice_channel)
+        assert text_channel.purged
+        assert text_channel.overwrites["@everyone"].view_channel is False
+        assert list(pool.pairs[guild.id]) == [(text_channel.id, voice_channel.id)]
+
+        other = [await guild.create_text_channel("game-text-bob"), await guild.create_voice_channel("game-voice-bob")]
+        assert not await pool.release(guild, *other)  # Full
+
+    asyncio.run(scenario())
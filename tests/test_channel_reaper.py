@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+discord = pytest.importorskip("discord")
+
+from channel_reaper import ChannelReaper  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "error"
+
+
+class FakeChannel:
+    def __init__(self, channel_id, failures=()):
+        self.id = channel_id
+        self.failures = list(failures)
+        self.deleted = False
+
+    async def delete(self, reason=None):
+        if self.failures:
+            status = self.failures.pop(0)
+            error = {403: discord.Forbidden, 404: discord.NotFound}.get(status, discord.HTTPException)
+            raise error(FakeResponse(status), "delete failed")
+        self.deleted = True
+
+
+class FakeGuild:
+    id = 1
+
+    def __init__(self, *channels):
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class FakeBot:
+    def __init__(self, guild):
+        self.guild = guild
+
+    def get_guild(self, guild_id):
+        return self.guild if guild_id == self.guild.id else None
+
+
+class FakePool:
+    def __init__(self, accept):
+        self.accept = accept
+        self.released = []
+
+    async def release(self, guild, text_channel, voice_channel):
+        self.released.append((text_channel.id, voice_channel.id))
+        return self.accept
+
+
+def make_reaper(tmp_path, guild, pool=None, **kwargs):
+    return ChannelReaper(FakeBot(guild), pool or FakePool(False), path=str(tmp_path / "teardown.json"), **kwargs)
+
+
+def job(*channel_ids, recycle=False):
+    return {"guild_id": 1, "channel_ids": list(channel_ids), "recycle": recycle, "attempts": 0, "not_before": 0}
+
+
+def test_retries_server_errors_with_backoff(tmp_path):
+    flaky, gone, forbidden = FakeChannel(10, [503, 429]), FakeChannel(11, [404]), FakeChannel(12, [403])
+    reaper = make_reaper(tmp_path, FakeGuild(flaky, gone, forbidden))
+
+    async def scenario():
+        started = time.time()
+        retry = await reaper._process(job(10, 11, 12))
+        assert retry["channel_ids"] == [10]
+        assert retry["attempts"] == 1
+        assert retry["not_before"] >= started + 2
+        retry = await reaper._process(retry)
+        assert retry["attempts"] == 2
+        assert retry["not_before"] >= started + 4
+        assert await reaper._process(retry) is None
+        assert flaky.deleted
+
+    asyncio.run(scenario())
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    reaper = make_reaper(tmp_path, FakeGuild(FakeChannel(10, [500] * 10)), max_attempts=2)
+
+    async def scenario():
+        retry = await reaper._process(job(10))
+        assert await reaper._process(retry) is None
+
+    asyncio.run(scenario())
+
+
+def test_recycles_pairs_into_the_pool(tmp_path):
+    text_channel, voice_channel = FakeChannel(10), FakeChannel(11)
+    pool = FakePool(True)
+    reaper = make_reaper(tmp_path, FakeGuild(text_channel, voice_channel), pool)
+    assert asyncio.run(reaper._process(job(10, 11, recycle=True))) is None
+    assert pool.released == [(10, 11)]
+    assert not text_channel.deleted and not voice_channel.deleted
+
+
+def test_worker_drains_the_queue(tmp_path):
+    channels = [FakeChannel(channel_id) for channel_id in range(10, 17)]
+    guild = FakeGuild(*channels)
+    reaper = make_reaper(tmp_path, guild, batch_size=2, batch_interval=0)
+
+    async def scenario():
+        reaper.start()
+        reaper.enqueue(guild, channels[:2])
+        for channel in channels[2:]:
+            reaper.enqueue(guild, [channel])
+        for _ in range(100):
+            if not len(reaper) and not reaper._in_flight:
+                break
+            await asyncio.sleep(0.01)
+        await reaper.stop()
+
+    asyncio.run(scenario())
+    assert all(channel.deleted for channel in channels)
+    assert json.loads((tmp_path / "teardown.json").read_text()) == []
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+pytest.importorskip("discord")
+
+from channel_registry import ChannelRegistry  # noqa: E402
+
+
+class FakeGuild:
+    def __init__(self, guild_id, channel_ids):
+        self.id = guild_id
+        self.channels = {channel_id: f"channel-{channel_id}" for channel_id in channel_ids}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+def test_register_and_look_up(tmp_path):
+    registry = ChannelRegistry(str(tmp_path / "games.json"))
+    registry.register(42, 1, text_id=100, voice_id=101)
+    registry.register(42, 2, text_id=200)
+
+    assert (1, 42) in registry and (2, 42) in registry
+    assert registry.owner_of(101) == 42
+    assert registry.owner_of(999) is None
+    assert registry.channels(FakeGuild(1, [100, 101]), 42) == ("channel-100", "channel-101")
+    assert registry.channels(FakeGuild(2, [200]), 42) == ("channel-200", None)
+    assert registry.channels(FakeGuild(3, []), 42) == (None, None)
+
+    registry.register(42, 1, text_id=102)  # A new game replaces the old channels
+    assert registry.owner_of(100) is None
+    assert registry.owner_of(102) == 42
+
+
+def test_unregister(tmp_path):
+    registry = ChannelRegistry(str(tmp_path / "games.json"))
+    registry.register(42, 1, text_id=100, voice_id=101)
+    assert registry.unregister(42, 1) == {"guild_id": 1, "text_id": 100, "voice_id": 101}
+    assert registry.unregister(42, 1) is None
+    assert registry.owner_of(100) is None and registry.owner_of(101) is None
+
+
+def test_channel_deleted(tmp_path):
+    registry = ChannelRegistry(str(tmp_path / "games.json"))
+    registry.register(42, 1, text_id=100, voice_id=101)
+
+    assert registry.channel_deleted(100) == 42
+    assert registry.get(1, 42) == {"guild_id": 1, "text_id": None, "voice_id": 101}
+    assert registry.channel_deleted(100) is None
+    assert registry.channel_deleted(101) == 42
+    assert (1, 42) not in registry
+
+
+def test_persists_and_reads_old_keys(tmp_path):
+    path = tmp_path / "games.json"
+    registry = ChannelRegistry(str(path))
+    registry.register(42, 1, text_id=100, voice_id=101)
+    assert json.loads(path.read_text()) == {"1:42": {"guild_id": 1, "text_id": 100, "voice_id": 101}}
+
+    path.write_text(json.dumps({"43": {"guild_id": 1, "text_id": 300, "voice_id": None}}))
+    registry = ChannelRegistry(str(path))
+    assert registry.get(1, 43)["text_id"] == 300
+    assert registry.owner_of(300) == 43
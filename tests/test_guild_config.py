@@ -0,0 +1,27 @@
+import pytest
+
+from guild_config import GuildConfigStore, GuildSettings, parse_weight_overrides
+
+KNOWN = {"hallway", "treasure", "key"}
+
+
+def test_parse_weight_overrides():
+    assert parse_weight_overrides("hallway=40, treasure=25,", KNOWN) == {"hallway": 40.0, "treasure": 25.0}
+
+
+@pytest.mark.parametrize("spec", ["lobby=1", "key=-1", "key=nan", "key=inf", "key=-inf", "key=lots"])
+def test_parse_weight_overrides_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_weight_overrides(spec, KNOWN)
+
+
+def test_store_merges_over_defaults(tmp_path):
+    defaults = GuildSettings({"hallway": 50, "key": 10}, inactivity_timeout=300, voice_idle_timeout=300)
+    store = GuildConfigStore(defaults, str(tmp_path / "guild_config.json"))
+    store.set(1, "outcome_weights", {"key": 20})
+    store.set(1, "inactivity_timeout", 60)
+    assert store.get(1).outcome_weights == {"hallway": 50, "key": 20}
+    assert store.get(1).inactivity_timeout == 60
+    assert store.get(2).inactivity_timeout == 300
+    store.set(1, "inactivity_timeout", None)
+    assert store.get(1).inactivity_timeout == 300
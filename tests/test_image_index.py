@@ -0,0 +1,68 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+pytest.importorskip("discord")
+
+from image_index import ImageIndex  # noqa: E402
+
+
+@pytest.fixture
+def artwork(tmp_path):
+    doors = tmp_path / "doors"
+    doors.mkdir()
+    for name in ("b.png", "a.jpg", "notes.txt"):
+        (doors / name).write_bytes(name.encode() * 10)
+    (tmp_path / "key.png").write_bytes(b"key" * 10)
+    return tmp_path
+
+
+def make_index(artwork, **kwargs):
+    folders = {"door": str(artwork / "doors"), "hallway": str(artwork / "missing")}
+    files = {"key": str(artwork / "key.png"), "map": str(artwork / "map.png")}
+    return ImageIndex(folders, files, fallback="img/default.jpg", **kwargs)
+
+
+def test_scan(artwork):
+    index = make_index(artwork)
+    doors = artwork / "doors"
+    assert index.candidates["door"] == (str(doors / "a.jpg"), str(doors / "b.png"))
+    assert "hallway" not in index.candidates
+    assert index.exists(str(artwork / "key.png"))
+    assert not index.exists(str(doors / "notes.txt"))
+    assert index.image_path("key") == str(artwork / "key.png")
+    assert index.image_path("map") is None
+    assert index.random_image("door", random.Random(1)) in index.candidates["door"]
+    assert index.random_image("hallway") == "img/default.jpg"
+
+
+def test_reload_if_changed(artwork):
+    index = make_index(artwork)
+    assert not index.reload_if_changed()
+    (artwork / "doors" / "c.png").write_bytes(b"c")
+    os.utime(artwork / "doors", ns=(0, 1))  # The mtime must differ even on coarse filesystems
+    assert index.reload_if_changed()
+    assert str(artwork / "doors" / "c.png") in index.candidates["door"]
+
+
+def test_reads_are_cached_up_to_the_limit(artwork):
+    index = make_index(artwork, cache_bytes=60)
+    key = str(artwork / "key.png")
+    assert index.read(key) == b"key" * 10
+    (artwork / "key.png").write_bytes(b"changed")
+    assert index.read(key) == b"key" * 10
+    assert index._cached_size <= 60
+
+
+def test_file_reads_misses_in_a_thread(artwork):
+    index = make_index(artwork, cache_bytes=0)
+    path = str(artwork / "doors" / "a.jpg")
+
+    async def scenario():
+        file = await index.file(path, "door.jpg")
+        assert file.filename == "door.jpg"
+        assert file.fp.read() == b"a.jpg" * 10
+
+    asyncio.run(scenario())
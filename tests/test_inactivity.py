@@ -0,0 +1,68 @@
+import asyncio
+
+from inactivity import InactivityScheduler
+
+
+def run_scheduler(timeout, scenario):
+    expired = []
+
+    async def on_expire(user_id):
+        expired.append(user_id)
+
+    async def main():
+        scheduler = InactivityScheduler(timeout, on_expire)
+        scheduler.start()
+        try:
+            await scenario(scheduler)
+        finally:
+            scheduler.stop()
+
+    asyncio.run(main())
+    return expired
+
+
+def test_expires_once_after_the_timeout():
+    async def scenario(scheduler):
+        scheduler.touch(1)
+        await asyncio.sleep(0.02)
+        assert 1 in scheduler
+        await asyncio.sleep(0.15)
+        assert 1 not in scheduler
+
+    assert run_scheduler(0.05, scenario) == [1]
+
+
+def test_activity_pushes_the_deadline_back():
+    async def scenario(scheduler):
+        scheduler.touch(1)
+        for _ in range(5):
+            await asyncio.sleep(0.03)
+            scheduler.touch(1)
+        assert 1 in scheduler
+        assert len(scheduler._heap) == 1  # One entry per user, however often they are touched
+        await asyncio.sleep(0.15)
+        assert 1 not in scheduler
+
+    assert run_scheduler(0.08, scenario) == [1]
+
+
+def test_forgotten_users_do_not_expire():
+    async def scenario(scheduler):
+        scheduler.touch(1)
+        scheduler.touch(2)
+        scheduler.forget(1)
+        await asyncio.sleep(0.15)
+
+    assert run_scheduler(0.05, scenario) == [2]
+
+
+def test_timeout_per_key():
+    async def scenario(scheduler):
+        scheduler.touch(("slow", 1))
+        scheduler.touch(("fast", 2))
+        await asyncio.sleep(0.1)
+        assert ("slow", 1) in scheduler
+        assert ("fast", 2) not in scheduler
+
+    expired = run_scheduler(lambda key: 0.03 if key[0] == "fast" else 10, scenario)
+    assert expired == [("fast", 2)]
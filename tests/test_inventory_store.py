@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+from inventory_store import (InventoryStore, JsonInventoryBackend, SqliteInventoryBackend,
+                             migrate_json_to_sqlite, open_backend)
+from player_inventory import PlayerInventory
+
+RECORD = {"items": ["Dragon Scale", "key", "key", "Lucky Pebble"], "coins": ["coin2", "coin5"]}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    backend = open_backend(request.param, str(tmp_path / "inventories.json"), str(tmp_path / "inventories.db"))
+    yield backend
+    backend.close()
+
+
+def reopen(backend):
+    backend.close()
+    if isinstance(backend, SqliteInventoryBackend):
+        return SqliteInventoryBackend(backend.path)
+    return JsonInventoryBackend(backend.path)
+
+
+def test_round_trip(backend):
+    backend.write(backend.snapshot({"1:42": RECORD, "1:43": {"items": [], "coins": []}}))
+    backend = reopen(backend)
+    try:
+        assert backend.load("1:42") == RECORD
+        assert backend.load("1:43") == {"items": [], "coins": []}
+        assert backend.load("1:44") is None
+        assert sorted(backend.player_ids()) == ["1:42", "1:43"]
+    finally:
+        backend.close()
+
+
+def test_delete(backend):
+    backend.write(backend.snapshot({"1:42": RECORD}))
+    backend.write(backend.snapshot({"1:42": None}))
+    assert not backend.exists("1:42")
+    assert backend.load("1:42") is None
+
+
+def test_sqlite_rewrites_only_changed_entries(tmp_path):
+    backend = SqliteInventoryBackend(str(tmp_path / "inventories.db"))
+    try:
+        backend.write({"42": RECORD})
+        backend.write({"42": {"items": ["key"], "coins": ["coin2"]}})
+        assert backend.load("42") == {"items": ["key"], "coins": ["coin2"]}
+    finally:
+        backend.close()
+
+
+def test_migration(tmp_path):
+    json_path = tmp_path / "player_inventories.json"
+    db_path = str(tmp_path / "inventories.db")
+    json_path.write_text(json.dumps({"42": RECORD, "43": {"items": ["key"], "coins": []}}))
+
+    assert migrate_json_to_sqlite(str(json_path), db_path) == 2
+    # A database that already holds players is left alone
+    assert migrate_json_to_sqlite(str(json_path), db_path) == 0
+
+    backend = SqliteInventoryBackend(db_path)
+    try:
+        assert backend.load("42") == RECORD
+        assert backend.load("43") == {"items": ["key"], "coins": []}
+    finally:
+        backend.close()
+
+
+def test_migration_without_json_file(tmp_path):
+    assert migrate_json_to_sqlite(str(tmp_path / "missing.json"), str(tmp_path / "inventories.db")) == 0
+
+
+def test_store_flushes_changes_and_deletes(backend):
+    async def scenario():
+        store = InventoryStore(backend, max_players=1)
+        inventory = store.get_or_create("42")
+        inventory.add_key()
+        store.mark_dirty("42")
+        store["43"] = PlayerInventory.from_record(RECORD)  # Evicts 42 while it is still dirty
+        await store.flush()
+        assert backend.load("42") == {"items": ["key"], "coins": []}
+        assert store["42"].keys == 1
+
+        del store["43"]
+        assert "43" not in store
+        await store.flush()
+        assert not backend.exists("43")
+
+        # A dirty player the store doesn't hold is not written as a delete
+        store.mark_dirty("42")
+        store._cache.clear()
+        await store.flush()
+        assert backend.exists("42")
+
+    asyncio.run(scenario())
+
+
+def test_prefetch(tmp_path):
+    async def scenario():
+        backend = SqliteInventoryBackend(str(tmp_path / "inventories.db"))
+        backend.write({"42": RECORD})
+        store = InventoryStore(backend, max_players=10)
+        await store.prefetch("42")
+        await store.prefetch("43")
+        backend.close()  # Lookups must now be answered from memory
+        assert store["42"] == PlayerInventory.from_record(RECORD)
+        assert "43" not in store
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from lifecycle import LifecycleManager
+
+
+class FakeBot:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_checkpoint_then_restore_once(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    steps = []
+    resumed = []
+
+    async def shutdown():
+        steps.append("shutdown")
+
+    async def resume(state, downtime):
+        resumed.append((state["games"], downtime))
+
+    async def scenario():
+        bot = FakeBot()
+        manager = LifecycleManager(bot, str(path), lambda: {"games": [[1, 42]]}, shutdown, resume)
+        manager.request_shutdown("SIGTERM")
+        assert manager.closing
+        await manager._task
+        assert bot.closed and steps == ["shutdown"]
+        assert json.loads(path.read_text())["games"] == [[1, 42]]
+
+        restarted = LifecycleManager(FakeBot(), str(path), dict, shutdown, resume)
+        await restarted.restore()
+        await restarted.restore()
+
+    asyncio.run(scenario())
+    assert len(resumed) == 1
+    games, downtime = resumed[0]
+    assert games == [[1, 42]] and 0 <= downtime < 5
+    assert not path.exists()  # Never replayed
+
+
+def test_budget_bounds_the_shutdown(tmp_path):
+    async def slow_shutdown():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        bot = FakeBot()
+        manager = LifecycleManager(bot, str(tmp_path / "checkpoint.json"), dict, slow_shutdown, None, budget=0.05)
+        manager.request_shutdown()
+        await asyncio.wait_for(manager._task, timeout=1)
+        assert bot.closed
+
+    asyncio.run(scenario())
+
+
+def test_second_signal_closes_right_away(tmp_path):
+    async def slow_shutdown():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        bot = FakeBot()
+        manager = LifecycleManager(bot, str(tmp_path / "checkpoint.json"), dict, slow_shutdown, None)
+        manager.request_shutdown("SIGTERM")
+        await asyncio.sleep(0.05)
+        manager.request_shutdown("SIGTERM")
+        await asyncio.wait_for(manager._task, timeout=1)
+        assert bot.closed
+
+    asyncio.run(scenario())
+
+
+def test_failed_resume_still_removes_the_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"games": [], "saved_at": 0}))
+
+    async def resume(state, downtime):
+        raise RuntimeError("boom")
+
+    asyncio.run(LifecycleManager(FakeBot(), str(path), dict, None, resume).restore())
+    assert not path.exists()
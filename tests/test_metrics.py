@@ -0,0 +1,70 @@
+import asyncio
+
+from metrics import Histogram, MetricsRegistry, serve_metrics
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(bounds=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.count == 5
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.8) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_render():
+    registry = MetricsRegistry()
+    registry.describe("voicebot_command_seconds", "Command latency")
+    registry.observe("voicebot_command_seconds", 0.02, command="open")
+    registry.inc("voicebot_commands_total", command='say "hi"')
+    registry.gauge("voicebot_players", lambda: 3, "Active players")
+    registry.gauge("voicebot_broken", lambda: 1 / 0)
+
+    text = registry.render()
+    assert "# HELP voicebot_command_seconds Command latency" in text
+    assert "# TYPE voicebot_command_seconds histogram" in text
+    assert 'voicebot_command_seconds_bucket{command="open",le="0.01"} 0' in text
+    assert 'voicebot_command_seconds_bucket{command="open",le="0.025"} 1' in text
+    assert 'voicebot_command_seconds_bucket{command="open",le="+Inf"} 1' in text
+    assert 'voicebot_command_seconds_count{command="open"} 1' in text
+    assert 'voicebot_commands_total{command="say \\"hi\\""} 1' in text
+    assert "voicebot_players 3" in text
+    assert "voicebot_broken" not in text  # A failing gauge is logged and skipped
+
+
+def test_timer_and_series():
+    registry = MetricsRegistry()
+    with registry.timer("voicebot_io_seconds", op="save"):
+        pass
+    with registry.timer("voicebot_io_seconds", op="load"):
+        pass
+    series = registry.series("voicebot_io_seconds", "op")
+    assert set(series) == {"save", "load"}
+    assert series["save"].count == 1
+
+
+def test_serve_metrics():
+    registry = MetricsRegistry()
+    registry.inc("voicebot_commands_total")
+
+    async def fetch(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    async def scenario():
+        server = await serve_metrics(registry, port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            assert "voicebot_commands_total 1" in await fetch(port, "/metrics")
+            assert (await fetch(port, "/other")).startswith("HTTP/1.1 404")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import array
+import asyncio
+import subprocess
+
+import pytest
+
+pytest.importorskip("discord")
+
+import mixer  # noqa: E402
+from audio_pack import FRAME_BYTES  # noqa: E402
+from mixer import Layer, MixerSource, PcmClipCache  # noqa: E402
+
+SAMPLES = FRAME_BYTES // 2
+
+
+def clip(value, frames=1):
+    return array.array("h", [value] * (SAMPLES * frames)).tobytes()
+
+
+def samples(frame):
+    return set(array.array("h", bytes(frame)))
+
+
+@pytest.fixture(params=["audioop", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(mixer, "audioop", None)
+    elif mixer.audioop is None:
+        pytest.skip("audioop is not available")
+
+
+def test_layer_pads_and_loops():
+    layer = Layer(clip(7)[:100], 1.0)
+    frame = bytes(layer.next_frame())
+    assert len(frame) == FRAME_BYTES and frame[:100] == clip(7)[:100] and samples(frame[100:]) == {0}
+    assert layer.next_frame() is None
+
+    looping = Layer(clip(7), 1.0, loop=True)
+    assert bytes(looping.next_frame()) == bytes(looping.next_frame()) == clip(7)
+    assert Layer(b"", 1.0, loop=True).next_frame() is None
+
+
+def test_effects_mix_and_saturate(backend):
+    source = MixerSource(effect_volume=1.0, max_effects=3)
+    assert source.add_effect(clip(1000))  # Starts the mixer
+    assert not source.add_effect(clip(30000))
+    source.add_effect(clip(4000), volume=0.5)
+    assert samples(source.read()) == {32767}
+
+    source = MixerSource(effect_volume=1.0)
+    source.add_effect(clip(-30000))
+    source.add_effect(clip(-30000))
+    assert samples(source.read()) == {-32768}
+
+    source = MixerSource(effect_volume=1.0)
+    source.add_effect(clip(1000))
+    source.add_effect(clip(-300), volume=0.5)
+    assert samples(source.read()) == {850}
+
+
+def test_oldest_effect_is_dropped(backend):
+    source = MixerSource(effect_volume=1.0, max_effects=2)
+    for value in (1, 10, 100):
+        source.add_effect(clip(value))
+    assert samples(source.read()) == {110}
+
+
+def test_music_is_ducked_under_effects(backend):
+    source = MixerSource(music_volume=1.0, duck_volume=0.25)
+    source.set_music(clip(10000, frames=100))
+    assert samples(source.read()) == {10000}
+    source.add_effect(clip(0, frames=50))
+    levels = [samples(source.read()).pop() for _ in range(20)]
+    assert levels == sorted(levels, reverse=True)  # Glides down rather than jumping
+    assert levels[0] > 2500 and levels[-1] == 2500
+
+
+def test_runs_dry_when_everything_finished(backend):
+    source = MixerSource()
+    source.add_effect(clip(5))
+    assert samples(source.read()) == {5}
+    assert samples(source.read()) == {0}  # The effect ends during this frame
+    assert source.read() == b""
+    assert not source.active
+    assert source.add_effect(clip(5))  # Has to be started again
+
+
+def test_clip_cache(tmp_path, monkeypatch):
+    path = tmp_path / "door.mp3"
+    path.write_bytes(b"mp3")
+    broken = tmp_path / "broken.mp3"
+    broken.write_bytes(b"not audio")
+    decodes = []
+
+    def decode(clip_path):
+        decodes.append(clip_path)
+        if clip_path == str(broken):
+            raise subprocess.CalledProcessError(1, ["ffmpeg"])
+        return clip(1, frames=2)
+
+    monkeypatch.setattr(mixer, "decode_pcm", decode)
+    cache = PcmClipCache(max_bytes=FRAME_BYTES * 3)
+
+    async def scenario():
+        first, second = await asyncio.gather(cache.get(str(path)), cache.get(str(path)))
+        assert first == second == clip(1, frames=2)
+        assert await cache.get(str(tmp_path / "missing.mp3")) is None
+        assert await cache.get(str(broken)) is None
+        assert await cache.get(str(broken)) is None
+
+    asyncio.run(scenario())
+    assert decodes == [str(path), str(broken)]  # Shared decode, and failures aren't retried
+
+
+def test_clip_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(mixer, "decode_pcm", lambda clip_path: clip(1, frames=2))
+    cache = PcmClipCache(max_bytes=FRAME_BYTES * 5)
+    paths = []
+    for name in ("a", "b", "c"):
+        paths.append(str(tmp_path / f"{name}.mp3"))
+        (tmp_path / f"{name}.mp3").write_bytes(b"mp3")
+
+    async def scenario():
+        for clip_path in paths:
+            await cache.get(clip_path)
+
+    asyncio.run(scenario())
+    assert list(cache._clips) == paths[1:]
+    assert cache._size == FRAME_BYTES * 4
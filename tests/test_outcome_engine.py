@@ -0,0 +1,44 @@
+import random
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("discord")
+
+from outcome_engine import AliasSampler, OutcomeEngine  # noqa: E402
+
+WEIGHTS = {"hallway": 50, "fall": 30, "treasure": 15, "key": 5}
+TEXTS = {name: {"title": name.title(), "description": f"You find a {name}."} for name in WEIGHTS}
+
+
+def test_sampler_follows_weights():
+    sampler = AliasSampler(WEIGHTS)
+    counts = Counter(sampler.sample_many(100_000, random.Random(7)))
+    total = sum(WEIGHTS.values())
+    for name, weight in WEIGHTS.items():
+        assert counts[name] / 100_000 == pytest.approx(weight / total, abs=0.01)
+
+
+def test_sampler_skips_zero_weights():
+    sampler = AliasSampler({"hallway": 1, "key": 0})
+    assert set(sampler.sample_many(1000, random.Random(1))) == {"hallway"}
+
+
+@pytest.mark.parametrize("weights", [{}, {"hallway": 0}, {"hallway": -1, "key": 2}])
+def test_sampler_rejects_bad_weights(weights):
+    with pytest.raises(ValueError):
+        AliasSampler(weights)
+
+
+def test_engine_is_reproducible_with_a_seed():
+    first = OutcomeEngine(WEIGHTS, TEXTS, rng=random.Random(3)).sample_many(50)
+    second = OutcomeEngine(WEIGHTS, TEXTS, rng=random.Random(3)).sample_many(50)
+    assert first == second
+
+
+def test_embeds_are_copies():
+    engine = OutcomeEngine(WEIGHTS, TEXTS)
+    embed = engine.embed("key")
+    embed.add_field(name="Loot", value="a key")
+    assert embed.title == "Key"
+    assert not engine.embed("key").fields
@@ -0,0 +1,71 @@
+import asyncio
+
+from player_actors import COALESCED, DROPPED, QUEUED, ActorRouter
+
+
+def test_commands_run_in_order_per_player():
+    log = []
+
+    def job(player, name, delay):
+        async def run():
+            log.append((player, name, "start"))
+            await asyncio.sleep(delay)
+            log.append((player, name, "end"))
+        return run
+
+    async def scenario():
+        router = ActorRouter(idle_timeout=0.05)
+        router.submit(1, "start", job(1, "start", 0.03))
+        router.submit(1, "open", job(1, "open", 0))
+        router.submit(2, "start", job(2, "start", 0))
+        await asyncio.sleep(0.1)
+        assert not router.actors  # Both retired once idle
+
+    asyncio.run(scenario())
+    player_one = [entry for entry in log if entry[0] == 1]
+    assert player_one == [(1, "start", "start"), (1, "start", "end"), (1, "open", "start"), (1, "open", "end")]
+    # Player 2 didn't wait for player 1's slow command
+    assert log.index((2, "start", "end")) < log.index((1, "start", "end"))
+
+
+def test_coalesce_and_drop():
+    ran = []
+
+    def job(name):
+        async def run():
+            ran.append(name)
+            await asyncio.sleep(0.01)
+        return run
+
+    async def scenario():
+        router = ActorRouter(max_queue=2, policies={"open": "coalesce"})
+        assert router.submit(1, "start", job("start")) == QUEUED
+        assert router.submit(1, "open", job("open")) == QUEUED
+        assert router.submit(1, "open", job("open again")) == COALESCED
+        assert router.submit(1, "end", job("end")) == DROPPED
+        assert router.submit(2, "end", job("other player")) == QUEUED
+        assert router.queued == 3
+        assert (router.coalesced, router.dropped) == (1, 1)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert sorted(ran) == ["open", "other player", "start"]
+
+
+def test_a_failing_command_does_not_stop_the_actor():
+    ran = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def succeed():
+        ran.append("ok")
+
+    async def scenario():
+        router = ActorRouter()
+        router.submit(1, "open", fail)
+        router.submit(1, "open", succeed)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert ran == ["ok"]
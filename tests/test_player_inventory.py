@@ -0,0 +1,41 @@
+import random
+
+from player_inventory import COINS, TREASURES, PlayerInventory
+
+
+def test_record_round_trip():
+    record = {"items": [TREASURES[3], TREASURES[0], "key", "key", "Lucky Pebble"], "coins": ["coin2", "Old Penny"]}
+    inventory = PlayerInventory.from_record(record)
+    assert inventory.keys == 2
+    assert inventory.treasure_count == 2
+    assert inventory.extras == ("Lucky Pebble",)
+    # Catalogue order replaces collection order; nothing else is lost
+    assert PlayerInventory.from_record(inventory.to_record()) == inventory
+    assert sorted(inventory.to_record()["items"]) == sorted(record["items"])
+
+
+def test_treasures():
+    inventory = PlayerInventory()
+    assert inventory.add_treasure(TREASURES[0])
+    assert not inventory.add_treasure(TREASURES[0])
+    rng = random.Random(1)
+    while not inventory.has_all_treasures():
+        name = inventory.random_missing_treasure(rng)
+        assert not inventory.has_treasure(name)
+        inventory.add_treasure(name)
+    assert inventory.random_missing_treasure(rng) is None
+    assert inventory.treasure_count == len(TREASURES)
+
+
+def test_coins_and_keys():
+    inventory = PlayerInventory()
+    for name in COINS:
+        assert inventory.add_coin(name)
+    assert inventory.has_all_coins()
+    inventory.clear_coins()
+    assert inventory.coin_count == 0
+
+    assert not inventory.use_key()
+    inventory.add_key()
+    assert inventory.use_key()
+    assert inventory.keys == 0
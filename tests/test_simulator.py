@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from game_data import outcomes
+from simulator import GOALS, parse_weights, simulate_numpy, simulate_player, simulate_python, summarize
+
+
+def test_parse_weights():
+    assert parse_weights(None) == dict(outcomes)
+    weights = parse_weights("hallway=40, treasure=25")
+    assert weights["hallway"] == 40 and weights["treasure"] == 25
+    with pytest.raises(ValueError):
+        parse_weights("dragon=5")
+    with pytest.raises(ValueError):
+        parse_weights("hallway=-1")
+
+
+def test_player_reaches_goals_in_order():
+    done = simulate_player({"treasure": 1, "key": 1, "rare_coin": 1}, random.Random(3), 10_000,
+                           treasure_count=3, coin_count=2)
+    assert set(done) == set(GOALS)
+    assert done["complete"] == max(done["all_coins"], done["all_treasures"])
+
+
+def test_unreachable_goals_stay_at_zero():
+    results = simulate_python({"hallway": 1}, 5, 50, seed=1)
+    assert all(value == 0 for goal in GOALS for value in results[goal])
+    assert summarize(results["complete"]) == {"reached": 0}
+
+
+def test_engines_agree():
+    pytest.importorskip("numpy")
+    weights = dict(outcomes)
+    python = simulate_python(weights, 3000, 5000, seed=1)
+    batched = simulate_numpy(weights, 3000, 5000, seed=1)
+    for goal in GOALS:
+        expected, actual = summarize(python[goal]), summarize(batched[goal].tolist())
+        assert actual["reached"] == expected["reached"]
+        assert actual["mean"] == pytest.approx(expected["mean"], rel=0.1)
+        assert actual["p50"] == pytest.approx(expected["p50"], rel=0.15)
@@ -0,0 +1,51 @@
+from throttle import CommandThrottle
+
+
+def test_user_burst_then_refill():
+    throttle = CommandThrottle(user_rate=0.5, user_burst=2, guild_rate=100, guild_burst=100)
+    assert throttle.check(1, 10, now=0.0) == 0
+    assert throttle.check(1, 10, now=0.0) == 0
+    assert throttle.check(1, 10, now=0.0) == 2.0
+    assert throttle.check(1, 10, now=2.0) == 0
+    assert throttle.stats(1) == {"allowed": 3, "throttled": 1, "coalesced": 0}
+
+
+def test_guild_bucket_is_shared():
+    throttle = CommandThrottle(user_rate=10, user_burst=10, guild_rate=1, guild_burst=2)
+    assert throttle.check(1, 10, now=0.0) == 0
+    assert throttle.check(2, 10, now=0.0) == 0
+    assert throttle.check(3, 10, now=0.0) == 1.0
+    assert throttle.check(3, 11, now=0.0) == 0
+
+
+def test_notify_once_per_throttled_streak():
+    throttle = CommandThrottle(user_rate=1, user_burst=1)
+    throttle.check(1, now=0.0)
+    throttle.check(1, now=0.0)
+    assert throttle.should_notify(1)
+    assert not throttle.should_notify(1)
+    throttle.check(1, now=5.0)
+    assert throttle.should_notify(1)
+
+
+def test_idle_buckets_are_pruned():
+    throttle = CommandThrottle(user_rate=1, user_burst=2, guild_rate=1, guild_burst=2, prune_interval=10)
+    throttle.check(1, 10, now=0.0)
+    throttle.check(2, 10, now=9.0)
+    throttle.check(2, 10, now=9.0)
+    throttle.check(3, 11, now=10.0)  # Prunes: only user 1 has refilled
+    assert set(throttle.users) == {2, 3}
+    assert set(throttle.guilds) == {10, 11}
+    throttle.prune(now=100.0)
+    assert not throttle.users and not throttle.guilds
+    # Counters are kept for stats after the buckets are gone
+    assert throttle.stats(1) == {"allowed": 1, "throttled": 0, "coalesced": 0}
+
+
+def test_counters_keep_the_most_recent_users():
+    throttle = CommandThrottle(max_counters=2)
+    throttle.check(1, now=0.0)
+    throttle.check(2, now=0.0)
+    throttle.check(1, now=0.0)
+    throttle.check(3, now=0.0)
+    assert list(throttle.counters) == [1, 3]
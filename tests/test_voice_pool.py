@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+from voice_pool import VoicePool, VoiceWorker  # noqa: E402
+from voice_sessions import VoiceSessionManager  # noqa: E402
+
+
+class FakeVoiceClient:
+    def __init__(self, channel):
+        self.channel = channel
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def is_playing(self):
+        return False
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self, force=False):
+        self.connected = False
+
+
+class FakeMember:
+    bot = False
+
+
+class FakeChannel:
+    def __init__(self, guild, channel_id, members=1):
+        self.guild = guild
+        self.id = channel_id
+        self.members = [FakeMember() for _ in range(members)]
+        self.connects = 0
+
+    async def connect(self):
+        self.connects += 1
+        await asyncio.sleep(0.01)
+        return FakeVoiceClient(self)
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeClient:
+    def __init__(self, guilds, channels=()):
+        self.guilds = {guild.id: guild for guild in guilds}
+        self.channels = {channel.id: channel for channel in channels}
+
+    def event(self, handler):
+        setattr(self, handler.__name__, handler)
+        return handler
+
+    def is_ready(self):
+        return True
+
+    def is_closed(self):
+        return False
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+def worker(name, guilds, channels=(), token=None):
+    worker = VoiceWorker(name, FakeClient(guilds, channels), VoiceSessionManager(idle_timeout=60), token)
+    worker.up = True
+    return worker
+
+
+def holder(pool, channel):
+    return pool._holder(channel)[0].name
+
+
+def test_channels_in_one_guild_get_their_own_accounts():
+    guild = FakeGuild(1)
+    first, second, third = FakeChannel(guild, 10), FakeChannel(guild, 11), FakeChannel(guild, 12)
+    pool = VoicePool(worker("main", [guild]), [worker("helper", [guild], token="token")])
+
+    async def scenario():
+        await asyncio.gather(pool.connect(first), pool.connect(second))
+        assert {holder(pool, first), holder(pool, second)} == {"main", "helper"}
+        assert pool.connected_count == 2
+
+        # Every account is busy in the guild: the least loaded one moves
+        await pool.connect(third)
+        assert pool.connected_count == 2
+        assert pool.connected(third) is not None
+        await pool.disconnect_all()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_connects_share_one_connection():
+    guild = FakeGuild(1)
+    channel = FakeChannel(guild, 10)
+    pool = VoicePool(worker("main", [guild]), [worker("helper", [guild], token="token")])
+
+    async def scenario():
+        sessions = await asyncio.gather(*(pool.connect(channel) for _ in range(5)))
+        assert len({id(session) for session in sessions}) == 1
+        assert await pool.connect(channel) is sessions[0]
+        assert channel.connects == 1
+        await pool.disconnect_all()
+
+    asyncio.run(scenario())
+
+
+def test_helpers_outside_the_guild_are_not_used():
+    guild, other = FakeGuild(1), FakeGuild(2)
+    first, second = FakeChannel(guild, 10), FakeChannel(guild, 11)
+    pool = VoicePool(worker("main", [guild]), [worker("helper", [other], token="token")])
+
+    async def scenario():
+        await pool.connect(first)
+        await pool.connect(second)
+        assert holder(pool, second) == "main"
+        await pool.disconnect_all()
+
+    asyncio.run(scenario())
+
+
+def test_channels_of_a_lost_helper_are_reassigned():
+    guild = FakeGuild(1)
+    occupied, empty = FakeChannel(guild, 10), FakeChannel(guild, 11, members=0)
+    main = worker("main", [guild], [occupied, empty])
+    helper = worker("helper", [guild], token="token")
+    spare = worker("spare", [guild], token="token")
+    reassigned = []
+
+    async def on_reassign(session):
+        reassigned.append(session.channel.id)
+
+    pool = VoicePool(main, [helper, spare], on_reassign=on_reassign)
+
+    async def scenario():
+        await pool.connect(occupied)
+        await pool.connect(empty)
+        lost = pool._holder(occupied)[0]
+        lost.up = False
+        assert lost.channels() == [(guild.id, occupied.id)]
+        await pool._reassign(lost, [(guild.id, occupied.id), (guild.id, empty.id)])
+        assert reassigned == [occupied.id]  # Nobody is left in the other channel
+        assert pool._holder(occupied)[0] not in (None, lost)
+        await pool.disconnect_all()
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Whether the bucket would be full again by `now`, so dropping it changes nothing
+    def idle(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+    # Seconds until a token is available (0 if one is available now)
+    def wait_time(self):
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ThrottleCounters:
+    __slots__ = ("allowed", "throttled", "coalesced", "notified")
+
+    def __init__(self):
+        self.allowed = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self.notified = False
+
+    def as_dict(self):
+        return {"allowed": self.allowed, "throttled": self.throttled, "coalesced": self.coalesced}
+
+
+# Token-bucket rate limits per user and per guild for command dispatch.
+# A command goes through only if both buckets have a token; otherwise check()
+# returns how long to wait. Per-user counters record what was let through,
+# throttled and coalesced. Every `prune_interval` seconds, buckets that have
+# refilled completely are dropped. Counters outlive the buckets so stats cover
+# more than a live burst; the `max_counters` most recently active users keep them.
+class CommandThrottle:
+    def __init__(self, user_rate=0.5, user_burst=5, guild_rate=5.0, guild_burst=20, prune_interval=60.0,
+                 max_counters=10000):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.guild_rate = guild_rate
+        self.guild_burst = guild_burst
+        self.prune_interval = prune_interval
+        self.max_counters = max_counters
+        self.users = {}
+        self.guilds = {}
+        self.counters = OrderedDict()
+        self._pruned_at = None
+
+    def _bucket(self, buckets, key, rate, burst, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst, now)
+        else:
+            bucket.refill(now)
+        return bucket
+
+    def counters_for(self, user_id):
+        counters = self.counters.get(user_id)
+        if counters is None:
+            counters = self.counters[user_id] = ThrottleCounters()
+            if len(self.counters) > self.max_counters:
+                self.counters.popitem(last=False)
+        else:
+            self.counters.move_to_end(user_id)
+        return counters
+
+    # Take a token for the command; returns 0 if allowed, else seconds to wait
+    def check(self, user_id, guild_id=None, now=None):
+        now = time.monotonic() if now is None else now
+        if self._pruned_at is None:
+            self._pruned_at = now
+        elif now - self._pruned_at >= self.prune_interval:
+            self.prune(now)
+        buckets = [self._bucket(self.users, user_id, self.user_rate, self.user_burst, now)]
+        if guild_id is not None:
+            buckets.append(self._bucket(self.guilds, guild_id, self.guild_rate, self.guild_burst, now))
+
+        counters = self.counters_for(user_id)
+        wait = max(bucket.wait_time() for bucket in buckets)
+        if wait:
+            counters.throttled += 1
+            return wait
+        for bucket in buckets:
+            bucket.tokens -= 1
+        counters.allowed += 1
+        counters.notified = False
+        return 0.0
+
+    # Drop the buckets of users and guilds idle long enough to be full again
+    def prune(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._pruned_at = now
+        for user_id in [user_id for user_id, bucket in self.users.items() if bucket.idle(now)]:
+            del self.users[user_id]
+        for guild_id in [guild_id for guild_id, bucket in self.guilds.items() if bucket.idle(now)]:
+            del self.guilds[guild_id]
+
+    # True the first time a user is throttled since their last allowed command,
+    # so the "slow down" reply is sent once rather than per message
+    def should_notify(self, user_id):
+        counters = self.counters_for(user_id)
+        if counters.notified:
+            return False
+        counters.notified = True
+        return True
+
+    def record_coalesced(self, user_id):
+        self.counters_for(user_id).coalesced += 1
+
+    def stats(self, user_id):
+        counters = self.counters.get(user_id)
+        return counters.as_dict() if counters else ThrottleCounters().as_dict()
+
+    # The users throttled most often, as (user_id, counters) pairs
+    def top_throttled(self, limit=10):
+        ranked = sorted(self.counters.items(), key=lambda item: item[1].throttled, reverse=True)
+        return [(user_id, counters.as_dict()) for user_id, counters in ranked[:limit] if counters.throttled]
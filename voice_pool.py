@@ -0,0 +1,222 @@
+import asyncio
+import logging
+
+import discord
+
+from voice_sessions import VoiceSessionManager
+
+
+# One bot account that can hold voice connections: the main bot, or a helper
+# account logged in only to join voice (guild and voice state events, no
+# member list). Each account can be in one voice channel per guild.
+class VoiceWorker:
+    def __init__(self, name, client, sessions, token=None):
+        self.name = name
+        self.client = client
+        self.sessions = sessions
+        self.token = token
+        self.up = token is None  # Helpers are up once their gateway is ready
+        self.joining = set()  # Guild IDs this account is being connected in
+
+    @classmethod
+    def helper(cls, name, token, idle_timeout=300, mixer_settings=None):
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.voice_states = True
+        client = discord.Client(intents=intents)
+        return cls(name, client, VoiceSessionManager(idle_timeout, mixer_settings), token)
+
+    @property
+    def ready(self):
+        return self.up and self.client.is_ready() and not self.client.is_closed()
+
+    # Connected voice channels, counting connections still being made
+    @property
+    def load(self):
+        return sum(1 for session in self.sessions.sessions.values() if session.connected) + len(self.joining)
+
+    def in_guild(self, guild_id):
+        return self.ready and self.client.get_guild(guild_id) is not None
+
+    def can_join(self, guild_id):
+        return self.in_guild(guild_id) and guild_id not in self.joining and not self.sessions.connected(guild_id)
+
+    # The session playing in `channel_id`, or None
+    def session_in(self, guild_id, channel_id):
+        session = self.sessions.connected(guild_id)
+        return session if session is not None and session.channel.id == channel_id else None
+
+    # (guild ID, channel ID) of every connection this worker holds or just lost
+    def channels(self):
+        return [(guild_id, session.vc.channel.id) for guild_id, session in self.sessions.sessions.items()
+                if session.vc is not None]
+
+
+# Spreads voice channels over the main bot and any helper accounts, so players
+# in the same guild each get their own connection instead of the bot hopping
+# between their channels. connect() reuses the connection already in the
+# channel, or picks the least loaded account that is free in that guild; when
+# every account is busy there, the least loaded one is moved (the old single
+# connection behaviour). Channels of a helper that drops are handed to other
+# accounts and `on_reassign(session)` is called for each so audio restarts.
+# `idle_timeout_for(guild_id)`, when given, sets each session's idle timeout.
+class VoicePool:
+    def __init__(self, primary, helpers=(), on_reassign=None, reconnect_grace=10.0, idle_timeout_for=None):
+        self.primary = primary
+        self.helpers = list(helpers)
+        self.workers = [primary, *self.helpers]
+        self.on_reassign = on_reassign
+        self.idle_timeout_for = idle_timeout_for
+        self.reconnect_grace = reconnect_grace
+        self._tasks = []
+        self._connecting = {}
+        for worker in self.helpers:
+            self._watch(worker)
+
+    def _watch(self, worker):
+        client = worker.client
+
+        @client.event
+        async def on_ready():
+            worker.up = True
+            logging.info(f"Voice worker {worker.name} ready as {client.user} in {len(client.guilds)} guilds")
+
+        @client.event
+        async def on_resumed():
+            worker.up = True
+
+        @client.event
+        async def on_disconnect():
+            if worker.up:
+                worker.up = False
+                logging.warning(f"Voice worker {worker.name} lost its gateway connection")
+                asyncio.create_task(self._reassign_if_down(worker))
+
+        @client.event
+        async def on_voice_state_update(member, before, after):
+            # Kicked or dropped from a channel this worker is still meant to serve
+            if member.id != client.user.id or not before.channel or after.channel == before.channel:
+                return
+            session = worker.sessions.get(member.guild.id)
+            if session is not None and session.vc is not None and session.vc.channel.id == before.channel.id:
+                logging.warning(f"Voice worker {worker.name} dropped from channel {before.channel.id}")
+                await self._reassign(worker, [(member.guild.id, before.channel.id)])
+
+    # Log the helper accounts in (call once the loop is running)
+    def start(self):
+        for worker in self.helpers:
+            self._tasks.append(asyncio.create_task(self._run(worker)))
+
+    async def _run(self, worker):
+        try:
+            await worker.client.start(worker.token)
+        except discord.LoginFailure:
+            logging.error(f"Voice worker {worker.name} has an invalid token")
+        except Exception:
+            logging.exception(f"Voice worker {worker.name} stopped")
+        finally:
+            worker.up = False
+
+    # Wait up to `timeout` seconds for the helpers to come up (e.g. before resuming sessions)
+    async def wait_ready(self, timeout=10.0):
+        waits = [worker.client.wait_until_ready() for worker in self.helpers if not worker.client.is_closed()]
+        if waits:
+            try:
+                await asyncio.wait_for(asyncio.gather(*waits), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def connected_count(self):
+        return sum(worker.load for worker in self.workers)
+
+    @property
+    def ready_count(self):
+        return sum(1 for worker in self.workers if worker.ready)
+
+    def _holder(self, channel):
+        for worker in self.workers:
+            session = worker.session_in(channel.guild.id, channel.id)
+            if session is not None:
+                return worker, session
+        return None, None
+
+    # The session playing in `channel`, or None
+    def connected(self, channel):
+        return self._holder(channel)[1]
+
+    # A session playing in `channel`, connecting an account to it if needed.
+    # Concurrent calls for the same channel share one connect.
+    async def connect(self, channel, exclude=None):
+        session = self.connected(channel)
+        if session is not None:
+            return session
+        task = self._connecting.get(channel.id)
+        if task is None:
+            task = self._connecting[channel.id] = asyncio.ensure_future(self._connect(channel, exclude))
+        return await asyncio.shield(task)
+
+    # The account is picked and reserved in the guild before the first await,
+    # so connects running at the same time never pick the same account
+    async def _connect(self, channel, exclude):
+        guild_id = channel.guild.id
+        try:
+            free = [worker for worker in self.workers if worker is not exclude and worker.can_join(guild_id)]
+            if free:
+                worker = min(free, key=lambda w: w.load)
+            else:
+                busy = [worker for worker in self.workers if worker is not exclude and worker.in_guild(guild_id)
+                        and guild_id not in worker.joining]
+                worker = min(busy, key=lambda w: w.load) if busy else self.primary
+
+            worker.joining.add(guild_id)
+            try:
+                target = worker.client.get_channel(channel.id) or channel
+                session = worker.sessions.session(guild_id)
+                if self.idle_timeout_for is not None:
+                    session.idle_timeout = self.idle_timeout_for(guild_id)
+                await session.connect(target)
+            finally:
+                worker.joining.discard(guild_id)
+            return session
+        finally:
+            del self._connecting[channel.id]
+
+    async def disconnect(self, channel):
+        worker, session = self._holder(channel)
+        if worker is not None:
+            await worker.sessions.disconnect(channel.guild.id)
+
+    async def disconnect_all(self):
+        await asyncio.gather(*(worker.sessions.disconnect_all() for worker in self.workers), return_exceptions=True)
+
+    # Leave voice everywhere and log the helpers out
+    async def close(self):
+        await self.disconnect_all()
+        await asyncio.gather(*(worker.client.close() for worker in self.helpers), return_exceptions=True)
+        for task in self._tasks:
+            task.cancel()
+
+    async def _reassign_if_down(self, worker):
+        await asyncio.sleep(self.reconnect_grace)
+        if not worker.ready:
+            await self._reassign(worker, worker.channels())
+
+    # Move `channels` ((guild ID, channel ID) pairs) off `worker`, skipping channels nobody is in anymore
+    async def _reassign(self, worker, channels):
+        for guild_id, channel_id in channels:
+            try:
+                await asyncio.wait_for(worker.sessions.disconnect(guild_id), timeout=5)
+            except (asyncio.TimeoutError, discord.DiscordException):
+                pass
+            channel = self.primary.client.get_channel(channel_id)
+            if channel is None or not [m for m in channel.members if not m.bot]:
+                continue
+            try:
+                session = await self.connect(channel, exclude=worker)
+            except (discord.ClientException, asyncio.TimeoutError):
+                logging.exception(f"Could not move voice channel {channel_id} off worker {worker.name}")
+                continue
+            logging.info(f"Moved voice channel {channel_id} from worker {worker.name}")
+            if self.on_reassign is not None:
+                await self.on_reassign(session)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from collections import deque
+
+from metrics import registry
+from mixer import MixerSource
+
+
+# One persistent voice connection per guild. Clips are played with the
+# after= callback instead of polling, queued clips start as soon as the
+# previous one ends, and the connection is dropped after `idle_timeout`
+# seconds without activity: no clip or effect started and no touch() (a
+# player's command). A looping music bed alone doesn't keep the connection,
+# but a clip still playing does. Music and effects can instead be layered
+# through the session's mixer, which stays a single stream however often they
+# change.
+class VoiceSession:
+    def __init__(self, guild_id, idle_timeout, mixer_settings=None):
+        self.guild_id = guild_id
+        self.idle_timeout = idle_timeout
+        self.mixer = MixerSource(**(mixer_settings or {}))
+        self.vc = None
+        self.queue = deque()
+        self._generation = 0
+        self._idle_handle = None
+        self._last_active = 0.0
+
+    @property
+    def connected(self):
+        return self.vc is not None and self.vc.is_connected()
+
+    @property
+    def channel(self):
+        return self.vc.channel if self.connected else None
+
+    def is_playing(self):
+        return self.connected and self.vc.is_playing()
+
+    # Join `channel`, reusing the existing connection when there is one
+    async def connect(self, channel):
+        if self.connected:
+            if self.vc.channel != channel:
+                with registry.timer("voicebot_io_seconds", op="voice_move"):
+                    await self.vc.move_to(channel)
+        else:
+            with registry.timer("voicebot_io_seconds", op="voice_connect"):
+                self.vc = await channel.connect()
+        self.touch()
+        return self.vc
+
+    async def disconnect(self):
+        self._cancel_idle()
+        self.queue.clear()
+        self.mixer.clear()
+        self._generation += 1
+        if self.vc is not None:
+            vc, self.vc = self.vc, None
+            if vc.is_connected():
+                await vc.disconnect()
+
+    # Play a source right away, replacing whatever is playing and anything queued
+    def play(self, source):
+        self.queue.clear()
+        self.mixer.clear()
+        self._start(source)
+
+    # Loop `clip` as the music bed, replacing the current music but not effects
+    def play_music(self, clip, loop=True):
+        self._mix(self.mixer.set_music(clip, loop))
+
+    # Overlay a one-shot clip on whatever the mixer is playing
+    def play_effect(self, clip):
+        self._mix(self.mixer.add_effect(clip))
+
+    # Make sure the mixer is what the connection is playing
+    def _mix(self, restart):
+        if not self.connected:
+            self.mixer.clear()
+            return
+        self.touch()
+        if restart or self.vc.source is not self.mixer or not self.vc.is_playing():
+            self.queue.clear()
+            self._start(self.mixer)
+
+    # Play a source after the ones already playing or queued
+    def enqueue(self, source):
+        if self.is_playing() or self.queue:
+            self.queue.append(source)
+        else:
+            self._start(source)
+
+    def stop(self):
+        self.queue.clear()
+        self.mixer.clear()
+        self._generation += 1
+        if self.connected:
+            self.vc.stop()
+        self.touch()
+
+    def _start(self, source):
+        if not self.connected:
+            source.cleanup()
+            return
+        self.touch()
+        self._generation += 1
+        generation = self._generation
+        loop = asyncio.get_running_loop()
+        if self.vc.is_playing() or self.vc.is_paused():
+            self.vc.stop()
+
+        def after(error):
+            # Runs on discord.py's audio thread
+            loop.call_soon_threadsafe(self._finished, generation, error)
+
+        self.vc.play(source, after=after)
+
+    def _finished(self, generation, error):
+        if error:
+            logging.error(f"Voice playback error in guild {self.guild_id}: {error}")
+        if generation != self._generation:
+            return  # A newer clip replaced this one
+        if self.queue and self.connected:
+            self._start(self.queue.popleft())
+
+    # Note activity, pushing the idle disconnect back by `idle_timeout`
+    def touch(self):
+        self._last_active = asyncio.get_running_loop().time()
+        if self._idle_handle is None:
+            self._arm_idle(self.idle_timeout)
+
+    def _arm_idle(self, delay):
+        self._cancel_idle()
+        if self.connected:
+            loop = asyncio.get_running_loop()
+            self._idle_handle = loop.call_later(delay, self._idle_expired)
+
+    def _cancel_idle(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    # Playing something other than the looping music bed
+    def _busy(self):
+        if not self.is_playing():
+            return False
+        return self.vc.source is not self.mixer or bool(self.mixer.effects) or (
+            self.mixer.music is not None and not self.mixer.music.loop)
+
+    def _idle_expired(self):
+        self._idle_handle = None
+        remaining = self._last_active + self.idle_timeout - asyncio.get_running_loop().time()
+        if remaining > 0:
+            self._arm_idle(remaining)
+        elif self._busy():
+            self._arm_idle(self.idle_timeout)
+        else:
+            asyncio.create_task(self.disconnect())
+
+
+# Guild ID -> VoiceSession, so lookups never scan bot.voice_clients
+class VoiceSessionManager:
+    def __init__(self, idle_timeout=300, mixer_settings=None):
+        self.idle_timeout = idle_timeout
+        self.mixer_settings = mixer_settings
+        self.sessions = {}
+
+    def get(self, guild_id):
+        return self.sessions.get(guild_id)
+
+    def session(self, guild_id):
+        session = self.sessions.get(guild_id)
+        if session is None:
+            session = self.sessions[guild_id] = VoiceSession(guild_id, self.idle_timeout, self.mixer_settings)
+        return session
+
+    async def connect(self, channel):
+        session = self.session(channel.guild.id)
+        await session.connect(channel)
+        return session
+
+    # The guild's connected session, or None
+    def connected(self, guild_id):
+        session = self.sessions.get(guild_id)
+        return session if session is not None and session.connected else None
+
+    async def disconnect(self, guild_id):
+        session = self.sessions.pop(guild_id, None)
+        if session is not None:
+            await session.disconnect()
+
+    # Leave every voice channel at once (shutdown has a time budget)
+    async def disconnect_all(self):
+        await asyncio.gather(*(self.disconnect(guild_id) for guild_id in list(self.sessions)),
+                             return_exceptions=True)